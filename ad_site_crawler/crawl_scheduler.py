@@ -0,0 +1,182 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator, List, Set, Tuple, Union
+
+from .abstract_ad_site_crawler import AbstractAdSiteCrawler
+from .polling_interval import PollingInterval
+from .xegr_ad_site_crawler import AdSiteCrawlerHttpError
+
+logger = logging.getLogger('CrawlScheduler')
+
+
+class CrawlJob:
+    __slots__ = ('lookup_url', 'check_interval', 'anchor_class_name', 'polling_interval', 'next_run')
+
+    lookup_url: str
+    check_interval: float
+    anchor_class_name: Union[str, None]
+    polling_interval: PollingInterval
+    next_run: float
+
+    def __init__(self, lookup_url: str, check_interval: float = 120, anchor_class_name: str = None,
+                 polling_interval: PollingInterval = None) -> None:
+        """
+        The basic constructor. Creates a new CrawlJob that checks a search page every `check_interval` seconds.
+
+        :param lookup_url:
+        :param check_interval:
+        :param anchor_class_name: The anchor class of the search page, the crawler's one if not set
+        :param polling_interval: Decides the seconds between the checks, a fixed `check_interval`
+                                 that only backs off after errors if not set
+        """
+
+        self.lookup_url = lookup_url
+        self.check_interval = check_interval
+        self.anchor_class_name = anchor_class_name
+        if polling_interval is None:
+            polling_interval = PollingInterval(base_interval=check_interval, adaptive=False)
+        self.polling_interval = polling_interval
+        self.next_run = 0.0
+
+    def __repr__(self) -> str:
+        return "CrawlJob(lookup_url=%s, check_interval=%s)" % (self.lookup_url, self.check_interval)
+
+
+class CrawlScheduler:
+    __slots__ = ('_ad_site_crawler', '_crawl_jobs', '_ads_checked', '_crawl_interval', '_executor', '_schedule',
+                 '_schedule_counter', '_condition', '_results', '_dispatcher', '_running')
+
+    _ad_site_crawler: AbstractAdSiteCrawler
+    _crawl_jobs: List[CrawlJob]
+    _ads_checked: Set[str]
+    _crawl_interval: float
+    _executor: ThreadPoolExecutor
+    _schedule: List[Tuple[float, int, CrawlJob]]
+    _schedule_counter: Iterator[int]
+    _condition: threading.Condition
+    _results: queue.Queue
+    _dispatcher: Union[threading.Thread, None]
+    _running: bool
+
+    def __init__(self, ad_site_crawler: AbstractAdSiteCrawler, crawl_jobs: List[CrawlJob], ads_checked: Set[str],
+                 crawl_interval: float = 15, max_parallel_jobs: int = 2) -> None:
+        """
+        The basic constructor. Creates a new CrawlScheduler that runs each job when it is due.
+        The jobs share the crawler, so its fetch pool, its per-host rate limits and its connections,
+        as well as the set of the ads checked.
+
+        :param ad_site_crawler:
+        :param crawl_jobs:
+        :param ads_checked: The set of links already checked, shared by all the jobs
+        :param crawl_interval: The average seconds between two ad page requests
+        :param max_parallel_jobs: The maximum number of search pages checked at the same time
+        """
+
+        self._ad_site_crawler = ad_site_crawler
+        self._crawl_jobs = crawl_jobs
+        self._ads_checked = ads_checked
+        self._crawl_interval = crawl_interval
+        self._executor = ThreadPoolExecutor(max_workers=max(max_parallel_jobs, 1))
+        self._schedule = []
+        self._schedule_counter = itertools.count()
+        self._condition = threading.Condition()
+        self._results = queue.Queue()
+        self._dispatcher = None
+        self._running = False
+
+    def start(self) -> None:
+        """
+        Schedules every job to run right away and starts dispatching them in the background.
+        """
+
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            now = time.monotonic()
+            for crawl_job in self._crawl_jobs:
+                self._schedule_job(crawl_job=crawl_job, next_run=now)
+        self._dispatcher = threading.Thread(target=self._dispatch, name='CrawlSchedulerDispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+        # Wake up whoever waits for the results
+        self._results.put(None)
+
+    def get_results(self, timeout: float = None) -> Iterator[Tuple[CrawlJob, List[Tuple[str, Union[None, str]]]]]:
+        """
+        Yields each job along with the new ads it found, as soon as it is completed.
+        The new ads are handled in the caller's thread while the rest of the jobs keep running.
+
+        :param timeout: The seconds to wait for a result before returning, forever if not set
+        """
+
+        while True:
+            try:
+                result = self._results.get(timeout=timeout)
+            except queue.Empty:
+                return
+            if result is None:
+                return
+            yield result
+
+    def _schedule_job(self, crawl_job: CrawlJob, next_run: float) -> None:
+        crawl_job.next_run = next_run
+        # The counter breaks the ties, so the jobs themselves are never compared
+        heapq.heappush(self._schedule, (next_run, next(self._schedule_counter), crawl_job))
+        self._condition.notify_all()
+
+    def _dispatch(self) -> None:
+        with self._condition:
+            while self._running:
+                if len(self._schedule) == 0:
+                    self._condition.wait()
+                    continue
+                next_run, _, crawl_job = self._schedule[0]
+                wait = next_run - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(timeout=wait)
+                    continue
+                heapq.heappop(self._schedule)
+                logger.debug("Running %s.." % crawl_job)
+                future = self._executor.submit(self._run_job, crawl_job)
+                future.add_done_callback(lambda done_future, job=crawl_job: self._on_job_done(job, done_future))
+
+    def _run_job(self, crawl_job: CrawlJob) -> List[Tuple[str, Union[None, str]]]:
+        return list(self._ad_site_crawler.get_new_ads(lookup_url=crawl_job.lookup_url,
+                                                      ads_checked=self._ads_checked,
+                                                      crawl_interval=self._crawl_interval,
+                                                      anchor_class_name=crawl_job.anchor_class_name))
+
+    def _on_job_done(self, crawl_job: CrawlJob, future: Future) -> None:
+        if future.cancelled():
+            return
+        try:
+            new_ads = future.result()
+        except AdSiteCrawlerHttpError as e:
+            logger.error("%s failed: %s" % (crawl_job, e))
+            crawl_job.polling_interval.record_error(retry_after=e.retry_after)
+        except Exception as e:
+            logger.error("%s failed: %s" % (crawl_job, e))
+            crawl_job.polling_interval.record_error()
+        else:
+            crawl_job.polling_interval.record_success(new_ads=len(new_ads))
+            if len(new_ads) > 0:
+                self._results.put((crawl_job, new_ads))
+        # A job is rescheduled only once it is completed, so it never runs twice at the same time
+        check_interval = crawl_job.polling_interval.get_interval()
+        with self._condition:
+            if self._running:
+                logger.debug("Next run of %s in %.1f seconds.." % (crawl_job, check_interval))
+                self._schedule_job(crawl_job=crawl_job, next_run=time.monotonic() + check_interval)
@@ -0,0 +1,139 @@
+import threading
+import time
+import logging
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+logger = logging.getLogger('FetchEngine')
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', '_tokens', '_last_refill', '_lock')
+
+    rate: float
+    capacity: int
+    _tokens: float
+    _last_refill: float
+    _lock: threading.Lock
+
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        """
+        The basic constructor. Creates a new token bucket that allows `rate` acquisitions per second
+        with bursts of up to `capacity` acquisitions. A rate of zero disables the limit.
+
+        :param rate:
+        :param capacity:
+        """
+
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def acquire(self) -> float:
+        """
+        Reserves a token, blocking until it becomes available.
+
+        :return: The seconds waited
+        """
+
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill(time.monotonic())
+            # Reserve the token now so that concurrent callers queue up behind each other
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            logger.debug("Rate limited, waiting for %.2f seconds.." % wait)
+            time.sleep(wait)
+        return wait
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self._tokens = min(float(self.capacity), self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+
+class FetchEngine:
+    __slots__ = ('_executor', '_max_concurrency_per_host', '_burst', '_host_limits', '_lock')
+
+    _executor: ThreadPoolExecutor
+    _max_concurrency_per_host: int
+    _burst: int
+    _host_limits: Dict[str, Tuple[threading.Semaphore, TokenBucket]]
+    _lock: threading.Lock
+
+    def __init__(self, max_concurrency_per_host: int = 2, burst: int = 3, max_workers: int = 8) -> None:
+        """
+        The basic constructor. Creates a new FetchEngine that runs fetches on a bounded thread pool,
+        capping the concurrent requests and the request rate of each host.
+
+        :param max_concurrency_per_host:
+        :param burst:
+        :param max_workers:
+        """
+
+        self._max_concurrency_per_host = max(max_concurrency_per_host, 1)
+        self._burst = max(burst, 1)
+        self._executor = ThreadPoolExecutor(max_workers=max(max_workers, self._max_concurrency_per_host))
+        self._host_limits = dict()
+        self._lock = threading.Lock()
+
+    def map(self, fetch_func: Callable[[str], Any], urls: List[str], interval: float = 0) -> Iterator[Any]:
+        """
+        Fetches all the urls concurrently and yields the results in the order of the urls.
+        Each host gets on average one request every `interval` seconds.
+        The pending fetches are cancelled if the caller stops iterating.
+
+        :param fetch_func:
+        :param urls:
+        :param interval:
+        """
+
+        futures = [self._executor.submit(self._fetch, fetch_func, url, interval) for url in urls]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def fetch(self, fetch_func: Callable[[str], Any], url: str, interval: float = 0) -> Any:
+        """
+        Fetches a single url in the caller's thread, within the same per-host limits as the `map` fetches.
+
+        :param fetch_func:
+        :param url:
+        :param interval:
+        """
+
+        return self._fetch(fetch_func, url, interval)
+
+    def _fetch(self, fetch_func: Callable[[str], Any], url: str, interval: float) -> Any:
+        semaphore, token_bucket = self._get_host_limits(url=url, interval=interval)
+        with semaphore:
+            token_bucket.acquire()
+            return fetch_func(url)
+
+    def _get_host_limits(self, url: str, interval: float) -> Tuple[threading.Semaphore, TokenBucket]:
+        host = urllib.parse.urlsplit(url).netloc
+        rate = 1.0 / interval if interval > 0 else 0
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = (threading.BoundedSemaphore(self._max_concurrency_per_host),
+                                           TokenBucket(rate=rate, capacity=self._burst))
+            semaphore, token_bucket = self._host_limits[host]
+        if token_bucket.rate != rate:
+            token_bucket.set_rate(rate)
+        return semaphore, token_bucket
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
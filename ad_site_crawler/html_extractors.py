@@ -0,0 +1,158 @@
+import re
+import logging
+from html.parser import HTMLParser
+from typing import List, Pattern, Union
+
+logger = logging.getLogger('HtmlExtractors')
+
+
+class AdLinksExtractor(HTMLParser):
+    """
+    Incremental parser that emits the href of every anchor having the specified class
+    as soon as its start tag is fed. Once the element containing all the matched anchors
+    (the result list) is closed, `done` is set and the rest of the page can be skipped.
+    The result list is only known once anchors with different hrefs are found, so that the card
+    of a single ad with more than one anchor (e.g. its image and its title) is not taken for it.
+    Otherwise the whole page is parsed.
+    """
+
+    _void_elements: frozenset = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+                                           'meta', 'param', 'source', 'track', 'wbr'])
+
+    anchor_class_name: str
+    done: bool
+    _found_links: List[str]
+    _open_elements: List[str]
+    _open_element_ids: List[int]
+    _next_element_id: int
+    _first_link: Union[str, None]
+    _has_different_links: bool
+    _result_list_path: Union[List[int], None]
+
+    def __init__(self, anchor_class_name: str) -> None:
+        """
+        The basic constructor. Creates a new AdLinksExtractor for the specified anchor class name.
+
+        :param anchor_class_name:
+        """
+
+        super().__init__(convert_charrefs=True)
+        self.anchor_class_name = anchor_class_name
+        self.done = False
+        self._found_links = []
+        self._open_elements = []
+        self._open_element_ids = []
+        self._next_element_id = 0
+        self._first_link = None
+        self._has_different_links = False
+        self._result_list_path = None
+
+    def feed(self, data: str) -> List[str]:
+        """
+        Feeds a chunk of html to the parser and returns the links found in it.
+
+        :param data:
+        """
+
+        if not self.done:
+            super().feed(data)
+        found_links, self._found_links = self._found_links, []
+        return found_links
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag not in self._void_elements:
+            self._open_elements.append(tag)
+            self._open_element_ids.append(self._next_element_id)
+            self._next_element_id += 1
+        if tag != 'a' or self.done:
+            return
+        attrs = dict(attrs)
+        if self.anchor_class_name in (attrs.get('class') or '') and attrs.get('href'):
+            logger.debug("Href captured: %s" % attrs['href'])
+            self._found_links.append(attrs['href'].strip())
+            self._update_result_list_path(link=attrs['href'].strip(),
+                                          anchor_parents_path=self._open_element_ids[:-1])
+
+    def handle_endtag(self, tag) -> None:
+        if tag not in self._open_elements:
+            # Stray end tag
+            return
+        # Close any element left open inside this one (e.g. <p> or <li> without an end tag)
+        while self._open_elements.pop() != tag:
+            self._open_element_ids.pop()
+        self._open_element_ids.pop()
+        if self._has_different_links and len(self._open_element_ids) < len(self._result_list_path):
+            logger.debug("The result list was closed, no more links to expect.")
+            self.done = True
+
+    def _update_result_list_path(self, link: str, anchor_parents_path: List[int]) -> None:
+        # The result list is the deepest element that contains every matched anchor
+        if self._result_list_path is None:
+            self._first_link = link
+            self._result_list_path = anchor_parents_path
+            return
+        if link != self._first_link:
+            self._has_different_links = True
+        common_length = 0
+        for list_element_id, element_id in zip(self._result_list_path, anchor_parents_path):
+            if list_element_id != element_id:
+                break
+            common_length += 1
+        self._result_list_path = self._result_list_path[:common_length]
+
+
+class EmailsExtractor:
+    """
+    Incremental scanner that emits the email addresses found in html chunks as soon as they are complete.
+    The tail of each chunk is kept until the next one arrives so that emails split across chunks are not lost.
+    """
+
+    __slots__ = ('_buffer', '_ignored_emails')
+
+    _pattern: Pattern = re.compile(r'[\w\-][\w\-\.]+@[\w\-][\w\-\.]+(?:com|gr)', re.MULTILINE)
+    _max_email_length: int = 256
+    _buffer: str
+    _ignored_emails: List[str]
+
+    def __init__(self, ignored_emails: List[str] = None) -> None:
+        """
+        The basic constructor. Creates a new EmailsExtractor that skips the specified emails.
+
+        :param ignored_emails:
+        """
+
+        self._buffer = ''
+        self._ignored_emails = ignored_emails if ignored_emails is not None else []
+
+    def feed(self, data: str) -> List[str]:
+        """
+        Feeds a chunk of html to the scanner and returns the emails completed by it.
+
+        :param data:
+        """
+
+        self._buffer += data
+        return self._scan(final=False)
+
+    def close(self) -> List[str]:
+        """
+        Returns the emails left in the buffer after the last chunk.
+        """
+
+        return self._scan(final=True)
+
+    def _scan(self, final: bool) -> List[str]:
+        scan_limit = len(self._buffer) if final else len(self._buffer) - self._max_email_length
+        if scan_limit <= 0:
+            return []
+        emails = []
+        keep_from = scan_limit
+        for match in self._pattern.finditer(self._buffer):
+            if match.end() > scan_limit:
+                # It may continue in the next chunk
+                keep_from = match.start()
+                break
+            emails.append(match.group())
+        self._buffer = self._buffer[keep_from:]
+        logger.debug("Emails found in html chunk: %s" % emails)
+        return [email for email in emails if email not in self._ignored_emails]
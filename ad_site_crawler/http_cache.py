@@ -0,0 +1,137 @@
+import os
+import json
+import hashlib
+import threading
+import logging
+from typing import Dict, Union
+
+logger = logging.getLogger('HttpCache')
+
+
+class HttpCacheEntry:
+    __slots__ = ('url', 'etag', 'last_modified', 'content_hash')
+
+    url: str
+    etag: Union[str, None]
+    last_modified: Union[str, None]
+    content_hash: Union[str, None]
+
+    def __init__(self, url: str, etag: str = None, last_modified: str = None, content_hash: str = None) -> None:
+        """
+        The basic constructor. Creates a new HttpCacheEntry holding the validators of a url's last response
+        and the hash of the content extracted from it.
+
+        :param url:
+        :param etag:
+        :param last_modified:
+        :param content_hash:
+        """
+
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+
+    def get_conditional_headers(self) -> Dict[str, str]:
+        headers = dict()
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_json(self) -> Dict:
+        return {'url': self.url, 'etag': self.etag, 'last_modified': self.last_modified,
+                'content_hash': self.content_hash}
+
+    @classmethod
+    def from_json(cls, json_data: Dict) -> 'HttpCacheEntry':
+        return cls(url=json_data['url'], etag=json_data.get('etag'), last_modified=json_data.get('last_modified'),
+                   content_hash=json_data.get('content_hash'))
+
+
+class HttpCache:
+    __slots__ = ('cache_folder', 'max_size', '_lock')
+
+    cache_folder: str
+    max_size: int
+    _lock: threading.Lock
+
+    def __init__(self, cache_folder: str, max_size: int = 1024 * 1024) -> None:
+        """
+        The basic constructor. Creates a new on-disk HttpCache that evicts the least recently used entries
+        once its files exceed `max_size` bytes.
+
+        :param cache_folder:
+        :param max_size:
+        """
+
+        self.cache_folder = cache_folder
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+    def get(self, url: str) -> Union[HttpCacheEntry, None]:
+        entry_path = self._get_entry_path(url)
+        with self._lock:
+            try:
+                with open(entry_path, 'r') as entry_file:
+                    entry = HttpCacheEntry.from_json(json.load(entry_file))
+                # Mark it as recently used
+                os.utime(entry_path)
+            except FileNotFoundError:
+                return None
+            except (ValueError, KeyError) as e:
+                logger.warning("Dropping corrupted cache entry for %s: %s" % (url, e))
+                os.remove(entry_path)
+                return None
+        if entry.url != url:
+            return None
+        return entry
+
+    def put(self, entry: HttpCacheEntry) -> None:
+        entry_path = self._get_entry_path(entry.url)
+        with self._lock:
+            # Write to a temporary file first so that a crash never leaves half an entry behind
+            with open(entry_path + '.tmp', 'w') as entry_file:
+                json.dump(entry.to_json(), entry_file)
+            os.replace(entry_path + '.tmp', entry_path)
+            self._evict()
+
+    def remove(self, url: str) -> None:
+        with self._lock:
+            try:
+                os.remove(self._get_entry_path(url))
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        """
+        Removes every entry, e.g. once a link seen before has to be checked again.
+        """
+
+        with self._lock:
+            for entry_name in os.listdir(self.cache_folder):
+                if entry_name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.cache_folder, entry_name))
+                    except FileNotFoundError:
+                        pass
+
+    def _evict(self) -> None:
+        entries = []
+        for entry_name in os.listdir(self.cache_folder):
+            if entry_name.endswith('.json'):
+                entry_stat = os.stat(os.path.join(self.cache_folder, entry_name))
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, entry_name))
+        total_size = sum(entry_size for _, entry_size, _ in entries)
+        # Least recently used first
+        for _, entry_size, entry_name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            logger.debug("Evicting cache entry %s.." % entry_name)
+            os.remove(os.path.join(self.cache_folder, entry_name))
+            total_size -= entry_size
+
+    def _get_entry_path(self, url: str) -> str:
+        return os.path.join(self.cache_folder, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
@@ -0,0 +1,375 @@
+import http.client
+import socket
+import ssl
+import threading
+import time
+import zlib
+import logging
+import urllib.parse
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('HttpTransport')
+
+
+class RequestTiming:
+    __slots__ = ('dns', 'connect', 'tls', 'ttfb', 'body', 'reused_connection')
+
+    dns: float
+    connect: float
+    tls: float
+    ttfb: float
+    body: float
+    reused_connection: bool
+
+    def __init__(self) -> None:
+        """
+        The basic constructor. Creates a new RequestTiming with every phase set to zero seconds.
+        """
+
+        self.dns = 0.0
+        self.connect = 0.0
+        self.tls = 0.0
+        self.ttfb = 0.0
+        self.body = 0.0
+        self.reused_connection = False
+
+    @property
+    def total(self) -> float:
+        return self.dns + self.connect + self.tls + self.ttfb + self.body
+
+    def to_json(self) -> Dict:
+        return {'dns': self.dns, 'connect': self.connect, 'tls': self.tls, 'ttfb': self.ttfb, 'body': self.body,
+                'total': self.total, 'reused_connection': self.reused_connection}
+
+    def __str__(self) -> str:
+        return "dns={:.3f}s connect={:.3f}s tls={:.3f}s ttfb={:.3f}s body={:.3f}s total={:.3f}s reused={}".format(
+            self.dns, self.connect, self.tls, self.ttfb, self.body, self.total, self.reused_connection)
+
+
+class _TimedHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTPConnection that records how long the DNS lookup, the TCP connect and the TLS handshake took.
+    """
+
+    ssl_context: Union[ssl.SSLContext, None]
+    connect_timeout: float
+    read_timeout: float
+    connect_timing: RequestTiming
+
+    def __init__(self, host: str, port: int, ssl_context: ssl.SSLContext = None,
+                 connect_timeout: float = 10, read_timeout: float = 30) -> None:
+        super().__init__(host=host, port=port, timeout=connect_timeout)
+        self.ssl_context = ssl_context
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.connect_timing = RequestTiming()
+
+    def connect(self) -> None:
+        self.connect_timing = RequestTiming()
+        start = time.monotonic()
+        address_infos = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)
+        self.connect_timing.dns = time.monotonic() - start
+        start = time.monotonic()
+        sock = None
+        for family, socket_type, proto, _, socket_address in address_infos:
+            sock = socket.socket(family, socket_type, proto)
+            try:
+                sock.settimeout(self.connect_timeout)
+                sock.connect(socket_address)
+                break
+            except OSError:
+                sock.close()
+                sock = None
+                if socket_address == address_infos[-1][4]:
+                    raise
+        if sock is None:
+            raise OSError("getaddrinfo returned no addresses for %s:%s" % (self.host, self.port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connect_timing.connect = time.monotonic() - start
+        if self.ssl_context is not None:
+            start = time.monotonic()
+            sock = self.ssl_context.wrap_socket(sock, server_hostname=self.host)
+            self.connect_timing.tls = time.monotonic() - start
+        sock.settimeout(self.read_timeout)
+        self.sock = sock
+
+
+class HttpResponse:
+    __slots__ = ('url', 'status', 'headers', 'timing', '_response', '_release', '_decompress', '_flush',
+                 '_fully_read', '_closed')
+
+    url: str
+    status: int
+    headers: http.client.HTTPMessage
+    timing: RequestTiming
+    _response: http.client.HTTPResponse
+    _release: Callable[[bool], None]
+    _decompress: Union[Callable[[bytes], bytes], None]
+    _flush: Union[Callable[[], bytes], None]
+    _fully_read: bool
+    _closed: bool
+    _max_drain_size: int = 65536
+
+    def __init__(self, url: str, response: http.client.HTTPResponse, timing: RequestTiming,
+                 release: Callable[[bool], None]) -> None:
+        """
+        The basic constructor. Wraps an http.client response whose connection is given back
+        to the pool through `release` once the body has been fully read.
+
+        :param url:
+        :param response:
+        :param timing:
+        :param release:
+        """
+
+        self.url = url
+        self.status = response.status
+        self.headers = response.headers
+        self.timing = timing
+        self._response = response
+        self._release = release
+        self._decompress, self._flush = self._get_decompressor(response.getheader('Content-Encoding', ''))
+        self._fully_read = False
+        self._closed = False
+
+    @staticmethod
+    def _get_decompressor(content_encoding: str) -> Tuple[Union[Callable[[bytes], bytes], None],
+                                                          Union[Callable[[], bytes], None]]:
+        content_encoding = content_encoding.strip().lower()
+        if content_encoding in ('gzip', 'x-gzip'):
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            return decompressor.decompress, decompressor.flush
+        elif content_encoding == 'deflate':
+            # Detect the zlib or gzip header automatically
+            decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+            return decompressor.decompress, decompressor.flush
+        elif content_encoding == 'br' and brotli is not None:
+            decompressor = brotli.Decompressor()
+            return decompressor.process, None
+        return None, None
+
+    def getheader(self, name: str, default: str = None) -> str:
+        return self.headers.get(name, default)
+
+    def iter_chunks(self, chunk_size: int = 16384) -> Iterator[bytes]:
+        """
+        Yields the decompressed body in chunks as they arrive.
+
+        :param chunk_size:
+        """
+
+        start = time.monotonic()
+        try:
+            while True:
+                body_bytes = self._response.read1(chunk_size)
+                if not body_bytes:
+                    self._fully_read = True
+                    break
+                if self._decompress is not None:
+                    body_bytes = self._decompress(body_bytes)
+                if body_bytes:
+                    yield body_bytes
+            if self._flush is not None:
+                remaining_bytes = self._flush()
+                if remaining_bytes:
+                    yield remaining_bytes
+        finally:
+            self.timing.body += time.monotonic() - start
+            self.close()
+
+    def read(self) -> bytes:
+        return b''.join(self.iter_chunks())
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if not self._fully_read and not self._response.will_close:
+            self._fully_read = self._drain()
+        # The connection can only be reused if the whole body was consumed
+        reusable = self._fully_read and not self._response.will_close
+        self._response.close()
+        logger.debug("%s %s: %s" % (self.status, self.url, self.timing))
+        self._release(reusable)
+
+    def _drain(self) -> bool:
+        """
+        Reads what is left of an error page that no one is interested in, if it is small enough
+        to be cheaper than a new connection. A response without a body, e.g. a 304, a 204 or one with
+        a Content-Length of 0, has nothing left to read.
+        Returns whether the whole body was read.
+        """
+
+        if self._response.isclosed() or self._response.length == 0:
+            return True
+        # The rest of a page that was only partly read, e.g. past its result list, can be large
+        if self.status < 400 or (self._response.length is not None
+                                 and self._response.length > self._max_drain_size):
+            return False
+        try:
+            self._response.read(self._max_drain_size)
+        except (http.client.HTTPException, OSError):
+            return False
+        return self._response.isclosed()
+
+    def __enter__(self) -> 'HttpResponse':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class HttpTransport:
+    __slots__ = ('_default_headers', '_connect_timeout', '_read_timeout', '_max_idle_connections_per_host',
+                 '_max_redirects', '_ssl_context', '_idle_connections', '_lock', '_stats')
+
+    _default_headers: Dict[str, str]
+    _connect_timeout: float
+    _read_timeout: float
+    _max_idle_connections_per_host: int
+    _max_redirects: int
+    _ssl_context: ssl.SSLContext
+    _idle_connections: Dict[Tuple[str, str, int], List[_TimedHTTPConnection]]
+    _lock: threading.Lock
+    _stats: Dict[str, float]
+    _redirect_statuses: Tuple = (301, 302, 303, 307, 308)
+    _retriable_errors: Tuple = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                                ConnectionResetError, BrokenPipeError)
+
+    def __init__(self, headers: Dict[str, str] = None, connect_timeout: float = 10, read_timeout: float = 30,
+                 max_idle_connections_per_host: int = 4, max_redirects: int = 5) -> None:
+        """
+        The basic constructor. Creates a new HttpTransport that keeps a pool of keep-alive connections per host.
+
+        :param headers: Headers sent with every request
+        :param connect_timeout:
+        :param read_timeout:
+        :param max_idle_connections_per_host:
+        :param max_redirects:
+        """
+
+        self._default_headers = {'Accept-Encoding': 'gzip, deflate' + (', br' if brotli is not None else ''),
+                                 'Connection': 'keep-alive'}
+        if headers is not None:
+            self._default_headers.update(headers)
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._max_idle_connections_per_host = max_idle_connections_per_host
+        self._max_redirects = max_redirects
+        self._ssl_context = ssl.create_default_context()
+        self._idle_connections = dict()
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'reused_connections': 0, 'dns': 0.0, 'connect': 0.0, 'tls': 0.0,
+                       'ttfb': 0.0}
+
+    def request(self, url: str, headers: Dict[str, str] = None) -> HttpResponse:
+        """
+        Sends a GET request, following any redirects, and returns the response with its body not read yet.
+
+        :param url:
+        :param headers:
+        """
+
+        for _ in range(self._max_redirects + 1):
+            response = self._request_once(url=url, headers=headers)
+            if response.status not in self._redirect_statuses or response.getheader('Location') is None:
+                return response
+            # Drain the body so that the connection can be reused
+            location = response.getheader('Location')
+            response.read()
+            logger.debug("Redirected from %s to %s" % (url, location))
+            url = urllib.parse.urljoin(url, location)
+        raise HttpTransportError("Too many redirects for url: %s" % url)
+
+    def _request_once(self, url: str, headers: Dict[str, str] = None) -> HttpResponse:
+        url_parts = urllib.parse.urlsplit(url)
+        pool_key = (url_parts.scheme, url_parts.hostname,
+                    url_parts.port or (443 if url_parts.scheme == 'https' else 80))
+        path = url_parts.path or '/'
+        if url_parts.query:
+            path += '?' + url_parts.query
+        request_headers = dict(self._default_headers)
+        if headers is not None:
+            request_headers.update(headers)
+        connection, reused = self._get_connection(pool_key)
+        try:
+            timing = RequestTiming()
+            timing.reused_connection = reused
+            start = time.monotonic()
+            connection.request('GET', path, headers=request_headers)
+            raw_response = connection.getresponse()
+        except self._retriable_errors:
+            connection.close()
+            if not reused:
+                raise
+            # The server closed the idle connection in the meantime, retry on a new one
+            logger.debug("Idle connection to %s was closed by the server, reconnecting.." % url_parts.hostname)
+            return self._request_once(url=url, headers=headers)
+        except Exception:
+            connection.close()
+            raise
+        connect_timing = connection.connect_timing
+        if not reused:
+            timing.dns, timing.connect, timing.tls = connect_timing.dns, connect_timing.connect, connect_timing.tls
+        timing.ttfb = time.monotonic() - start - (timing.dns + timing.connect + timing.tls)
+        self._add_to_stats(timing)
+
+        def release(reusable: bool) -> None:
+            if reusable:
+                self._put_connection(pool_key, connection)
+            else:
+                connection.close()
+
+        return HttpResponse(url=url, response=raw_response, timing=timing, release=release)
+
+    def _get_connection(self, pool_key: Tuple[str, str, int]) -> Tuple[_TimedHTTPConnection, bool]:
+        with self._lock:
+            idle_connections = self._idle_connections.get(pool_key)
+            if idle_connections:
+                return idle_connections.pop(), True
+        scheme, host, port = pool_key
+        connection = _TimedHTTPConnection(host=host, port=port,
+                                          ssl_context=self._ssl_context if scheme == 'https' else None,
+                                          connect_timeout=self._connect_timeout, read_timeout=self._read_timeout)
+        return connection, False
+
+    def _put_connection(self, pool_key: Tuple[str, str, int], connection: _TimedHTTPConnection) -> None:
+        with self._lock:
+            idle_connections = self._idle_connections.setdefault(pool_key, [])
+            if len(idle_connections) < self._max_idle_connections_per_host:
+                idle_connections.append(connection)
+                return
+        connection.close()
+
+    def _add_to_stats(self, timing: RequestTiming) -> None:
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['reused_connections'] += int(timing.reused_connection)
+            for phase in ('dns', 'connect', 'tls', 'ttfb'):
+                self._stats[phase] += getattr(timing, phase)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Returns the number of requests, the reused connections and the total seconds spent in each phase.
+        """
+
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self) -> None:
+        with self._lock:
+            for idle_connections in self._idle_connections.values():
+                for connection in idle_connections:
+                    connection.close()
+            self._idle_connections = dict()
+
+
+class HttpTransportError(Exception):
+    def __init__(self, message):
+        # Call the base class constructor with the parameters it needs
+        super().__init__(message)
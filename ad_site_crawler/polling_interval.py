@@ -0,0 +1,112 @@
+import datetime
+import threading
+import logging
+from typing import Iterable, List
+
+logger = logging.getLogger('PollingInterval')
+
+
+class PollingInterval:
+    __slots__ = ('base_interval', 'min_interval', 'max_interval', 'adaptive', '_arrivals_per_hour',
+                 '_consecutive_errors', '_retry_after', '_lock')
+
+    base_interval: float
+    min_interval: float
+    max_interval: float
+    adaptive: bool
+    _arrivals_per_hour: List[int]
+    _consecutive_errors: int
+    _retry_after: float
+    _lock: threading.Lock
+
+    def __init__(self, base_interval: float, min_interval: float = None, max_interval: float = None,
+                 adaptive: bool = True) -> None:
+        """
+        The basic constructor. Creates a new PollingInterval that learns how many ads arrive in each hour
+        of the day (UTC) and polls more often in the busy hours and less often in the quiet ones.
+        After an error it backs off exponentially until the next successful check.
+
+        :param base_interval: The interval of an hour with an average number of arrivals
+        :param min_interval: The shortest interval, the base one if not set
+        :param max_interval: The longest interval, eight times the base one if not set
+        :param adaptive: Whether to adapt to the arrivals or only back off after errors
+        """
+
+        self.base_interval = base_interval
+        self.min_interval = min_interval if min_interval is not None else base_interval
+        self.max_interval = max_interval if max_interval is not None else 8 * base_interval
+        self.adaptive = adaptive
+        self._arrivals_per_hour = [0] * 24
+        self._consecutive_errors = 0
+        self._retry_after = 0.0
+        self._lock = threading.Lock()
+
+    def learn(self, arrival_times: Iterable[datetime.datetime]) -> None:
+        """
+        Adds the specified ad arrivals (e.g. the sent_on of the applications sent) to the ones already learned.
+
+        :param arrival_times: UTC datetimes
+        """
+
+        with self._lock:
+            for arrival_time in arrival_times:
+                self._arrivals_per_hour[arrival_time.hour] += 1
+        logger.debug("Arrivals per hour: %s" % self._arrivals_per_hour)
+
+    def record_success(self, new_ads: int = 0, now: datetime.datetime = None) -> None:
+        """
+        Records a successful check that found the specified number of new ads.
+
+        :param new_ads:
+        :param now: UTC datetime
+        """
+
+        if now is None:
+            now = datetime.datetime.utcnow()
+        with self._lock:
+            self._arrivals_per_hour[now.hour] += new_ads
+            self._consecutive_errors = 0
+            self._retry_after = 0.0
+
+    def record_error(self, retry_after: float = None) -> None:
+        """
+        Records a failed check.
+
+        :param retry_after: The seconds the server asked to wait before the next request, if any
+        """
+
+        with self._lock:
+            self._consecutive_errors += 1
+            self._retry_after = retry_after if retry_after is not None else 0.0
+
+    def get_interval(self, now: datetime.datetime = None) -> float:
+        """
+        Returns the seconds to wait before the next check.
+
+        :param now: UTC datetime
+        """
+
+        if now is None:
+            now = datetime.datetime.utcnow()
+        with self._lock:
+            if self._consecutive_errors > 0:
+                backoff_interval = min(self.max_interval,
+                                       self.base_interval * 2 ** min(self._consecutive_errors, 16))
+                # Never ask again before the server allows it
+                return max(backoff_interval, self._retry_after)
+            if not self.adaptive:
+                return self.base_interval
+            # The arrival rate of this hour relative to the average one, smoothed so that
+            # an hour without arrivals yet doesn't stop the polling
+            total_arrivals = sum(self._arrivals_per_hour)
+            hour_arrivals = self._arrivals_per_hour[now.hour]
+            relative_rate = 24 * (hour_arrivals + 1) / (total_arrivals + 24)
+        return min(self.max_interval, max(self.min_interval, self.base_interval / relative_rate))
+
+    @property
+    def consecutive_errors(self) -> int:
+        return self._consecutive_errors
+
+    def __repr__(self) -> str:
+        return "PollingInterval(base_interval=%s, min_interval=%s, max_interval=%s, adaptive=%s)" % (
+            self.base_interval, self.min_interval, self.max_interval, self.adaptive)
@@ -0,0 +1,91 @@
+import datetime
+import threading
+import logging
+from typing import Callable, Dict, Iterable, Tuple, Union
+
+logger = logging.getLogger('RejectedAds')
+
+
+class RejectedAds:
+    __slots__ = ('ttl', '_on_rejected', '_expires_on', '_lock')
+
+    ttl: Union[float, None]
+    _on_rejected: Union[Callable[[Dict], None], None]
+    _expires_on: Dict[str, Union[datetime.datetime, None]]
+    _lock: threading.Lock
+
+    def __init__(self, ttl: float = None, on_rejected: Callable[[Dict], None] = None) -> None:
+        """
+        The basic constructor. Creates a new RejectedAds negative cache of the ads that shouldn't be fetched again,
+        e.g. because they contain stop words, for `ttl` seconds.
+
+        :param ttl: The seconds a rejection lasts, forever if not set
+        :param on_rejected: Called with the link, reason, rejected_on and expires_on of each new rejection,
+                            e.g. to save it
+        """
+
+        self.ttl = ttl
+        self._on_rejected = on_rejected
+        self._expires_on = {}
+        self._lock = threading.Lock()
+
+    def load(self, rejected_ads: Iterable[Tuple[str, Union[datetime.datetime, None]]]) -> None:
+        """
+        Adds the rejections saved before.
+
+        :param rejected_ads: The link and the UTC expiration datetime, None if it never expires, of each rejection
+        """
+
+        with self._lock:
+            for link, expires_on in rejected_ads:
+                self._expires_on[link] = expires_on
+        logger.debug("Loaded %s rejected ads" % len(self._expires_on))
+
+    def add(self, link: str, reason: str, now: datetime.datetime = None) -> None:
+        """
+        Rejects the ad for the next `ttl` seconds.
+
+        :param link:
+        :param reason: Why it was rejected, e.g. the stop words found
+        :param now: UTC datetime
+        """
+
+        if now is None:
+            now = datetime.datetime.utcnow()
+        expires_on = now + datetime.timedelta(seconds=self.ttl) if self.ttl is not None else None
+        with self._lock:
+            self._expires_on[link] = expires_on
+        if self._on_rejected is not None:
+            try:
+                self._on_rejected({'link': link, 'reason': reason, 'rejected_on': now.isoformat(),
+                                   'expires_on': expires_on.isoformat() if expires_on is not None else None})
+            except Exception as e:
+                # It is still rejected for as long as the process runs
+                logger.error("Failed to save the rejection of %s: %s" % (link, e))
+
+    def is_rejected(self, link: str, now: datetime.datetime = None) -> bool:
+        """
+        Returns whether the ad is rejected, forgetting its rejection if it has expired.
+
+        :param link:
+        :param now: UTC datetime
+        """
+
+        with self._lock:
+            if link not in self._expires_on:
+                return False
+            expires_on = self._expires_on[link]
+            if expires_on is None:
+                return True
+            if now is None:
+                now = datetime.datetime.utcnow()
+            if expires_on > now:
+                return True
+            del self._expires_on[link]
+            return False
+
+    def __contains__(self, link: str) -> bool:
+        return self.is_rejected(link)
+
+    def __len__(self) -> int:
+        return len(self._expires_on)
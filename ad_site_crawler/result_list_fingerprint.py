@@ -0,0 +1,128 @@
+import os
+import json
+import hashlib
+import threading
+import logging
+from typing import Dict, Iterable, List, Set
+
+logger = logging.getLogger('ResultListFingerprint')
+
+
+class ResultListFingerprint:
+    __slots__ = ('lookup_url', 'link_hashes', '_link_hashes_set')
+
+    lookup_url: str
+    link_hashes: List[str]
+    _link_hashes_set: Set[str]
+    _hash_length: int = 16
+
+    def __init__(self, lookup_url: str, link_hashes: List[str] = None) -> None:
+        """
+        The basic constructor. Creates a new ResultListFingerprint holding the short hashes of the links
+        of a search page's result list, in the order they were seen.
+
+        :param lookup_url:
+        :param link_hashes:
+        """
+
+        self.lookup_url = lookup_url
+        self.link_hashes = link_hashes if link_hashes is not None else []
+        self._link_hashes_set = set(self.link_hashes)
+
+    @classmethod
+    def hash_link(cls, link: str) -> str:
+        return hashlib.sha1(link.encode('utf-8')).hexdigest()[:cls._hash_length]
+
+    def __contains__(self, link: str) -> bool:
+        return self.hash_link(link) in self._link_hashes_set
+
+    def __len__(self) -> int:
+        return len(self.link_hashes)
+
+    def updated(self, walked_links: Iterable[str]) -> 'ResultListFingerprint':
+        """
+        Returns the fingerprint of the result list after the specified links were walked from its top.
+        The links that weren't walked are assumed to follow them in their previous order.
+
+        :param walked_links: The links of the top of the result list, in order
+        """
+
+        link_hashes = []
+        link_hashes_set = set()
+        for link_hash in [self.hash_link(link) for link in walked_links] + self.link_hashes:
+            if link_hash not in link_hashes_set:
+                link_hashes.append(link_hash)
+                link_hashes_set.add(link_hash)
+        return ResultListFingerprint(lookup_url=self.lookup_url, link_hashes=link_hashes)
+
+    def to_json(self) -> Dict:
+        return {'lookup_url': self.lookup_url, 'link_hashes': self.link_hashes}
+
+    @classmethod
+    def from_json(cls, json_data: Dict) -> 'ResultListFingerprint':
+        return cls(lookup_url=json_data['lookup_url'], link_hashes=list(json_data['link_hashes']))
+
+
+class ResultListFingerprintStore:
+    __slots__ = ('fingerprints_folder', 'max_links', '_lock')
+
+    fingerprints_folder: str
+    max_links: int
+    _lock: threading.Lock
+
+    def __init__(self, fingerprints_folder: str, max_links: int = 500) -> None:
+        """
+        The basic constructor. Creates a new on-disk ResultListFingerprintStore that keeps
+        one fingerprint of at most `max_links` links per lookup url.
+
+        :param fingerprints_folder:
+        :param max_links:
+        """
+
+        self.fingerprints_folder = fingerprints_folder
+        self.max_links = max_links
+        self._lock = threading.Lock()
+        os.makedirs(self.fingerprints_folder, exist_ok=True)
+
+    def get(self, lookup_url: str) -> ResultListFingerprint:
+        """
+        Returns the fingerprint of the last completed check of the lookup url, empty if there is none.
+
+        :param lookup_url:
+        """
+
+        fingerprint_path = self._get_fingerprint_path(lookup_url)
+        with self._lock:
+            try:
+                with open(fingerprint_path, 'r') as fingerprint_file:
+                    fingerprint = ResultListFingerprint.from_json(json.load(fingerprint_file))
+            except FileNotFoundError:
+                return ResultListFingerprint(lookup_url=lookup_url)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning("Dropping corrupted fingerprint for %s: %s" % (lookup_url, e))
+                os.remove(fingerprint_path)
+                return ResultListFingerprint(lookup_url=lookup_url)
+        if fingerprint.lookup_url != lookup_url:
+            return ResultListFingerprint(lookup_url=lookup_url)
+        return fingerprint
+
+    def put(self, fingerprint: ResultListFingerprint) -> None:
+        fingerprint_path = self._get_fingerprint_path(fingerprint.lookup_url)
+        fingerprint_json = fingerprint.to_json()
+        fingerprint_json['link_hashes'] = fingerprint_json['link_hashes'][:self.max_links]
+        with self._lock:
+            # Write to a temporary file first so that a crash never leaves half a fingerprint behind
+            with open(fingerprint_path + '.tmp', 'w') as fingerprint_file:
+                json.dump(fingerprint_json, fingerprint_file)
+            os.replace(fingerprint_path + '.tmp', fingerprint_path)
+
+    def remove(self, lookup_url: str) -> None:
+        with self._lock:
+            try:
+                os.remove(self._get_fingerprint_path(lookup_url))
+            except FileNotFoundError:
+                pass
+
+    def _get_fingerprint_path(self, lookup_url: str) -> str:
+        return os.path.join(self.fingerprints_folder,
+                            hashlib.sha1(lookup_url.encode('utf-8')).hexdigest() + '.json')
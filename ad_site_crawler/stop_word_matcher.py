@@ -0,0 +1,80 @@
+import re
+import logging
+from typing import Dict, List, Pattern, Set, Union
+from unidecode import unidecode
+
+logger = logging.getLogger('StopWordMatcher')
+
+
+class StopWordMatcher:
+    __slots__ = ('_stop_words', '_contained_words', '_pattern', '_overlapping_pattern')
+
+    _stop_words: Dict[str, str]
+    _contained_words: Dict[str, Set[str]]
+    _pattern: Union[Pattern, None]
+    _overlapping_pattern: Union[Pattern, None]
+
+    def __init__(self, stop_words: List[str]) -> None:
+        """
+        The basic constructor. Normalizes the stop words and compiles them into a single regex
+        so that each page is normalized and scanned only once.
+
+        :param stop_words:
+        """
+
+        # Map each normalized stop word back to the original one, for logging
+        self._stop_words = {self.normalize(word): word for word in stop_words if word.strip() != ''}
+        # A match of a word is also a match of every stop word contained in it (e.g. javascript -> java)
+        self._contained_words = {word: {other_word for other_word in self._stop_words if other_word in word}
+                                 for word in self._stop_words}
+        if len(self._stop_words) > 0:
+            # Longer words first so that the longest word wins when two of them start at the same position
+            alternatives = '|'.join(re.escape(word) for word in sorted(self._stop_words, key=len, reverse=True))
+            self._pattern = re.compile(alternatives)
+            self._overlapping_pattern = re.compile('(?=({alternatives}))'.format(alternatives=alternatives))
+        else:
+            self._pattern = None
+            self._overlapping_pattern = None
+        logger.debug("Compiled %s stop words." % len(self._stop_words))
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return unidecode(text).lower()
+
+    def matches(self, text: str, normalized: bool = False) -> bool:
+        """
+        Returns True as soon as any stop word is found in the text.
+
+        :param text:
+        :param normalized: Whether the text has already been normalized
+        """
+
+        if self._pattern is None:
+            return False
+        if not normalized:
+            text = self.normalize(text)
+        return self._pattern.search(text) is not None
+
+    def find_matches(self, text: str, normalized: bool = False) -> Set[str]:
+        """
+        Returns the (original) stop words that were found in the text.
+
+        :param text:
+        :param normalized: Whether the text has already been normalized
+        """
+
+        if self._overlapping_pattern is None:
+            return set()
+        if not normalized:
+            text = self.normalize(text)
+        matched_words = set()
+        for word in set(self._overlapping_pattern.findall(text)):
+            matched_words.update(self._contained_words[word])
+        return {self._stop_words[word] for word in matched_words}
+
+    @property
+    def max_word_length(self) -> int:
+        return max((len(word) for word in self._stop_words), default=0)
+
+    def __len__(self) -> int:
+        return len(self._stop_words)
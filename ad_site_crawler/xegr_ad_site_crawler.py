@@ -1,45 +1,100 @@
-import urllib.request, urllib.error, urllib.parse
-from typing import List, Tuple, Union
-import time
-import re
-import time
+import urllib.parse
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Union
+import codecs
+import email.utils
+import hashlib
 import logging
-from unidecode import unidecode
+import time
 
 from .abstract_ad_site_crawler import AbstractAdSiteCrawler
+from .fetch_engine import FetchEngine
+from .html_extractors import AdLinksExtractor, EmailsExtractor
+from .http_cache import HttpCache, HttpCacheEntry
+from .http_transport import HttpResponse, HttpTransport
+from .rejected_ads import RejectedAds
+from .result_list_fingerprint import ResultListFingerprint, ResultListFingerprintStore
+from .stop_word_matcher import StopWordMatcher
 
 logger = logging.getLogger('XeGrAdSiteCrawler')
 
 
 class XeGrAdSiteCrawler(AbstractAdSiteCrawler):
-    __slots__ = ('_stop_words', '_ad_site_url', '_anchor_class_name')
+    __slots__ = ('_stop_words', '_stop_word_matcher', '_ad_site_url', '_anchor_class_name', '_fetch_engine',
+                 '_http_transport', '_http_cache', '_fingerprint_store', '_known_links_to_stop', '_max_pages',
+                 '_page_param', '_rejected_ads')
 
     _stop_words: List[str]
+    _stop_word_matcher: StopWordMatcher
     _ad_site_url: str
     _anchor_class_name: str
+    _fetch_engine: FetchEngine
+    _http_transport: HttpTransport
+    _http_cache: Union[HttpCache, None]
+    _fingerprint_store: Union[ResultListFingerprintStore, None]
+    _known_links_to_stop: int
+    _max_pages: int
+    _page_param: str
+    _rejected_ads: RejectedAds
     _ignored_emails: List = ['email@paroxos.com']
+    _user_agent: str = 'Mozilla/5.0 (X11; Linux x86_64; rv:31.0) Gecko/20100101 Firefox/31.0 Iceweasel/31.8.0'
 
-    def __init__(self, stop_words: List, ad_site_url: str = "https://www.xe.gr", anchor_class_name='result-list-narrow-item'):
+    def __init__(self, stop_words: List, ad_site_url: str = "https://www.xe.gr", anchor_class_name='result-list-narrow-item',
+                 crawl_concurrency: int = 2, crawl_burst: int = 3, http_connect_timeout: int = 10,
+                 http_read_timeout: int = 30, http_transport: HttpTransport = None, http_cache: HttpCache = None,
+                 fingerprint_store: ResultListFingerprintStore = None, known_links_to_stop: int = 3,
+                 max_pages: int = 1, page_param: str = 'page', rejected_ads: RejectedAds = None):
         """
         Tha basic constructor. Creates a new instance of AdSiteCrawler using the specified credentials
 
         :param stop_words:
+        :param ad_site_url:
+        :param anchor_class_name:
+        :param crawl_concurrency: The maximum number of ad pages fetched concurrently
+        :param crawl_burst: The number of ad pages that can be fetched before the crawl_interval pacing kicks in
+        :param http_connect_timeout:
+        :param http_read_timeout:
+        :param http_transport: The transport to send the requests with, overrides the timeouts
+        :param http_cache: The cache used to skip the checks when the search page hasn't changed
+        :param fingerprint_store: The store of the result lists seen, used to walk only their new links
+        :param known_links_to_stop: The number of links seen before in a row that ends the result list walk
+        :param max_pages: The maximum number of result pages to walk in each check
+        :param page_param: The query parameter of the search page that selects the result page
+        :param rejected_ads: The ads not to fetch again, an in-memory cache if not set
         """
 
         logger.debug("Initializing with stop_words: %s" % stop_words)
         self._ad_site_url = ad_site_url
         self._stop_words = stop_words
+        self._stop_word_matcher = StopWordMatcher(stop_words=stop_words)
         self._anchor_class_name = anchor_class_name
+        self._fetch_engine = FetchEngine(max_concurrency_per_host=crawl_concurrency, burst=crawl_burst)
+        if http_transport is None:
+            http_transport = HttpTransport(headers={'User-Agent': self._user_agent},
+                                           connect_timeout=http_connect_timeout, read_timeout=http_read_timeout,
+                                           max_idle_connections_per_host=crawl_concurrency + 1)
+        self._http_transport = http_transport
+        self._http_cache = http_cache
+        self._fingerprint_store = fingerprint_store
+        self._known_links_to_stop = known_links_to_stop
+        self._max_pages = max(max_pages, 1)
+        self._page_param = page_param
+        self._rejected_ads = rejected_ads if rejected_ads is not None else RejectedAds()
         super().__init__()
 
-    def get_new_ads(self, lookup_url: str, ads_checked: List, crawl_interval: int = 15) -> Tuple[str, Union[None, str]]:
+    def get_new_ads(self, lookup_url: str, ads_checked: Set[str], crawl_interval: int = 15,
+                    anchor_class_name: str = None) -> Tuple[str, Union[None, str]]:
         """
-        Retrieves each sub-link's html, searches and yields an email for each of them.
+        Retrieves each new sub-link's html concurrently, searches and yields an email for each of them
+        in the order they appear in the search page.
 
         :param lookup_url:
-        :param ads_checked:
+        :param ads_checked: The set of links already checked, new ads are added to it
+        :param crawl_interval: The average seconds between two ad page requests
+        :param anchor_class_name: The anchor class of this search page, the crawler's one if not set
         """
 
+        if anchor_class_name is None:
+            anchor_class_name = self._anchor_class_name
         if self._ad_site_url not in lookup_url:
             raise AdSiteCrawlerError(
                 "The lookup_url: %s is not supported. The domain should be: %s" % (lookup_url, self._ad_site_url))
@@ -47,10 +102,79 @@ class XeGrAdSiteCrawler(AbstractAdSiteCrawler):
             logger.warning("The lookup_url doesn't contain http:// or https://! Adding https:// ..")
             lookup_url = 'https://' + lookup_url
 
-        logger.debug("ads_checked: %s" % ads_checked)
-        search_page_html = self._retrieve_html_from_url(lookup_url)
-        # Search for links in the main page's html, retrieve their html and look for emails inside them
-        for ad_link in self._find_links_in_html(html_data=search_page_html, anchor_class_name=self._anchor_class_name):
+        logger.debug("ads_checked: %s links" % len(ads_checked))
+        # Everything before the ad pages retrieval costs exactly one request.
+        # Ask for the search page only if it changed since the last completed check
+        http_cache_entry = self._http_cache.get(lookup_url) if self._http_cache is not None else None
+        conditional_headers = http_cache_entry.get_conditional_headers() if http_cache_entry is not None else None
+        # The search pages share the per-host limits with the ad pages
+        # A failed search page is raised, so that the next check can back off
+        search_page_response = self._fetch_engine.fetch(
+            fetch_func=lambda url: self._request(url=url, headers=conditional_headers, raise_errors=True),
+            url=lookup_url, interval=crawl_interval)
+        if search_page_response.status == 304:
+            search_page_response.close()
+            logger.debug("The search page wasn't modified since the last check.")
+            return
+        # Search for links while the search page is streamed and keep only the ones not checked yet.
+        # New ads show up at the top of the result list, so stop walking it once it reaches the links seen before
+        fingerprint = self._fingerprint_store.get(lookup_url) if self._fingerprint_store is not None else None
+        result_list = []
+        new_ad_links = []
+        new_ad_links_set = set()
+        ad_links = self._stream_links_from_response(response=search_page_response,
+                                                    anchor_class_name=anchor_class_name)
+        reached_known_links, page_new_ads = self._walk_result_list(
+            ad_links=ad_links, fingerprint=fingerprint, ads_checked=ads_checked, result_list=result_list,
+            new_ad_links=new_ad_links, new_ad_links_set=new_ad_links_set)
+        ad_links.close()
+        result_list_hash = hashlib.sha1('\n'.join(result_list).encode('utf-8')).hexdigest()
+        # An unchanged result list may still have links that weren't saved, or were un-checked since then
+        if http_cache_entry is not None and http_cache_entry.content_hash == result_list_hash and \
+                len(new_ad_links) == 0:
+            logger.debug("The result list hasn't changed since the last check.")
+            return
+        if not reached_known_links and page_new_ads > 0 and self._max_pages > 1:
+            # The new ads may have pushed others to the next pages
+            self._walk_next_result_pages(lookup_url=lookup_url, anchor_class_name=anchor_class_name,
+                                         crawl_interval=crawl_interval, fingerprint=fingerprint,
+                                         ads_checked=ads_checked, result_list=result_list,
+                                         new_ad_links=new_ad_links, new_ad_links_set=new_ad_links_set)
+        if len(new_ad_links) == 0:
+            logger.debug("No new ads found in the search page.")
+        else:
+            logger.debug("Found %s new ads in the search page." % len(new_ad_links))
+            yield from self._check_new_ads(new_ad_links=new_ad_links, ads_checked=ads_checked,
+                                           crawl_interval=crawl_interval)
+        # Only a completed check may be skipped next time
+        if self._fingerprint_store is not None:
+            self._fingerprint_store.put(fingerprint.updated(walked_links=result_list))
+        if self._http_cache is not None:
+            self._http_cache.put(HttpCacheEntry(url=lookup_url,
+                                                etag=search_page_response.getheader('ETag'),
+                                                last_modified=search_page_response.getheader('Last-Modified'),
+                                                content_hash=result_list_hash))
+
+    def _walk_result_list(self, ad_links: Iterable[str], fingerprint: Union[ResultListFingerprint, None],
+                          ads_checked: Set[str], result_list: List[str], new_ad_links: List[str],
+                          new_ad_links_set: Set[str]) -> Tuple[bool, int]:
+        """
+        Walks the links of a result page, appending them to the result_list and the new ones to the new_ad_links.
+        Returns whether the walk reached the links seen in the last check and how many new ads it found.
+        The walk stops at `known_links_to_stop` links in a row that were both in the last result list
+        and checked or rejected.
+
+        :param ad_links:
+        :param fingerprint: The result list of the last check
+        :param ads_checked:
+        :param result_list:
+        :param new_ad_links:
+        :param new_ad_links_set:
+        """
+
+        known_links_in_a_row = 0
+        page_new_ads = 0
+        for ad_link in ad_links:
             logger.debug("Input ad_link: %s" % ad_link)
             ad_linked_parsed = urllib.parse.quote(ad_link)
             if ad_linked_parsed[:4] != 'http':
@@ -58,19 +182,110 @@ class XeGrAdSiteCrawler(AbstractAdSiteCrawler):
             else:
                 full_sub_link = ad_link
             logger.debug("Checking constructed full_sub_link: %s" % full_sub_link)
-            # Wait before checking next link to avoid bot ban
-            logger.debug("Sleeping for crawl_interval={crawl_interval} seconds..".format(crawl_interval=crawl_interval))
-            time.sleep(crawl_interval)
+            result_list.append(full_sub_link)
             if full_sub_link in ads_checked:
                 logger.debug("It is in ads_checked, skipping..")
+            elif full_sub_link in self._rejected_ads:
+                logger.debug("It was rejected before, skipping..")
+            else:
+                known_links_in_a_row = 0
+                if full_sub_link not in new_ad_links_set:
+                    new_ad_links.append(full_sub_link)
+                    new_ad_links_set.add(full_sub_link)
+                    page_new_ads += 1
                 continue
-            ad_page_html = self._retrieve_html_from_url(full_sub_link)
-            if any(unidecode(word).lower() in unidecode(ad_page_html).lower() for word in self._stop_words):
-                logger.debug("It contains one of the stop words, skipping..")
+            # The fingerprint only ends the walk, a link seen in the last check whose ad wasn't saved is checked again
+            if fingerprint is not None and full_sub_link in fingerprint:
+                known_links_in_a_row += 1
+                if known_links_in_a_row >= self._known_links_to_stop:
+                    logger.debug("Reached the links seen before, skipping the rest of the result list..")
+                    return True, page_new_ads
+            else:
+                known_links_in_a_row = 0
+        return False, page_new_ads
+
+    def _walk_next_result_pages(self, lookup_url: str, anchor_class_name: str, crawl_interval: int,
+                                fingerprint: Union[ResultListFingerprint, None], ads_checked: Set[str],
+                                result_list: List[str], new_ad_links: List[str], new_ad_links_set: Set[str]) -> None:
+        """
+        Retrieves the result pages after the first one concurrently and walks them in order,
+        until a page contains only known links. The pages not requested by then are cancelled.
+
+        :param lookup_url:
+        :param anchor_class_name:
+        :param crawl_interval:
+        :param fingerprint:
+        :param ads_checked:
+        :param result_list:
+        :param new_ad_links:
+        :param new_ad_links_set:
+        """
+
+        page_urls = [self._get_page_url(lookup_url=lookup_url, page=page) for page in range(2, self._max_pages + 1)]
+        pages_links = self._fetch_engine.map(
+            fetch_func=lambda page_url: self._retrieve_links_from_url(url=page_url,
+                                                                      anchor_class_name=anchor_class_name),
+            urls=page_urls, interval=crawl_interval)
+        try:
+            for page_url, page_links in zip(page_urls, pages_links):
+                reached_known_links, page_new_ads = self._walk_result_list(
+                    ad_links=page_links, fingerprint=fingerprint, ads_checked=ads_checked, result_list=result_list,
+                    new_ad_links=new_ad_links, new_ad_links_set=new_ad_links_set)
+                logger.debug("Found %s new ads in the result page: %s" % (page_new_ads, page_url))
+                if reached_known_links or page_new_ads == 0:
+                    break
+        finally:
+            pages_links.close()
+
+    def _get_page_url(self, lookup_url: str, page: int) -> str:
+        """
+        Returns the url of the specified result page of the search page.
+
+        :param lookup_url:
+        :param page:
+        """
+
+        url_parts = urllib.parse.urlsplit(lookup_url)
+        query = [(key, value) for key, value in urllib.parse.parse_qsl(url_parts.query, keep_blank_values=True)
+                 if key != self._page_param]
+        query.append((self._page_param, str(page)))
+        return urllib.parse.urlunsplit(url_parts._replace(query=urllib.parse.urlencode(query)))
+
+    def _retrieve_links_from_url(self, url: str, anchor_class_name: str) -> List[str]:
+        """
+        Retrieves the sub-links of the result list of the specified url, none if it failed.
+
+        :param url:
+        :param anchor_class_name:
+        """
+
+        response = self._request(url)
+        if response is None:
+            return []
+        return list(self._stream_links_from_response(response=response, anchor_class_name=anchor_class_name))
+
+    def _check_new_ads(self, new_ad_links: List[str], ads_checked: Set[str],
+                       crawl_interval: int) -> Iterator[Tuple[str, Union[None, str]]]:
+        """
+        Scans the new ads' html concurrently, paced by the crawl_interval to avoid bot ban,
+        and yields an email for each of them.
+
+        :param new_ad_links:
+        :param ads_checked:
+        :param crawl_interval:
+        """
+
+        ad_pages_scanned = self._fetch_engine.map(fetch_func=self._scan_ad_page, urls=new_ad_links,
+                                                  interval=crawl_interval)
+        for full_sub_link, (stop_words_found, emails_in_ad_page) in zip(new_ad_links, ad_pages_scanned):
+            if len(stop_words_found) > 0:
+                logger.debug("It contains the stop words %s, skipping.." % stop_words_found)
+                # Don't fetch it again, from any search page
+                self._rejected_ads.add(link=full_sub_link,
+                                       reason="stop words: %s" % ', '.join(sorted(stop_words_found)))
                 continue
             # Add the link inside the check list in order to avoid duplicate ads
-            ads_checked.append(full_sub_link)
-            emails_in_ad_page = self._find_emails_in_html(html_data=ad_page_html)
+            ads_checked.add(full_sub_link)
             if len(emails_in_ad_page) == 0:
                 logger.debug("Found no emails in the ad page, returning None..")
                 yield full_sub_link, None
@@ -78,30 +293,143 @@ class XeGrAdSiteCrawler(AbstractAdSiteCrawler):
                 logger.debug("Found emails in the ad page, returning %s.." % emails_in_ad_page[0])
                 yield full_sub_link, emails_in_ad_page[0]
 
-    @staticmethod
-    def _retrieve_html_from_url(url: str) -> str:
+    def _scan_ad_page(self, url: str) -> Tuple[Set[str], List[str]]:
         """
-        Retrieves full html from the specified url.
+        Streams the html of an ad page and returns the stop words and the emails found in it.
+        The download stops as soon as a stop word is found.
+
+        :param url:
+        """
+
+        emails_extractor = EmailsExtractor(ignored_emails=self._ignored_emails)
+        # Keep the end of the previous chunk so that stop words split across chunks are found
+        overlap_length = self._stop_word_matcher.max_word_length - 1
+        normalized_tail = ''
+        emails = []
+        for html_chunk in self._stream_html_from_url(url):
+            normalized_html_chunk = normalized_tail + self._stop_word_matcher.normalize(html_chunk)
+            if self._stop_word_matcher.matches(normalized_html_chunk, normalized=True):
+                return self._stop_word_matcher.find_matches(normalized_html_chunk, normalized=True), []
+            normalized_tail = normalized_html_chunk[-overlap_length:] if overlap_length > 0 else ''
+            emails += emails_extractor.feed(html_chunk)
+        emails += emails_extractor.close()
+        return set(), emails
+
+    def _stream_links_from_response(self, response: HttpResponse, anchor_class_name: str) -> Iterator[str]:
+        """
+        Streams the html of the response and yields each sub-link as soon as it is parsed.
+        The download stops once the result list is over.
+
+        :param response:
+        :param anchor_class_name:
+        """
+
+        links_extractor = AdLinksExtractor(anchor_class_name=anchor_class_name)
+        for html_chunk in self._stream_html_from_response(response):
+            yield from links_extractor.feed(html_chunk)
+            if links_extractor.done:
+                logger.debug("Reached the end of the result list, skipping the rest of the page..")
+                break
+
+    def _request(self, url: str, headers: Dict[str, str] = None,
+                 raise_errors: bool = False) -> Union[HttpResponse, None]:
+        """
+        Sends a request to the specified url and returns the response, or None if it failed.
 
         :params url:
+        :params headers:
+        :params raise_errors: Raise an AdSiteCrawlerHttpError instead of returning None
         """
 
+        logger.debug("Retrieving html from url: %s .." % url)
         try:
-            logger.debug("Retrieving html from url: %s .." % url)
-            header = {
-                'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:31.0) Gecko/20100101 Firefox/31.0 Iceweasel/31.8.0'}
-            req = urllib.request.Request(url, headers=header)
-            html = urllib.request.urlopen(req).read()
+            response = self._http_transport.request(url, headers=headers)
         except Exception as e:
             logger.error(e)
-            html = 'None'
-        if type(html) is not str:
-            html = html.decode('utf-8')
+            if raise_errors:
+                raise AdSiteCrawlerHttpError("Request failed for url: %s (%s)" % (url, e))
+            return None
+        if response.status >= 400:
+            logger.error("HTTP Error %s for url: %s" % (response.status, url))
+            retry_after = self._parse_retry_after(response.getheader('Retry-After'))
+            response.close()
+            if raise_errors:
+                raise AdSiteCrawlerHttpError("HTTP Error %s for url: %s" % (response.status, url),
+                                             status=response.status, retry_after=retry_after)
+            return None
+        return response
+
+    @staticmethod
+    def _parse_retry_after(retry_after: Union[str, None]) -> Union[float, None]:
+        """
+        Returns the seconds of a Retry-After header, given either in seconds or as an HTTP date.
+
+        :params retry_after:
+        """
+
+        if retry_after is None:
+            return None
+        retry_after = retry_after.strip()
+        if retry_after.isdigit():
+            return float(retry_after)
+        try:
+            retry_date = email.utils.parsedate_tz(retry_after)
+            return max(0.0, email.utils.mktime_tz(retry_date) - time.time())
+        except (TypeError, ValueError, OverflowError):
+            logger.warning("Ignoring the invalid Retry-After: %s" % retry_after)
+            return None
+
+    def _stream_html_from_url(self, url: str) -> Iterator[str]:
+        """
+        Retrieves the html from the specified url and yields it in decoded chunks as they arrive.
+
+        :params url:
+        """
+
+        response = self._request(url)
+        if response is None:
+            yield 'None'
+            return
+        yield from self._stream_html_from_response(response)
+
+    @staticmethod
+    def _stream_html_from_response(response: HttpResponse, chunk_size: int = 16384) -> Iterator[str]:
+        """
+        Yields the html of the response in decoded chunks as they arrive.
+
+        :params response:
+        :params chunk_size:
+        """
+
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        with response:
+            try:
+                for html_bytes in response.iter_chunks(chunk_size=chunk_size):
+                    yield decoder.decode(html_bytes)
+            except Exception as e:
+                logger.error(e)
+        yield decoder.decode(b'', final=True)
+
+    def _retrieve_html_from_url(self, url: str) -> str:
+        """
+        Retrieves full html from the specified url.
+
+        :params url:
+        """
+
+        html = ''.join(self._stream_html_from_url(url))
         logger.debug("HTML retrieved:\n%s" % (html))
         return html
 
+    def get_http_stats(self) -> Dict[str, float]:
+        """
+        Returns the number of requests sent and the total seconds spent in each of their phases.
+        """
+
+        return self._http_transport.get_stats()
+
     @staticmethod
-    def _find_links_in_html(html_data: str, anchor_class_name: str = 'result-list-narrow-item') -> str:
+    def _find_links_in_html(html_data: str, anchor_class_name: str = 'result-list-narrow-item') -> Iterator[str]:
         """
         Searches for sub-link patterns in html and yields each link.
 
@@ -111,15 +439,7 @@ class XeGrAdSiteCrawler(AbstractAdSiteCrawler):
         logger.debug("Using anchor class name=%s" % anchor_class_name)
         logger.debug("Searching for sub-links in html..")
 
-        pattern = re.compile(r"(<a[^<]*class=['\"][\sa-zA-Z\-]*{anchor_class_name}[\sa-zA-Z\-]*['\"][^<]*>)"
-                             .format(anchor_class_name=anchor_class_name))
-        a_tag_captured = pattern.findall(html_data)
-        logger.debug("Anchor captured: %s" % a_tag_captured)
-        for i in a_tag_captured:
-            href_raw = i[str(i).find('href'):]
-            href = href_raw[:href_raw.find(' ')].strip()
-            logger.debug("Href captured: %s, and sliced: %s" % (href, href[6:-1]))
-            yield href[6:-1]
+        yield from AdLinksExtractor(anchor_class_name=anchor_class_name).feed(html_data)
 
     @classmethod
     def _find_emails_in_html(cls, html_data: str) -> List:
@@ -131,13 +451,24 @@ class XeGrAdSiteCrawler(AbstractAdSiteCrawler):
 
         logger.debug("Searching for emails in html..")
 
-        pattern = re.compile(r'[\w\-][\w\-\.]+@[\w\-][\w\-\.]+(?:com|gr)', re.MULTILINE)
-        emails = pattern.findall(html_data)
+        emails_extractor = EmailsExtractor(ignored_emails=cls._ignored_emails)
+        emails = emails_extractor.feed(html_data) + emails_extractor.close()
         logger.debug("All emails found in html: %s" % emails)
-        return [email for email in emails if email not in cls._ignored_emails]
+        return emails
 
 
 class AdSiteCrawlerError(Exception):
     def __init__(self, message):
         # Call the base class constructor with the parameters it needs
         super().__init__(message)
+
+
+class AdSiteCrawlerHttpError(AdSiteCrawlerError):
+    status: Union[int, None]
+    retry_after: Union[float, None]
+
+    def __init__(self, message, status: int = None, retry_after: float = None):
+        # Call the base class constructor with the parameters it needs
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
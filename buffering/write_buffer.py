@@ -0,0 +1,156 @@
+import os
+import json
+import threading
+import logging
+from typing import Callable, Dict, List, Union
+
+logger = logging.getLogger('WriteBuffer')
+
+
+class WriteBuffer:
+    __slots__ = ('_flush_rows', 'journal_path', 'max_rows', 'flush_interval', '_rows', '_lock', '_flush_lock',
+                 '_journal_file', '_stop_event', '_flusher')
+
+    _flush_rows: Callable[[List[Dict]], None]
+    journal_path: str
+    max_rows: int
+    flush_interval: float
+    _rows: List[Dict]
+    _lock: threading.Lock
+    _flush_lock: threading.Lock
+    _journal_file: Union[object, None]
+    _stop_event: threading.Event
+    _flusher: threading.Thread
+
+    def __init__(self, flush_rows: Callable[[List[Dict]], None], journal_path: str, max_rows: int = 50,
+                 flush_interval: float = 30) -> None:
+        """
+        The basic constructor. Creates a new WriteBuffer that keeps the rows added to it in memory and
+        writes them in batches, when `max_rows` of them are buffered, every `flush_interval` seconds and on close.
+        Each row is appended to an fsync'ed journal file before `add` returns, and the rows found in the journal
+        are written again on startup, so that a crash never loses a row that was added.
+
+        :param flush_rows: Writes the specified rows, it should ignore the ones already written
+        :param journal_path:
+        :param max_rows:
+        :param flush_interval:
+        """
+
+        self._flush_rows = flush_rows
+        self.journal_path = journal_path
+        self.max_rows = max(max_rows, 1)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        journal_folder = os.path.dirname(self.journal_path)
+        if journal_folder != '':
+            os.makedirs(journal_folder, exist_ok=True)
+        self._rows = self._read_journal()
+        self._journal_file = open(self.journal_path, 'a')
+        if len(self._rows) > 0:
+            logger.info("Replaying %s rows from the journal (%s).." % (len(self._rows), self.journal_path))
+            self.flush()
+        self._stop_event = threading.Event()
+        self._flusher = threading.Thread(target=self._run_flusher, name='WriteBufferFlusher', daemon=True)
+        self._flusher.start()
+
+    def add(self, row: Dict) -> None:
+        """
+        Journals the row and buffers it, flushing the buffer if it is full.
+        A failed flush is only logged, the rows stay in the journal until the next one succeeds.
+
+        :param row: A json serializable column_name: value dictionary
+        """
+
+        with self._lock:
+            if self._journal_file is None:
+                raise WriteBufferError("The write buffer is closed")
+            self._journal_file.write(json.dumps(row) + '\n')
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())
+            self._rows.append(row)
+            is_full = len(self._rows) >= self.max_rows
+        if is_full:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Failed to flush %s buffered rows: %s" % (self.max_rows, e))
+
+    def flush(self) -> None:
+        """
+        Writes the buffered rows and removes them from the journal.
+        """
+
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._rows)
+            if len(rows) == 0:
+                return
+            logger.debug("Flushing %s rows.." % len(rows))
+            self._flush_rows(rows)
+            with self._lock:
+                # The rows added while flushing were appended after the flushed ones
+                del self._rows[:len(rows)]
+                self._rewrite_journal()
+
+    @property
+    def rows(self) -> List[Dict]:
+        """
+        The rows that haven't been written yet.
+        """
+
+        with self._lock:
+            return list(self._rows)
+
+    def close(self) -> None:
+        """
+        Stops the periodic flushes and flushes the remaining rows.
+        """
+
+        self._stop_event.set()
+        self._flusher.join()
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                if self._journal_file is not None:
+                    self._journal_file.close()
+                    self._journal_file = None
+
+    def _run_flusher(self) -> None:
+        while not self._stop_event.wait(timeout=self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Failed to flush the buffered rows: %s" % e)
+
+    def _read_journal(self) -> List[Dict]:
+        rows = []
+        try:
+            with open(self.journal_path, 'r') as journal_file:
+                for line in journal_file:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        # Only the last line can be half written, by a crash while appending it
+                        logger.warning("Skipping a torn line of the journal (%s)" % self.journal_path)
+        except FileNotFoundError:
+            pass
+        return rows
+
+    def _rewrite_journal(self) -> None:
+        # Write to a temporary file first so that a crash never leaves half a journal behind
+        with open(self.journal_path + '.tmp', 'w') as journal_file:
+            for row in self._rows:
+                journal_file.write(json.dumps(row) + '\n')
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        self._journal_file.close()
+        os.replace(self.journal_path + '.tmp', self.journal_path)
+        self._journal_file = open(self.journal_path, 'a')
+
+
+class WriteBufferError(Exception):
+    def __init__(self, message):
+        # Call the base class constructor with the parameters it needs
+        super().__init__(message)
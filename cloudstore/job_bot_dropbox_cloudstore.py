@@ -12,7 +12,8 @@ logger = logging.getLogger('JobBotDropboxCloudstore')
 class JobBotDropboxCloudstore(DropboxCloudstore):
     __slots__ = ('_handler', 'remote_files_folder', 'local_files_folder',
                  'attachments_names', '_update_attachments', '_update_stop_words',
-                 '_update_application_to_send_email', '_update_inform_success_email', '_update_inform_should_call_email')
+                 '_update_application_to_send_email', '_update_inform_success_email', '_update_inform_should_call_email',
+                 '_update_digest_email')
 
     _handler: Dropbox
     remote_files_folder: str
@@ -23,6 +24,7 @@ class JobBotDropboxCloudstore(DropboxCloudstore):
     _update_application_to_send_email: bool
     _update_inform_success_email: bool
     _update_inform_should_call_email: bool
+    _update_digest_email: bool
 
     def __init__(self, config: Dict, remote_files_folder: str = '/job_bot_xegr') -> None:
         """
@@ -47,6 +49,8 @@ class JobBotDropboxCloudstore(DropboxCloudstore):
             'update_inform_success_email'] if 'update_inform_success_email' in config else False
         self._update_inform_should_call_email = config[
             'update_inform_should_call_email'] if 'update_inform_should_call_email' in config else False
+        self._update_digest_email = config[
+            'update_digest_email'] if 'update_digest_email' in config else False
         super().__init__(config=config)
 
     def get_application_to_send_email_data(self) -> Tuple[str, str]:
@@ -58,6 +62,9 @@ class JobBotDropboxCloudstore(DropboxCloudstore):
     def get_inform_success_email_data(self) -> Tuple[str, str]:
         return self._get_email_data(type='inform_success')
 
+    def get_digest_email_data(self) -> Tuple[str, str]:
+        return self._get_email_data(type='digest')
+
     def get_stop_words_data(self) -> List[str]:
         stop_words_path = os.path.join(self.remote_files_folder, 'stop_words.txt')
         return eval(self.download_file(frompath=stop_words_path))
@@ -93,6 +100,12 @@ class JobBotDropboxCloudstore(DropboxCloudstore):
         else:
             logger.info("The update of inform_success email data was skipped.")
 
+    def update_digest_email_data(self) -> None:
+        if self._update_digest_email:
+            self._update_email_data(type='digest')
+        else:
+            logger.info("The update of digest email data was skipped.")
+
     def update_stop_words_data(self, stop_words_local_file_name: str = 'stop_words.txt') -> None:
         if self._update_stop_words:
             stop_words_remote_path = os.path.join(self.remote_files_folder, 'stop_words.txt')
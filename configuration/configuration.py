@@ -13,16 +13,40 @@ logger = logging.getLogger('Configuration')
 
 class Configuration:
     __slots__ = ('config', 'config_path', 'datastore', 'cloudstore', 'email_app', 'tag',
-                 'check_interval', 'crawl_interval', 'anchor_class_name', 'lookup_url', 'test_mode')
+                 'check_interval', 'adaptive_check_interval', 'min_check_interval', 'max_check_interval',
+                 'crawl_interval', 'crawl_concurrency', 'crawl_burst', 'anchor_class_name',
+                 'http_connect_timeout', 'http_read_timeout', 'cache_folder', 'http_cache_max_size_kb',
+                 'known_links_to_stop', 'rejected_ads_ttl', 'send_delay', 'send_delay_jitter',
+                 'notification_mode', 'digest_window', 'urgent_notifications', 'max_pages', 'page_param',
+                 'lookup_url', 'lookups', 'test_mode')
 
     config: Dict
     config_path: str
     datastore: Dict
     cloudstore: Dict
     email_app: Dict
-    lookup_url: str
+    lookup_url: Union[str, None]
+    lookups: Union[List[Dict], None]
     check_interval: int
+    adaptive_check_interval: bool
+    min_check_interval: int
+    max_check_interval: int
     crawl_interval: int
+    crawl_concurrency: int
+    crawl_burst: int
+    http_connect_timeout: int
+    http_read_timeout: int
+    cache_folder: str
+    http_cache_max_size_kb: int
+    known_links_to_stop: int
+    rejected_ads_ttl: Union[int, None]
+    send_delay: int
+    send_delay_jitter: int
+    notification_mode: str
+    digest_window: int
+    urgent_notifications: List[str]
+    max_pages: int
+    page_param: str
     anchor_class_name: str
     tag: str
     test_mode: bool
@@ -56,20 +80,113 @@ class Configuration:
             self.check_interval = self.config['check_interval']
         else:
             self.check_interval = 120
+        if 'adaptive_check_interval' in self.config.keys():
+            if isinstance(self.config['adaptive_check_interval'], str):
+                self.config['adaptive_check_interval'] = self.config['adaptive_check_interval'].lower() == 'true'
+            self.adaptive_check_interval = self.config['adaptive_check_interval']
+        else:
+            self.adaptive_check_interval = False
+        if 'min_check_interval' in self.config.keys():
+            self.config['min_check_interval'] = int(self.config['min_check_interval'])
+            self.min_check_interval = self.config['min_check_interval']
+        else:
+            self.min_check_interval = 30
+        if 'max_check_interval' in self.config.keys():
+            self.config['max_check_interval'] = int(self.config['max_check_interval'])
+            self.max_check_interval = self.config['max_check_interval']
+        else:
+            self.max_check_interval = 900
         if 'crawl_interval' in self.config.keys():
             self.config['crawl_interval'] = int(self.config['crawl_interval'])
             self.crawl_interval = self.config['crawl_interval']
         else:
             self.crawl_interval = 15
+        if 'crawl_concurrency' in self.config.keys():
+            self.config['crawl_concurrency'] = int(self.config['crawl_concurrency'])
+            self.crawl_concurrency = self.config['crawl_concurrency']
+        else:
+            self.crawl_concurrency = 2
+        if 'crawl_burst' in self.config.keys():
+            self.config['crawl_burst'] = int(self.config['crawl_burst'])
+            self.crawl_burst = self.config['crawl_burst']
+        else:
+            self.crawl_burst = 3
+        if 'http_connect_timeout' in self.config.keys():
+            self.config['http_connect_timeout'] = int(self.config['http_connect_timeout'])
+            self.http_connect_timeout = self.config['http_connect_timeout']
+        else:
+            self.http_connect_timeout = 10
+        if 'http_read_timeout' in self.config.keys():
+            self.config['http_read_timeout'] = int(self.config['http_read_timeout'])
+            self.http_read_timeout = self.config['http_read_timeout']
+        else:
+            self.http_read_timeout = 30
+        if 'cache_folder' in self.config.keys():
+            self.cache_folder = self.config['cache_folder']
+        else:
+            self.cache_folder = 'cache'
+        if 'http_cache_max_size_kb' in self.config.keys():
+            self.config['http_cache_max_size_kb'] = int(self.config['http_cache_max_size_kb'])
+            self.http_cache_max_size_kb = self.config['http_cache_max_size_kb']
+        else:
+            self.http_cache_max_size_kb = 1024
+        if 'known_links_to_stop' in self.config.keys():
+            self.config['known_links_to_stop'] = int(self.config['known_links_to_stop'])
+            self.known_links_to_stop = self.config['known_links_to_stop']
+        else:
+            self.known_links_to_stop = 3
+        if 'rejected_ads_ttl' in self.config.keys():
+            self.config['rejected_ads_ttl'] = int(self.config['rejected_ads_ttl'])
+            # 0 means that the rejections never expire
+            self.rejected_ads_ttl = self.config['rejected_ads_ttl'] if self.config['rejected_ads_ttl'] > 0 else None
+        else:
+            self.rejected_ads_ttl = 2592000
+        if 'send_delay' in self.config.keys():
+            self.config['send_delay'] = int(self.config['send_delay'])
+            self.send_delay = self.config['send_delay']
+        else:
+            self.send_delay = 60
+        if 'send_delay_jitter' in self.config.keys():
+            self.config['send_delay_jitter'] = int(self.config['send_delay_jitter'])
+            self.send_delay_jitter = self.config['send_delay_jitter']
+        else:
+            self.send_delay_jitter = 0
+        if 'notification_mode' in self.config.keys():
+            self.notification_mode = self.config['notification_mode']
+        else:
+            self.notification_mode = 'immediate'
+        if 'digest_window' in self.config.keys():
+            self.config['digest_window'] = int(self.config['digest_window'])
+            self.digest_window = self.config['digest_window']
+        else:
+            self.digest_window = 3600
+        if 'urgent_notifications' in self.config.keys():
+            self.urgent_notifications = self.config['urgent_notifications']
+        else:
+            self.urgent_notifications = []
+        if 'max_pages' in self.config.keys():
+            self.config['max_pages'] = int(self.config['max_pages'])
+            self.max_pages = self.config['max_pages']
+        else:
+            self.max_pages = 1
+        if 'page_param' in self.config.keys():
+            self.page_param = self.config['page_param']
+        else:
+            self.page_param = 'page'
         if 'anchor_class_name' in self.config.keys():
             self.anchor_class_name = self.config['anchor_class_name']
         else:
             self.anchor_class_name = "highlight"
+        if 'lookups' in self.config.keys():
+            for lookup in self.config['lookups']:
+                if isinstance(lookup, dict) and 'check_interval' in lookup.keys():
+                    lookup['check_interval'] = int(lookup['check_interval'])
         logger.debug("Loaded config: %s" % self.config)
         # Validate the config
         validate_json_schema(self.config, configuration_schema)
         # Set the config properties as instance attributes
-        self.lookup_url = self.config['lookup_url']
+        self.lookup_url = self.config['lookup_url'] if 'lookup_url' in self.config.keys() else None
+        self.lookups = self.config['lookups'] if 'lookups' in self.config.keys() else None
         self.tag = self.config['tag']
         all_config_attributes = ('datastore', 'cloudstore', 'email_app')
         for config_attribute in all_config_attributes:
@@ -129,12 +246,30 @@ class Configuration:
             raise TypeError('Config file must be TextIOWrapper or path to a file')
         return config, config_path
 
+    def get_lookups(self) -> List[Dict]:
+        """
+        Returns the search pages to check, each with its lookup_url, check_interval and anchor_class_name.
+        The ones not specified in a lookup are taken from the top level of the configuration.
+        """
+
+        lookups = self.lookups if self.lookups is not None else [{'lookup_url': self.lookup_url}]
+        return [{'lookup_url': lookup['lookup_url'],
+                 'check_interval': lookup.get('check_interval', self.check_interval),
+                 'anchor_class_name': lookup.get('anchor_class_name', self.anchor_class_name)}
+                for lookup in lookups]
+
     def get_datastores(self) -> List:
         if 'datastore' in self.config_attributes:
             return [sub_config['config'] for sub_config in self.datastore]
         else:
             raise ConfigurationError('Config property datastore not set!')
 
+    def get_datastore_types(self) -> List:
+        if 'datastore' in self.config_attributes:
+            return [sub_config['type'] for sub_config in self.datastore]
+        else:
+            raise ConfigurationError('Config property datastore not set!')
+
     def get_cloudstores(self) -> List:
         if 'cloudstore' in self.config_attributes:
             return [sub_config['config'] for sub_config in self.cloudstore]
@@ -160,12 +295,51 @@ class Configuration:
         for config_attribute in self.config_attributes:
             dict_conf[config_attribute] = getattr(self, config_attribute)
 
-        dict_conf['lookup_url'] = self.lookup_url
+        if 'lookup_url' in self.config.keys():
+            dict_conf['lookup_url'] = self.lookup_url
+        if 'lookups' in self.config.keys():
+            dict_conf['lookups'] = self.lookups
         dict_conf['tag'] = self.tag
         if 'check_interval' in self.config.keys():
             dict_conf['check_interval'] = self.check_interval
+        if 'adaptive_check_interval' in self.config.keys():
+            dict_conf['adaptive_check_interval'] = self.adaptive_check_interval
+        if 'min_check_interval' in self.config.keys():
+            dict_conf['min_check_interval'] = self.min_check_interval
+        if 'max_check_interval' in self.config.keys():
+            dict_conf['max_check_interval'] = self.max_check_interval
         if 'crawl_interval' in self.config.keys():
             dict_conf['crawl_interval'] = self.crawl_interval
+        if 'crawl_concurrency' in self.config.keys():
+            dict_conf['crawl_concurrency'] = self.crawl_concurrency
+        if 'crawl_burst' in self.config.keys():
+            dict_conf['crawl_burst'] = self.crawl_burst
+        if 'http_connect_timeout' in self.config.keys():
+            dict_conf['http_connect_timeout'] = self.http_connect_timeout
+        if 'http_read_timeout' in self.config.keys():
+            dict_conf['http_read_timeout'] = self.http_read_timeout
+        if 'cache_folder' in self.config.keys():
+            dict_conf['cache_folder'] = self.cache_folder
+        if 'http_cache_max_size_kb' in self.config.keys():
+            dict_conf['http_cache_max_size_kb'] = self.http_cache_max_size_kb
+        if 'known_links_to_stop' in self.config.keys():
+            dict_conf['known_links_to_stop'] = self.known_links_to_stop
+        if 'rejected_ads_ttl' in self.config.keys():
+            dict_conf['rejected_ads_ttl'] = self.config['rejected_ads_ttl']
+        if 'send_delay' in self.config.keys():
+            dict_conf['send_delay'] = self.send_delay
+        if 'send_delay_jitter' in self.config.keys():
+            dict_conf['send_delay_jitter'] = self.send_delay_jitter
+        if 'notification_mode' in self.config.keys():
+            dict_conf['notification_mode'] = self.notification_mode
+        if 'digest_window' in self.config.keys():
+            dict_conf['digest_window'] = self.digest_window
+        if 'urgent_notifications' in self.config.keys():
+            dict_conf['urgent_notifications'] = self.urgent_notifications
+        if 'max_pages' in self.config.keys():
+            dict_conf['max_pages'] = self.max_pages
+        if 'page_param' in self.config.keys():
+            dict_conf['page_param'] = self.page_param
         if 'test_mode' in self.config.keys():
             dict_conf['test_mode'] = self.test_mode
         if 'anchor_class_name' in self.config.keys():
@@ -186,12 +360,51 @@ class Configuration:
         for config_attribute in self.config_attributes:
             dict_conf[config_attribute] = getattr(self, config_attribute)
 
-        dict_conf['lookup_url'] = self.lookup_url
+        if 'lookup_url' in self.config.keys():
+            dict_conf['lookup_url'] = self.lookup_url
+        if 'lookups' in self.config.keys():
+            dict_conf['lookups'] = self.lookups
         dict_conf['tag'] = self.tag
         if 'check_interval' in self.config.keys():
             dict_conf['check_interval'] = self.check_interval
+        if 'adaptive_check_interval' in self.config.keys():
+            dict_conf['adaptive_check_interval'] = self.adaptive_check_interval
+        if 'min_check_interval' in self.config.keys():
+            dict_conf['min_check_interval'] = self.min_check_interval
+        if 'max_check_interval' in self.config.keys():
+            dict_conf['max_check_interval'] = self.max_check_interval
         if 'crawl_interval' in self.config.keys():
             dict_conf['crawl_interval'] = self.crawl_interval
+        if 'crawl_concurrency' in self.config.keys():
+            dict_conf['crawl_concurrency'] = self.crawl_concurrency
+        if 'crawl_burst' in self.config.keys():
+            dict_conf['crawl_burst'] = self.crawl_burst
+        if 'http_connect_timeout' in self.config.keys():
+            dict_conf['http_connect_timeout'] = self.http_connect_timeout
+        if 'http_read_timeout' in self.config.keys():
+            dict_conf['http_read_timeout'] = self.http_read_timeout
+        if 'cache_folder' in self.config.keys():
+            dict_conf['cache_folder'] = self.cache_folder
+        if 'http_cache_max_size_kb' in self.config.keys():
+            dict_conf['http_cache_max_size_kb'] = self.http_cache_max_size_kb
+        if 'known_links_to_stop' in self.config.keys():
+            dict_conf['known_links_to_stop'] = self.known_links_to_stop
+        if 'rejected_ads_ttl' in self.config.keys():
+            dict_conf['rejected_ads_ttl'] = self.config['rejected_ads_ttl']
+        if 'send_delay' in self.config.keys():
+            dict_conf['send_delay'] = self.send_delay
+        if 'send_delay_jitter' in self.config.keys():
+            dict_conf['send_delay_jitter'] = self.send_delay_jitter
+        if 'notification_mode' in self.config.keys():
+            dict_conf['notification_mode'] = self.notification_mode
+        if 'digest_window' in self.config.keys():
+            dict_conf['digest_window'] = self.digest_window
+        if 'urgent_notifications' in self.config.keys():
+            dict_conf['urgent_notifications'] = self.urgent_notifications
+        if 'max_pages' in self.config.keys():
+            dict_conf['max_pages'] = self.max_pages
+        if 'page_param' in self.config.keys():
+            dict_conf['page_param'] = self.page_param
         if 'test_mode' in self.config.keys():
             dict_conf['test_mode'] = self.test_mode
         if 'anchor_class_name' in self.config.keys():
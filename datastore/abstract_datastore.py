@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import Iterator, List, Dict, Tuple, Union
 
 
 class AbstractDatastore(ABC):
@@ -41,16 +41,25 @@ class AbstractDatastore(ABC):
         pass
 
     @abstractmethod
-    def update_table(self, table: str, set_data: dict, where: str) -> None:
+    def update_table(self, table: str, set_data: dict, where: str, where_params: Tuple = ()) -> None:
         pass
 
     @abstractmethod
     def select_from_table(self, table: str, columns: str = '*', where: str = 'TRUE', order_by: str = 'NULL',
-                          asc_or_desc: str = 'ASC', limit: int = 1000) -> List:
+                          asc_or_desc: str = 'ASC', limit: Union[int, None] = 1000, where_params: Tuple = ()) -> List:
         pass
 
     @abstractmethod
-    def delete_from_table(self, table: str, where: str) -> None:
+    def iterate_table(self, table: str, columns: str = '*', key_column: str = 'id', where: str = 'TRUE',
+                      where_params: Tuple = (), batch_size: int = 1000) -> Iterator[Tuple]:
+        pass
+
+    @abstractmethod
+    def delete_from_table(self, table: str, where: str, where_params: Tuple = ()) -> None:
+        pass
+
+    @abstractmethod
+    def run_statement(self, statement: str, params: Tuple = ()) -> None:
         pass
 
     @abstractmethod
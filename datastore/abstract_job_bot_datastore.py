@@ -0,0 +1,361 @@
+import os
+import datetime
+import logging
+from typing import Callable, Iterable, Iterator, List, Dict, Set, Tuple, Union
+
+from buffering.write_buffer import WriteBuffer
+
+logger = logging.getLogger('AbstractJobBotDatastore')
+
+
+class AbstractJobBotDatastore:
+    """
+    The applications sent logic shared by the JobBot datastores, mixed in before their base datastore.
+    It only relies on the table operations of AbstractDatastore.
+    """
+
+    __slots__ = ()
+
+    application_table_name: str
+    _write_buffer: Union[WriteBuffer, None]
+    application_table_schema: str
+    application_table_indexes: List[str] = []
+    # The versioned changes of the application table schema, applied in order by migrate()
+    application_table_migrations: List[Tuple[int, str, List[Union[str, Callable]]]] = []
+    application_table_columns: List[str] = ['link', 'email', 'sent_on', 'status', 'reason', 'expires_on']
+    application_statuses: List[str] = ['sent', 'informed', 'skipped_stopword', 'failed']
+    # Only these count as applications sent, the rest of the ads may be checked again
+    sent_statuses_condition: str = "status IN ('sent', 'informed')"
+    schema_migrations_table_name: str = 'schema_migrations'
+    schema_migrations_table_schema: str = 'table_name varchar(100) not null, ' \
+                                          'version int not null, ' \
+                                          'description varchar(255) not null, ' \
+                                          'applied_on varchar(100) not null, ' \
+                                          'primary key (table_name, version)'
+    _max_values_per_query: int = 500
+
+    def _setup_write_buffer(self, config: Dict) -> None:
+        """
+        Buffers the applications sent and saves them in batches if the config sets a `write_batch_size`
+        greater than 1, through a journal file (`write_journal_path`) that is replayed on startup.
+
+        :param config:
+        """
+
+        write_batch_size = config['write_batch_size'] if 'write_batch_size' in config else 1
+        if write_batch_size > 1:
+            self._write_buffer = WriteBuffer(
+                flush_rows=self.save_sent_applications,
+                journal_path=config['write_journal_path'] if 'write_journal_path' in config
+                else os.path.join('cache', 'sent_applications_journal.jsonl'),
+                max_rows=write_batch_size,
+                flush_interval=config['write_flush_interval'] if 'write_flush_interval' in config else 30)
+        else:
+            self._write_buffer = None
+
+    def get_applications_sent(self, columns: str = 'id, link, email, sent_on') -> List[Tuple]:
+        self.flush_sent_applications()
+        return self.select_from_table(table=self.application_table_name, columns=columns,
+                                      where=self.sent_statuses_condition, order_by='id', limit=None)
+
+    def iterate_applications_sent(self, columns: str = 'id, link, email, sent_on', sent_from: str = None,
+                                  sent_to: str = None, email_domain: str = None,
+                                  batch_size: int = 1000) -> Iterator[Tuple]:
+        """
+        Yields the applications sent in the order they were saved, without loading them all in memory.
+
+        :param columns:
+        :param sent_from: Only the ones sent on or after this UTC ISO 8601 date
+        :param sent_to: Only the ones sent before this UTC ISO 8601 date
+        :param email_domain: Only the ones sent to an email of this domain
+        :param batch_size:
+        """
+
+        self.flush_sent_applications()
+        conditions = [self.sent_statuses_condition]
+        where_params = ()
+        if sent_from is not None:
+            conditions.append('sent_on >= %s')
+            where_params += (sent_from,)
+        if sent_to is not None:
+            conditions.append('sent_on < %s')
+            where_params += (sent_to,)
+        if email_domain is not None:
+            conditions.append('email LIKE %s')
+            where_params += ('%@' + email_domain.lstrip('@'),)
+        where = ' AND '.join(conditions)
+        return self.iterate_table(table=self.application_table_name, columns=columns, key_column='id', where=where,
+                                  where_params=where_params, batch_size=batch_size)
+
+    def has_link(self, links: Iterable[str]) -> Set[str]:
+        """
+        Returns which of the specified links have been saved already.
+
+        :param links:
+        """
+
+        links = list(links)
+        return self._select_existing_values(column='link', values=links) | self._get_buffered_values(
+            column='link', values=links)
+
+    def has_email(self, emails: Iterable[str]) -> Set[str]:
+        """
+        Returns which of the specified emails have been saved already.
+
+        :param emails:
+        """
+
+        emails = list(emails)
+        return self._select_existing_values(column='email', values=emails) | self._get_buffered_values(
+            column='email', values=emails)
+
+    def _select_existing_values(self, column: str, values: Iterable[str]) -> Set[str]:
+        """
+        Looks the values up in the unique index of the column among the applications sent.
+
+        :param column:
+        :param values:
+        """
+
+        return {row[0] for row in self._select_by_values(column=column, values=values, columns=column,
+                                                          where=self.sent_statuses_condition)}
+
+    def _select_by_values(self, column: str, values: Iterable[str], columns: str, where: str = 'TRUE') -> List[Tuple]:
+        """
+        Selects the rows whose column has one of the values with batched `IN (...)` queries.
+
+        :param column:
+        :param values:
+        :param columns:
+        :param where: The rest of the condition
+        """
+
+        values = list({value for value in values if value is not None})
+        rows = []
+        for batch_start in range(0, len(values), self._max_values_per_query):
+            batch = values[batch_start:batch_start + self._max_values_per_query]
+            # Pad the batch to a power of two with one of its values,
+            # so that only a few statement shapes have to be prepared
+            placeholders_count = min(1 << (len(batch) - 1).bit_length(), self._max_values_per_query)
+            batch += batch[:1] * (placeholders_count - len(batch))
+            rows += self.select_from_table(table=self.application_table_name, columns=columns,
+                                           where="{column} IN ({placeholders}) AND {where}".format(
+                                               column=column, placeholders=', '.join(['%s'] * placeholders_count),
+                                               where=where),
+                                           limit=None, where_params=tuple(batch))
+        return rows
+
+    def _get_buffered_values(self, column: str, values: List[str]) -> Set[str]:
+        if self._write_buffer is None:
+            return set()
+        buffered_values = {row[column] for row in self._write_buffer.rows}
+        return {value for value in values if value is not None and value in buffered_values}
+
+    def save_sent_application(self, application_info: Dict) -> None:
+        """
+        Saves the application sent, or journals and buffers it if the writes are batched.
+
+        :param application_info: The link, email, sent_on and status of the application,
+                                 its status is sent, or informed if it has no email, if not set
+        """
+
+        application_info = self._with_status(application_info)
+        if self._write_buffer is not None:
+            self._write_buffer.add(application_info)
+        else:
+            # Overwrites a rejection that expired
+            self.save_sent_applications([application_info])
+
+    def save_sent_applications(self, applications_info: List[Dict]) -> None:
+        """
+        Saves many applications sent at once, e.g. to backfill historic data.
+        The ones already saved, or rejected before, are overwritten by their link.
+        The ones whose email belongs to the application to another ad are skipped,
+        unless that application failed, in which case it gives its email up.
+
+        :param applications_info:
+        """
+
+        applications_info = self._without_email_conflicts(list(map(self._with_status, applications_info)))
+        rows = [tuple(application_info[column] if column in application_info else None
+                      for column in self.application_table_columns)
+                for application_info in applications_info]
+        # The email conflicts are resolved already, so only the link can match an existing row
+        self.insert_many_into_table(table=self.application_table_name, columns=self.application_table_columns,
+                                    rows=rows, update_columns=self.application_table_columns[1:])
+
+    def _without_email_conflicts(self, applications_info: List[Dict]) -> List[Dict]:
+        """
+        Returns the applications whose email doesn't belong to the application to another ad,
+        and releases the emails of the applications that failed.
+
+        :param applications_info:
+        """
+
+        saved_applications = {email: (link, status) for link, email, status in self._select_by_values(
+            column='email', values=[application_info.get('email') for application_info in applications_info],
+            columns='link, email, status')}
+        applications_links = {}
+        applications_to_save = []
+        failed_links = []
+        for application_info in applications_info:
+            link, email = application_info['link'], application_info.get('email')
+            if email is not None:
+                saved_link, saved_status = saved_applications.get(email, (link, None))
+                if saved_link != link and saved_status != 'failed':
+                    logger.warning("Skipping the application to %s, its email %s was applied to from %s"
+                                   % (link, email, saved_link))
+                    continue
+                if applications_links.setdefault(email, link) != link:
+                    logger.warning("Skipping the application to %s, its email %s is applied to from %s"
+                                   % (link, email, applications_links[email]))
+                    continue
+                if saved_link != link:
+                    failed_links.append(saved_link)
+            applications_to_save.append(application_info)
+        if len(failed_links) > 0:
+            self.update_table(table=self.application_table_name, set_data={'email': None},
+                              where="link IN ({placeholders}) AND status = 'failed'".format(
+                                  placeholders=', '.join(['%s'] * len(failed_links))),
+                              where_params=tuple(failed_links))
+        return applications_to_save
+
+    def save_rejected_ads(self, rejected_ads: List[Dict]) -> None:
+        """
+        Saves the ads rejected, so that they aren't fetched again until they expire.
+        They are kept along with the applications sent, with the skipped_stopword status.
+
+        :param rejected_ads: The link, reason, rejected_on and expires_on (None for never) of each ad
+        """
+
+        rows = [(rejected_ad['link'], None, rejected_ad['rejected_on'], 'skipped_stopword', rejected_ad['reason'][:255],
+                 rejected_ad['expires_on']) for rejected_ad in rejected_ads]
+        # An expired rejection is renewed, but an application sent is never overwritten
+        self.insert_many_into_table(table=self.application_table_name, columns=self.application_table_columns,
+                                    rows=rows, update_columns=self.application_table_columns[2:],
+                                    update_where="status = 'skipped_stopword'")
+
+    def get_rejected_ads(self, now: str = None) -> List[Tuple]:
+        """
+        Returns the link and the expiration datetime of each ad rejected that hasn't expired.
+
+        :param now: The UTC ISO 8601 datetime to compare the expiration datetimes with, now if not set
+        """
+
+        if now is None:
+            now = datetime.datetime.utcnow().isoformat()
+        return self.select_from_table(table=self.application_table_name, columns='link, expires_on',
+                                      where="status = 'skipped_stopword' AND (expires_on IS NULL OR expires_on > %s)",
+                                      where_params=(now,), limit=None)
+
+    def _with_status(self, application_info: Dict) -> Dict:
+        if 'status' in application_info:
+            if application_info['status'] not in self.application_statuses:
+                raise DatastoreSchemaError("Unknown application status: %s" % application_info['status'])
+            return application_info
+        return dict(application_info, status='sent' if application_info.get('email') is not None else 'informed')
+
+    def flush_sent_applications(self) -> None:
+        """
+        Saves the buffered applications sent, if the writes are batched.
+        """
+
+        if self._write_buffer is not None:
+            self._write_buffer.flush()
+
+    def mark_application_failed(self, link: str, reason: str = None) -> None:
+        """
+        Marks the application sent to the ad as failed, e.g. once its email was given up on,
+        so that it no longer counts as sent and the ad can be applied to again.
+
+        :param link:
+        :param reason: The last error, truncated to 255 characters
+        """
+
+        self.flush_sent_applications()
+        self.update_table(table=self.application_table_name,
+                          set_data={'status': 'failed', 'reason': reason[:255] if reason is not None else None},
+                          where="link = %s AND status = 'sent'", where_params=(link,))
+
+    def remove_ad(self, email_id: Union[int, str]) -> None:
+        self.flush_sent_applications()
+        self.delete_from_table(table=self.application_table_name, where='id=%s', where_params=(int(email_id),))
+
+    def create_applications_sent_table(self) -> None:
+        """
+        Creates the application table, if it doesn't exist, and migrates it to the latest schema version.
+        """
+
+        self.create_table(table=self.application_table_name, schema=self.application_table_schema)
+        for index_column in self.application_table_indexes:
+            self.create_index(table=self.application_table_name, column=index_column)
+        self.migrate()
+
+    def migrate(self) -> List[int]:
+        """
+        Applies the migrations of the application table that haven't been applied yet, in order,
+        and records each of them in the schema migrations table.
+        Returns the versions applied.
+        """
+
+        self.create_table(table=self.schema_migrations_table_name, schema=self.schema_migrations_table_schema)
+        versions_applied = []
+        for version, description, statements in self.get_pending_migrations():
+            logger.info("Migrating %s to version %s: %s.." % (self.application_table_name, version, description))
+            for statement in statements:
+                if callable(statement):
+                    # A change that depends on the current schema of the table
+                    statement(self)
+                else:
+                    self.run_statement(statement.format(table=self.application_table_name))
+            self.insert_into_table(table=self.schema_migrations_table_name,
+                                   data={'table_name': self.application_table_name, 'version': version,
+                                         'description': description,
+                                         'applied_on': datetime.datetime.utcnow().isoformat()})
+            versions_applied.append(version)
+        return versions_applied
+
+    def get_schema_version(self) -> int:
+        """
+        Returns the latest migration applied to the application table, 0 if none.
+        """
+
+        if self.schema_migrations_table_name not in self.show_tables():
+            return 0
+        rows = self.select_from_table(table=self.schema_migrations_table_name, columns='MAX(version)',
+                                      where='table_name = %s', where_params=(self.application_table_name,))
+        return rows[0][0] if len(rows) > 0 and rows[0][0] is not None else 0
+
+    def get_pending_migrations(self) -> List[Tuple[int, str, List[Union[str, Callable]]]]:
+        schema_version = self.get_schema_version()
+        return [migration for migration in self.application_table_migrations if migration[0] > schema_version]
+
+    def check_schema_version(self) -> None:
+        """
+        Raises a DatastoreSchemaError if the application table hasn't been migrated to the latest schema version.
+        """
+
+        pending_migrations = self.get_pending_migrations()
+        if len(pending_migrations) > 0:
+            raise DatastoreSchemaError("The %s table is at schema version %s, run the migrate run mode to apply: %s"
+                                       % (self.application_table_name, self.get_schema_version(),
+                                          ', '.join(description for _, description, _ in pending_migrations)))
+
+    def close(self) -> None:
+        """
+        Saves the buffered applications sent and closes the connections
+
+        :return:
+        """
+
+        try:
+            if self._write_buffer is not None:
+                self._write_buffer.close()
+        finally:
+            super().close()
+
+
+class DatastoreSchemaError(Exception):
+    def __init__(self, message):
+        # Call the base class constructor with the parameters it needs
+        super().__init__(message)
@@ -0,0 +1,86 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, List, Tuple, Union
+
+from .abstract_datastore import AbstractDatastore
+
+logger = logging.getLogger('AsyncDatastore')
+
+
+class AsyncDatastore:
+    __slots__ = ('data_store', '_executor', '_loop')
+
+    data_store: AbstractDatastore
+    _executor: ThreadPoolExecutor
+    _loop: Union[asyncio.AbstractEventLoop, None]
+
+    def __init__(self, data_store: AbstractDatastore, max_workers: int = 4,
+                 loop: asyncio.AbstractEventLoop = None) -> None:
+        """
+        The basic constructor. Creates a new AsyncDatastore with the same methods as the `data_store`
+        (e.g. a JobBotMySqlDatastore or a JobBotSqliteDatastore), as coroutines that run the queries
+        in a pool of `max_workers` threads, so that the event loop keeps fetching and sending meanwhile.
+        The iterate_* methods return async iterators instead.
+
+        :param data_store: A datastore that is safe to use from multiple threads
+        :param max_workers: How many queries run at the same time, at most the size of the connection pool
+        :param loop: The event loop, the current one if not set
+        """
+
+        self.data_store = data_store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._loop = loop
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self.data_store, name)
+        if not callable(attribute):
+            return attribute
+        if name.startswith('iterate_'):
+            return functools.partial(self._iterate, attribute)
+        return functools.partial(self._run, attribute)
+
+    async def _run(self, method: Callable, *args, **kwargs) -> Any:
+        loop = self._loop if self._loop is not None else asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+
+    async def _iterate(self, method: Callable[..., Iterator[Tuple]], *args, **kwargs) -> AsyncIterator[Tuple]:
+        """
+        Yields the rows of a synchronous iterate_* method. Each batch is selected in the pool of threads,
+        once the previous one has been consumed.
+
+        :param method:
+        """
+
+        rows = await self._run(method, *args, **kwargs)
+        while True:
+            batch = await self._run(self._next_batch, rows)
+            for row in batch:
+                yield row
+            if len(batch) == 0:
+                return
+
+    @staticmethod
+    def _next_batch(rows: Iterator[Tuple], batch_size: int = 100) -> List[Tuple]:
+        # A row at a time would cost a round trip to the pool of threads per row
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                break
+        return batch
+
+    async def close(self) -> None:
+        """
+        Closes the datastore, once the queries already running are done.
+        """
+
+        await self._run(self.data_store.close)
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> 'AsyncDatastore':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.close()
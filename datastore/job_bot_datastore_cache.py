@@ -0,0 +1,270 @@
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from .abstract_job_bot_datastore import AbstractJobBotDatastore
+
+logger = logging.getLogger('JobBotDatastoreCache')
+
+
+class JobBotDatastoreCache:
+    __slots__ = ('data_store', 'reconcile_interval', 'checked_links', '_links', '_emails', '_links_changed',
+                 '_emails_changed', '_reconciling', '_lock', '_reconcile_lock', '_stop_event', '_reconciler')
+
+    data_store: AbstractJobBotDatastore
+    reconcile_interval: Union[float, None]
+    checked_links: 'CheckedLinks'
+    _links: Set[str]
+    _emails: Set[str]
+    _links_changed: Dict[str, bool]
+    _emails_changed: Dict[str, bool]
+    _reconciling: bool
+    _lock: threading.Lock
+    _reconcile_lock: threading.Lock
+    _stop_event: threading.Event
+    _reconciler: Union[threading.Thread, None]
+
+    def __init__(self, data_store: AbstractJobBotDatastore, reconcile_interval: float = 300,
+                 max_unsaved_links: int = 10000) -> None:
+        """
+        The basic constructor. Creates a new write-through JobBotDatastoreCache that loads the links and
+        the emails of the applications sent once, so that checking them never touches the datastore.
+        It is reloaded every `reconcile_interval` seconds, to catch the changes made by other processes
+        (e.g. the remove_email run mode).
+
+        :param data_store:
+        :param reconcile_interval: The seconds between two reloads, never reloaded in the background if None
+        :param max_unsaved_links: The links checked but not saved that its checked_links remember
+        """
+
+        self.data_store = data_store
+        self.reconcile_interval = reconcile_interval
+        self._links = set()
+        self._emails = set()
+        self._links_changed = {}
+        self._emails_changed = {}
+        self._reconciling = False
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self.checked_links = CheckedLinks(data_store_cache=self, max_unsaved_links=max_unsaved_links)
+        self.reconcile()
+        self._stop_event = threading.Event()
+        if self.reconcile_interval is not None:
+            self._reconciler = threading.Thread(target=self._run_reconciler, name='JobBotDatastoreCacheReconciler',
+                                                daemon=True)
+            self._reconciler.start()
+        else:
+            self._reconciler = None
+
+    def has_link(self, links: Iterable[str]) -> Set[str]:
+        """
+        Returns which of the specified links have been saved already.
+
+        :param links:
+        """
+
+        with self._lock:
+            return {link for link in links if link in self._links}
+
+    def has_email(self, emails: Iterable[str]) -> Set[str]:
+        """
+        Returns which of the specified emails have been saved already.
+
+        :param emails:
+        """
+
+        with self._lock:
+            return {email for email in emails if email is not None and email in self._emails}
+
+    @property
+    def links(self) -> Set[str]:
+        with self._lock:
+            return set(self._links)
+
+    def save_sent_application(self, application_info: Dict) -> None:
+        """
+        Saves the application sent to the datastore first and then to the cache.
+
+        :param application_info: The link, email and sent_on of the application
+        """
+
+        self.data_store.save_sent_application(application_info)
+        with self._lock:
+            self._update(link=application_info['link'], email=application_info['email'], is_saved=True)
+        # From now on it is checked for as long as it stays in the datastore
+        self.checked_links.discard(application_info['link'])
+
+    def remove_ad(self, email_id: Union[int, str]) -> None:
+        """
+        Removes the application sent from the datastore and then from the cache.
+
+        :param email_id:
+        """
+
+        rows = self.data_store.select_from_table(table=self.data_store.application_table_name,
+                                                 columns='link, email', where='id=%s',
+                                                 where_params=(int(email_id),))
+        self.data_store.remove_ad(email_id=email_id)
+        with self._lock:
+            for link, email in rows:
+                self._update(link=link, email=email, is_saved=False)
+
+    def mark_application_failed(self, link: str, reason: str = None) -> None:
+        """
+        Marks the application sent to the ad as failed in the datastore and removes it from the cache.
+
+        :param link:
+        :param reason:
+        """
+
+        self.data_store.flush_sent_applications()
+        rows = self.data_store.select_from_table(table=self.data_store.application_table_name,
+                                                 columns='link, email', where="link=%s AND status = 'sent'",
+                                                 where_params=(link,))
+        self.data_store.mark_application_failed(link=link, reason=reason)
+        with self._lock:
+            for link, email in rows:
+                self._update(link=link, email=email, is_saved=False)
+
+    def get_applications_sent(self, columns: str = 'id, link, email, sent_on') -> List[Tuple]:
+        return self.data_store.get_applications_sent(columns=columns)
+
+    def save_rejected_ads(self, rejected_ads: List[Dict]) -> None:
+        self.data_store.save_rejected_ads(rejected_ads)
+
+    def get_rejected_ads(self, now: str = None) -> List[Tuple]:
+        return self.data_store.get_rejected_ads(now=now)
+
+    def reconcile(self) -> None:
+        """
+        Reloads the links and the emails from the datastore.
+        The changes made through the cache while reloading are applied on top of the reloaded ones.
+        """
+
+        with self._reconcile_lock:
+            with self._lock:
+                self._links_changed = {}
+                self._emails_changed = {}
+                self._reconciling = True
+            try:
+                rows = self.data_store.get_applications_sent(columns='link, email')
+            finally:
+                with self._lock:
+                    self._reconciling = False
+            links = {link for link, _ in rows}
+            emails = {email for _, email in rows if email is not None}
+            with self._lock:
+                self._apply_changes(values=links, changes=self._links_changed)
+                self._apply_changes(values=emails, changes=self._emails_changed)
+                logger.debug("Reconciled: %s links (%+d), %s emails (%+d)" % (
+                    len(links), len(links) - len(self._links), len(emails), len(emails) - len(self._emails)))
+                self._links = links
+                self._emails = emails
+            self.checked_links.discard_saved()
+
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._reconciler is not None:
+            self._reconciler.join()
+        self.data_store.close()
+
+    def _update(self, link: str, email: Union[str, None], is_saved: bool) -> None:
+        if is_saved:
+            self._links.add(link)
+            if email is not None:
+                self._emails.add(email)
+        else:
+            self._links.discard(link)
+            self._emails.discard(email)
+        if self._reconciling:
+            self._links_changed[link] = is_saved
+            if email is not None:
+                self._emails_changed[email] = is_saved
+
+    @staticmethod
+    def _apply_changes(values: Set[str], changes: Dict[str, bool]) -> None:
+        for value, is_saved in changes.items():
+            if is_saved:
+                values.add(value)
+            else:
+                values.discard(value)
+
+    def _run_reconciler(self) -> None:
+        while not self._stop_event.wait(timeout=self.reconcile_interval):
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error("Failed to reconcile with the datastore: %s" % e)
+
+
+class CheckedLinks:
+    """
+    The links checked by the crawler, as a live view of the links saved in a JobBotDatastoreCache,
+    so that the links added or removed by its reconciles are seen right away, along with the links
+    checked but not saved (e.g. the ones whose email was applied to from another ad). Only the
+    `max_unsaved_links` most recently seen of the latter are remembered, the rest are checked again
+    if they show up.
+    """
+
+    __slots__ = ('_data_store_cache', '_max_unsaved_links', '_unsaved_links', '_lock')
+
+    _data_store_cache: JobBotDatastoreCache
+    _max_unsaved_links: int
+    _unsaved_links: 'OrderedDict[str, None]'
+    _lock: threading.Lock
+
+    def __init__(self, data_store_cache: JobBotDatastoreCache, max_unsaved_links: int = 10000) -> None:
+        """
+        The basic constructor. Creates a new CheckedLinks on top of the specified cache.
+
+        :param data_store_cache:
+        :param max_unsaved_links:
+        """
+
+        self._data_store_cache = data_store_cache
+        self._max_unsaved_links = max_unsaved_links
+        self._unsaved_links = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, link: str) -> bool:
+        if len(self._data_store_cache.has_link(links=[link])) > 0:
+            return True
+        with self._lock:
+            if link not in self._unsaved_links:
+                return False
+            # Most recently seen last
+            self._unsaved_links.move_to_end(link)
+            return True
+
+    def __len__(self) -> int:
+        links = self._data_store_cache.links
+        with self._lock:
+            return len(links.union(self._unsaved_links))
+
+    def add(self, link: str) -> None:
+        if len(self._data_store_cache.has_link(links=[link])) > 0:
+            return
+        with self._lock:
+            self._unsaved_links[link] = None
+            self._unsaved_links.move_to_end(link)
+            if len(self._unsaved_links) > self._max_unsaved_links:
+                # Forget the least recently seen link
+                self._unsaved_links.popitem(last=False)
+
+    def discard(self, link: str) -> None:
+        with self._lock:
+            self._unsaved_links.pop(link, None)
+
+    def discard_saved(self) -> None:
+        """
+        Forgets the links checked but not saved that have been saved since, e.g. by another process,
+        since they are checked for as long as they stay in the datastore.
+        """
+
+        with self._lock:
+            unsaved_links = list(self._unsaved_links)
+        saved_links = self._data_store_cache.has_link(links=unsaved_links)
+        with self._lock:
+            for link in saved_links:
+                self._unsaved_links.pop(link, None)
@@ -1,29 +1,92 @@
 import logging
-from typing import List, Dict, Tuple, Union
+from typing import Callable, Dict, List, Tuple, Union
 
-from mysql import connector as mysql_connector
+from buffering.write_buffer import WriteBuffer
 
+from .abstract_job_bot_datastore import AbstractJobBotDatastore, DatastoreSchemaError
 from .mysql_datastore import MySqlDatastore
 
 logger = logging.getLogger('JobBotMySqlDatastore')
 
 
-class JobBotMySqlDatastore(MySqlDatastore):
-    __slots__ = ('_connection', '_cursor', 'application_table_name')
+def _refuse_duplicate_emails(data_store: 'JobBotMySqlDatastore') -> None:
+    """
+    Raises a DatastoreSchemaError listing the emails that more than one application was sent to,
+    since which of them to keep is up to the operator.
+
+    :param data_store:
+    """
+
+    query = "SELECT email, COUNT(*), GROUP_CONCAT(id ORDER BY id) FROM {table} WHERE email IS NOT NULL " \
+            "GROUP BY email HAVING COUNT(*) > 1 ORDER BY email".format(table=data_store.application_table_name)
+    duplicates = data_store._execute(query, prepared=False, fetch=True)
+    if len(duplicates) > 0:
+        for email, count, ids in duplicates:
+            logger.error("%s applications were sent to %s, with the ids: %s" % (count, email, ids))
+        # The remove_email run mode needs the table migrated
+        raise DatastoreSchemaError("The email of %s rows of the %s table isn't unique, delete the duplicates "
+                                   "listed above, e.g. with DELETE FROM %s WHERE id IN (...), and run the migrate "
+                                   "run mode again" % (sum(count for _, count, _ in duplicates),
+                                                       data_store.application_table_name,
+                                                       data_store.application_table_name))
+
+
+def _add_unique_email_index(data_store: 'JobBotMySqlDatastore') -> None:
+    """
+    Adds a unique index on the email of the application table, unless it has one already,
+    i.e. it was created with the email constraint. The non-unique index that the first version
+    of migration 1 added is replaced.
+
+    :param data_store:
+    """
+
+    indexes = data_store.select_from_table(table='information_schema.statistics',
+                                           columns='index_name, non_unique',
+                                           where="table_schema = DATABASE() AND table_name = %s "
+                                                 "AND column_name = 'email'",
+                                           where_params=(data_store.application_table_name,))
+    email_index_name = '{table}_email'.format(table=data_store.application_table_name)
+    if (email_index_name, 1) in indexes:
+        data_store.run_statement("ALTER TABLE {table} DROP INDEX {index}".format(
+            table=data_store.application_table_name, index=email_index_name))
+    if not any(non_unique == 0 for _, non_unique in indexes):
+        data_store.run_statement("ALTER TABLE {table} ADD UNIQUE INDEX {index} (email)".format(
+            table=data_store.application_table_name, index=email_index_name))
+
+
+class JobBotMySqlDatastore(AbstractJobBotDatastore, MySqlDatastore):
+    __slots__ = ('application_table_name', '_write_buffer')
 
-    _connection: mysql_connector.connection_cext.CMySQLConnection
-    _cursor: mysql_connector.connection_cext.CMySQLCursor
     application_table_name: str
+    _write_buffer: Union[WriteBuffer, None]
     application_table_schema: str = 'id int auto_increment primary key, ' \
                                     'link varchar(100) not null, ' \
                                     'email varchar(100) null, ' \
                                     'sent_on varchar(100) not null, ' \
-                                    'constraint link unique (link)'
+                                    'constraint link unique (link), ' \
+                                    'constraint email unique (email)'
+    application_table_migrations: List[Tuple[int, str, List[Union[str, Callable]]]] = [
+        (1, 'sent_on as DATETIME(6), status column, sent_on and status indexes',
+         ["UPDATE {table} SET sent_on = REPLACE(sent_on, 'T', ' ')",
+          # A single ALTER TABLE, so that the table is rebuilt only once
+          "ALTER TABLE {table} MODIFY sent_on DATETIME(6) NOT NULL, "
+          "ADD COLUMN status VARCHAR(20) NOT NULL DEFAULT 'sent', "
+          "ADD INDEX {table}_sent_on (sent_on), "
+          "ADD INDEX {table}_status (status)",
+          "UPDATE {table} SET status = 'informed' WHERE email IS NULL"]),
+        (2, 'reason and expires_on columns of the rejected ads',
+         ["ALTER TABLE {table} ADD COLUMN reason VARCHAR(255) NULL, ADD COLUMN expires_on DATETIME(6) NULL"]),
+        (3, 'unique email index',
+         [_refuse_duplicate_emails,
+          _add_unique_email_index]),
+    ]
 
     def __init__(self, config: Dict,
                  application_table_name: str = 'applications_sent') -> None:
         """
-        The basic constructor. Creates a new instance of Datastore using the specified credentials
+        The basic constructor. Creates a new instance of Datastore using the specified credentials.
+        If the config sets a `write_batch_size` greater than 1, the applications sent are buffered and
+        saved in batches, through a journal file (`write_journal_path`) that is replayed on startup.
 
         :param config:
         :param application_table_name:
@@ -31,15 +94,4 @@ class JobBotMySqlDatastore(MySqlDatastore):
 
         self.application_table_name = application_table_name
         super().__init__(config=config)
-
-    def get_applications_sent(self, columns: str = 'id, link, email, sent_on') -> List[Tuple]:
-        return self.select_from_table(table=self.application_table_name, columns=columns)
-
-    def save_sent_application(self, application_info: Dict) -> None:
-        self.insert_into_table(table=self.application_table_name, data=application_info)
-
-    def remove_ad(self, email_id: Union[int, str]) -> None:
-        self.delete_from_table(table=self.application_table_name, where='id={email_id}'.format(email_id=email_id))
-
-    def create_applications_sent_table(self) -> None:
-        self.create_table(table=self.application_table_name, schema=self.application_table_schema)
+        self._setup_write_buffer(config=config)
@@ -0,0 +1,48 @@
+import logging
+from typing import Dict, List, Tuple, Union
+
+from buffering.write_buffer import WriteBuffer
+
+from .abstract_job_bot_datastore import AbstractJobBotDatastore
+from .sqlite_datastore import SqliteDatastore
+
+logger = logging.getLogger('JobBotSqliteDatastore')
+
+
+class JobBotSqliteDatastore(AbstractJobBotDatastore, SqliteDatastore):
+    __slots__ = ('application_table_name', '_write_buffer')
+
+    application_table_name: str
+    _write_buffer: Union[WriteBuffer, None]
+    application_table_schema: str = 'id integer primary key autoincrement, ' \
+                                    'link varchar(100) not null, ' \
+                                    'email varchar(100) null, ' \
+                                    'sent_on varchar(100) not null, ' \
+                                    'constraint link unique (link), ' \
+                                    'constraint email unique (email)'
+    application_table_indexes: List[str] = ['sent_on']
+    application_table_migrations: List[Tuple[int, str, List[str]]] = [
+        (1, 'status column and index',
+         ["ALTER TABLE {table} ADD COLUMN status varchar(20) not null default 'sent'",
+          "UPDATE {table} SET status = 'informed' WHERE email IS NULL",
+          "CREATE INDEX IF NOT EXISTS {table}_status ON {table} (status)"]),
+        (2, 'reason and expires_on columns of the rejected ads',
+         ["ALTER TABLE {table} ADD COLUMN reason varchar(255) null",
+          "ALTER TABLE {table} ADD COLUMN expires_on varchar(100) null"]),
+    ]
+
+    def __init__(self, config: Dict,
+                 application_table_name: str = 'applications_sent') -> None:
+        """
+        The basic constructor. Creates a new instance of a local Datastore stored in the `db_path` file.
+        Its applications sent table is created and migrated to the latest schema version on startup.
+
+        :param config:
+        :param application_table_name:
+        """
+
+        self.application_table_name = application_table_name
+        super().__init__(config=config)
+        # There is no server to create it on beforehand
+        self.create_applications_sent_table()
+        self._setup_write_buffer(config=config)
@@ -0,0 +1,203 @@
+import queue
+import threading
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+from mysql import connector as mysql_connector
+from mysql.connector import errors as mysql_errors
+
+logger = logging.getLogger('MySqlConnectionPool')
+
+
+class MySqlPooledConnection:
+    __slots__ = ('connection', 'last_used', '_prepared_cursors', '_max_prepared_statements')
+
+    connection: mysql_connector.MySQLConnection
+    last_used: float
+    _prepared_cursors: Dict[str, Tuple[str, mysql_connector.cursor.MySQLCursorPrepared]]
+    _max_prepared_statements: int
+
+    def __init__(self, connection: mysql_connector.MySQLConnection, max_prepared_statements: int = 64) -> None:
+        """
+        The basic constructor. Creates a new MySqlPooledConnection that keeps the statements prepared
+        on its session, since they can't be shared with the other connections.
+
+        :param connection:
+        :param max_prepared_statements:
+        """
+
+        self.connection = connection
+        self.last_used = time.monotonic()
+        self._prepared_cursors = OrderedDict()
+        self._max_prepared_statements = max_prepared_statements
+
+    def get_prepared_cursor(self, query: str) -> Tuple[str, mysql_connector.cursor.MySQLCursorPrepared]:
+        """
+        Returns the cursor of the statement prepared for the query, preparing it on its first use,
+        along with the query string it was prepared with. The cursor prepares the statement again
+        for any other string object, even an equal one, so that is the one to execute.
+
+        :param query:
+        """
+
+        prepared_query, prepared_cursor = self._prepared_cursors.pop(query, (query, None))
+        if prepared_cursor is None:
+            logger.debug("Preparing: %s" % query)
+            prepared_cursor = self.connection.cursor(prepared=True)
+            if len(self._prepared_cursors) >= self._max_prepared_statements:
+                # Deallocate the least recently used statement
+                _, (_, least_recently_used_cursor) = self._prepared_cursors.popitem(last=False)
+                least_recently_used_cursor.close()
+        # Most recently used last
+        self._prepared_cursors[query] = (prepared_query, prepared_cursor)
+        return prepared_query, prepared_cursor
+
+    def is_healthy(self) -> bool:
+        try:
+            self.connection.ping(reconnect=False)
+            return True
+        except mysql_errors.Error:
+            return False
+
+    def close(self) -> None:
+        self._prepared_cursors = OrderedDict()
+        try:
+            self.connection.close()
+        except mysql_errors.Error:
+            pass
+
+
+class MySqlConnectionPool:
+    __slots__ = ('_connect', '_pool_size', '_pool_timeout', '_health_check_interval', '_idle_connections',
+                 '_connections_opened', '_lock')
+
+    _connect: Callable[[], mysql_connector.MySQLConnection]
+    _pool_size: int
+    _pool_timeout: float
+    _health_check_interval: float
+    _idle_connections: queue.LifoQueue
+    _connections_opened: int
+    _lock: threading.Lock
+    _connection_errors: Tuple = (mysql_errors.OperationalError, mysql_errors.InterfaceError)
+
+    def __init__(self, connect: Callable[[], mysql_connector.MySQLConnection], pool_size: int = 4,
+                 pool_timeout: float = 30, health_check_interval: float = 60) -> None:
+        """
+        The basic constructor. Creates a new thread-safe MySqlConnectionPool of up to `pool_size` connections.
+        The connections are opened lazily, except for the first one that validates the credentials.
+
+        :param connect: Opens a new connection
+        :param pool_size:
+        :param pool_timeout: The seconds to wait for a connection when all of them are in use
+        :param health_check_interval: The seconds a connection can stay idle before it is pinged on its next use
+        """
+
+        self._connect = connect
+        self._pool_size = max(pool_size, 1)
+        self._pool_timeout = pool_timeout
+        self._health_check_interval = health_check_interval
+        self._idle_connections = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._release(self._open_connection())
+        self._connections_opened = 1
+
+    @contextmanager
+    def connection(self) -> Iterator[MySqlPooledConnection]:
+        """
+        Borrows a healthy connection for the duration of the `with` block.
+        A connection that failed in it is closed instead of returned to the pool.
+        """
+
+        pooled_connection = self._acquire()
+        try:
+            yield pooled_connection
+        except self._connection_errors:
+            self._discard(pooled_connection)
+            raise
+        except Exception:
+            self._release(pooled_connection)
+            raise
+        else:
+            self._release(pooled_connection)
+
+    def run(self, operation: Callable[[MySqlPooledConnection], Any], max_retries: int = 2) -> Any:
+        """
+        Runs the operation on a pooled connection, retrying it on a new connection if the connection was lost,
+        e.g. because the server dropped it after its wait_timeout.
+        The connections autocommit, so the changes of an attempt may have been committed before its connection
+        was lost. Only the idempotent operations should be retried, the rest should pass max_retries=0.
+
+        :param operation:
+        :param max_retries:
+        """
+
+        for attempt in range(max_retries + 1):
+            try:
+                with self.connection() as pooled_connection:
+                    return operation(pooled_connection)
+            except self._connection_errors as e:
+                if attempt == max_retries:
+                    raise
+                logger.warning("Lost the connection to MySQL (%s), retrying.." % e)
+                time.sleep(min(0.1 * 2 ** attempt, 2))
+
+    def _acquire(self) -> MySqlPooledConnection:
+        while True:
+            try:
+                pooled_connection = self._idle_connections.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._connections_opened < self._pool_size
+                    if can_open:
+                        # Reserve it before connecting, so that the pool never grows past its size
+                        self._connections_opened += 1
+                if can_open:
+                    try:
+                        return self._open_connection()
+                    except Exception:
+                        with self._lock:
+                            self._connections_opened -= 1
+                        raise
+                try:
+                    pooled_connection = self._idle_connections.get(timeout=self._pool_timeout)
+                except queue.Empty:
+                    raise MySqlConnectionPoolError("No MySQL connection was released in %s seconds"
+                                                   % self._pool_timeout)
+            if time.monotonic() - pooled_connection.last_used < self._health_check_interval \
+                    or pooled_connection.is_healthy():
+                return pooled_connection
+            logger.info("Dropping a stale MySQL connection..")
+            self._discard(pooled_connection)
+
+    def _open_connection(self) -> MySqlPooledConnection:
+        logger.debug("Opening a new MySQL connection..")
+        return MySqlPooledConnection(connection=self._connect())
+
+    def _release(self, pooled_connection: MySqlPooledConnection) -> None:
+        pooled_connection.last_used = time.monotonic()
+        self._idle_connections.put(pooled_connection)
+
+    def _discard(self, pooled_connection: MySqlPooledConnection) -> None:
+        pooled_connection.close()
+        with self._lock:
+            self._connections_opened -= 1
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._discard(self._idle_connections.get_nowait())
+            except queue.Empty:
+                break
+
+    @property
+    def connections_opened(self) -> int:
+        return self._connections_opened
+
+
+class MySqlConnectionPoolError(Exception):
+    def __init__(self, message):
+        # Call the base class constructor with the parameters it needs
+        super().__init__(message)
@@ -1,39 +1,52 @@
 import logging
-from typing import List, Tuple, Dict
+from typing import Iterator, List, Tuple, Dict, Union
 
 from mysql import connector as mysql_connector
+from mysql.connector import errorcode as mysql_errorcode
+from mysql.connector import errors as mysql_errors
 
 from .abstract_datastore import AbstractDatastore
+from .mysql_connection_pool import MySqlConnectionPool, MySqlPooledConnection
 
 logger = logging.getLogger('MySqlDataStore')
 
 
 class MySqlDatastore(AbstractDatastore):
-    __slots__ = ('_connection', '_cursor')
+    __slots__ = ('_connection_pool', '_max_retries')
 
-    _connection: mysql_connector.connection_cext.CMySQLConnection
-    _cursor: mysql_connector.connection_cext.CMySQLCursor
+    _connection_pool: MySqlConnectionPool
+    _max_retries: int
 
     def __init__(self, config: Dict) -> None:
         """
         The basic constructor. Creates a new instance of Datastore using the specified credentials
+        that is safe to use from multiple threads.
 
         :param config:
         """
 
-        super().__init__(config)
+        connection_params = {'username': config['username'], 'password': config['password'],
+                             'hostname': config['hostname'], 'db_name': config['db_name'],
+                             'port': config['port'] if 'port' in config else 3306,
+                             'use_pure': config['use_pure'] if 'use_pure' in config else False}
+        self._connection_pool = MySqlConnectionPool(
+            connect=lambda: self.get_connection(**connection_params),
+            pool_size=config['pool_size'] if 'pool_size' in config else 4,
+            pool_timeout=config['pool_timeout'] if 'pool_timeout' in config else 30)
+        self._max_retries = config['max_retries'] if 'max_retries' in config else 2
 
     @staticmethod
-    def get_connection(username: str, password: str, hostname: str, db_name: str, port: int = 3306) \
-            -> Tuple[mysql_connector.connection_cext.CMySQLConnection, mysql_connector.connection_cext.CMySQLCursor]:
+    def get_connection(username: str, password: str, hostname: str, db_name: str, port: int = 3306,
+                       use_pure: bool = False) -> mysql_connector.MySQLConnection:
         """
-        Creates and returns a connection and a cursor/session to the MySQL DB
+        Creates and returns a connection to the MySQL DB
 
         :param username:
         :param password:
         :param hostname:
         :param db_name:
         :param port:
+        :param use_pure: Use the pure python implementation instead of the C extension
         :return:
         """
 
@@ -42,12 +55,14 @@ class MySqlDatastore(AbstractDatastore):
             user=username,
             passwd=password,
             database=db_name,
-            use_pure=True
+            port=port,
+            use_pure=use_pure,
+            # Each statement is committed on its own anyway, and a pooled connection that only reads
+            # would otherwise keep reading the snapshot of its first SELECT
+            autocommit=True
         )
 
-        cursor = connection.cursor()
-
-        return connection, cursor
+        return connection
 
     def create_table(self, table: str, schema: str) -> None:
         """
@@ -60,9 +75,24 @@ class MySqlDatastore(AbstractDatastore):
         """
 
         query = "CREATE TABLE IF NOT EXISTS {table} ({schema})".format(table=table, schema=schema)
-        logger.debug("Executing: %s" % query)
-        self._cursor.execute(query)
-        self._connection.commit()
+        self._execute(query, prepared=False, commit=True)
+
+    def create_index(self, table: str, column: str) -> None:
+        """
+        Creates an index on the specified column if it doesn't exist
+
+        :param self:
+        :param table:
+        :param column:
+        :return:
+        """
+
+        query = "CREATE INDEX {table}_{column} ON {table} ({column})".format(table=table, column=column)
+        try:
+            self._execute(query, prepared=False, commit=True)
+        except mysql_errors.ProgrammingError as e:
+            if e.errno != mysql_errorcode.ER_DUP_KEYNAME:
+                raise
 
     def drop_table(self, table: str) -> None:
         """
@@ -74,9 +104,7 @@ class MySqlDatastore(AbstractDatastore):
         """
 
         query = "DROP TABLE IF EXISTS {table}".format(table=table)
-        logger.debug("Executing: %s" % query)
-        self._cursor.execute(query)
-        self._connection.commit()
+        self._execute(query, prepared=False, commit=True)
 
     def truncate_table(self, table: str) -> None:
         """
@@ -88,9 +116,7 @@ class MySqlDatastore(AbstractDatastore):
         """
 
         query = "TRUNCATE TABLE {table}".format(table=table)
-        logger.debug("Executing: %s" % query)
-        self._cursor.execute(query)
-        self._connection.commit()
+        self._execute(query, prepared=False, commit=True)
 
     def insert_into_table(self, table: str, data: dict) -> None:
         """
@@ -102,71 +128,188 @@ class MySqlDatastore(AbstractDatastore):
         :return:
         """
 
-        data_str = ", ".join(
-            list(map(lambda key, val: "{key}='{val}'".format(key=str(key), val=str(val)), data.keys(), data.values())))
+        query = "INSERT INTO {table} ({columns}) VALUES ({placeholders})".format(
+            table=table, columns=', '.join(data.keys()), placeholders=', '.join(['%s'] * len(data)))
+        # Not retried, since the row may have been inserted before the connection was lost
+        self._execute(query, params=tuple(data.values()), commit=True, retry=False)
+
+    def insert_many_into_table(self, table: str, columns: List[str], rows: List[Tuple],
+                               ignore_duplicates: bool = False, update_columns: List[str] = None,
+                               update_where: str = None, max_rows_per_query: int = 500) -> None:
+        """
+        Inserts the rows into the specified table with multi-row INSERT statements,
+        each of which costs one round trip and one commit
 
-        query = "INSERT INTO {table} SET {data}".format(table=table, data=data_str)
-        logger.debug("Executing: %s" % query)
-        self._cursor.execute(query)
-        self._connection.commit()
+        :param self:
+        :param table:
+        :param columns:
+        :param rows: One tuple of values per row, in the order of the columns
+        :param ignore_duplicates: Skip the rows that violate a unique key with an ON DUPLICATE KEY UPDATE no-op
+        :param update_columns: Update these columns of the existing rows that the rows violate a unique key of
+        :param update_where: Update only the existing rows that match this condition. It is evaluated again
+                             before each column is updated, after the columns listed before it
+        :param max_rows_per_query:
+        :return:
+        """
 
-    def update_table(self, table: str, set_data: dict, where: str) -> None:
+        row_placeholders = "({placeholders})".format(placeholders=', '.join(['%s'] * len(columns)))
+        for batch_start in range(0, len(rows), max_rows_per_query):
+            batch = rows[batch_start:batch_start + max_rows_per_query]
+            query = "INSERT INTO {table} ({columns}) VALUES {values}".format(
+                table=table, columns=', '.join(columns), values=', '.join([row_placeholders] * len(batch)))
+            if update_columns is not None:
+                if update_where is None:
+                    assignment = "{column}=VALUES({column})"
+                else:
+                    assignment = "{column}=IF({where}, VALUES({column}), {column})"
+                query += " ON DUPLICATE KEY UPDATE " + ', '.join(assignment.format(column=column, where=update_where)
+                                                                 for column in update_columns)
+            elif ignore_duplicates:
+                query += " ON DUPLICATE KEY UPDATE {column}={column}".format(column=columns[0])
+            params = tuple(value for row in batch for value in row)
+            # The number of rows varies, so the statement isn't worth preparing. Only the statements
+            # that leave the rows inserted before the connection was lost as they are can be retried
+            self._execute(query, params=params, prepared=False, commit=True,
+                          retry=update_columns is not None or ignore_duplicates)
+
+    def update_table(self, table: str, set_data: dict, where: str, where_params: Tuple = ()) -> None:
         """
         Updates the specified table using a column_name: value dictionary and a where statement
 
         :param self:
         :param table:
         :param set_data:
-        :param where:
+        :param where: The condition, with a %s placeholder for each of the where_params
+        :param where_params:
         :return:
         """
 
-        set_data_str = ", ".join(
-            list(map(lambda key, val: "{key}='{val}'".format(key=str(key), val=str(val)), set_data.keys(),
-                     set_data.values())))
-
+        set_data_str = ", ".join("{key}=%s".format(key=key) for key in set_data.keys())
         query = "UPDATE {table} SET {data} WHERE {where}".format(table=table, data=set_data_str, where=where)
-        logger.debug("Executing: %s" % query)
-        self._cursor.execute(query)
-        self._connection.commit()
+        self._execute(query, params=tuple(set_data.values()) + tuple(where_params), commit=True)
 
     def select_from_table(self, table: str, columns: str = '*', where: str = 'TRUE', order_by: str = 'NULL',
-                          asc_or_desc: str = 'ASC', limit: int = 1000) -> List:
+                          asc_or_desc: str = 'ASC', limit: Union[int, None] = 1000, where_params: Tuple = ()) -> List:
         """
         Selects from a specified table based on the given columns, where, ordering and limit
 
         :param self:
         :param table:
         :param columns:
-        :param where:
+        :param where: The condition, with a %s placeholder for each of the where_params
         :param order_by:
         :param asc_or_desc:
-        :param limit:
+        :param limit: None to select every row
+        :param where_params:
         :return results:
         """
 
-        query = "SELECT {columns} FROM  {table} WHERE {where} ORDER BY {order_by} {asc_or_desc} LIMIT {limit}".format(
-            columns=columns, table=table, where=where, order_by=order_by, asc_or_desc=asc_or_desc, limit=limit)
-        logger.debug("Executing: %s" % query)
-        self._cursor.execute(query)
-        results = self._cursor.fetchall()
+        query = "SELECT {columns} FROM  {table} WHERE {where} ORDER BY {order_by} {asc_or_desc}".format(
+            columns=columns, table=table, where=where, order_by=order_by, asc_or_desc=asc_or_desc)
+        params = tuple(where_params)
+        if limit is not None:
+            query += " LIMIT %s"
+            params += (int(limit),)
+        return self._execute(query, params=params, fetch=True)
 
-        return results
+    def iterate_table(self, table: str, columns: str = '*', key_column: str = 'id', where: str = 'TRUE',
+                      where_params: Tuple = (), batch_size: int = 1000) -> Iterator[Tuple]:
+        """
+        Yields the selected rows in the order of the key column, `batch_size` rows at a time.
+        Each batch is selected after the last key of the previous one (keyset pagination),
+        so that only a batch is kept in memory and no batch is slower than the first one.
 
-    def delete_from_table(self, table: str, where: str) -> None:
+        :param self:
+        :param table:
+        :param columns:
+        :param key_column: A unique, indexed column
+        :param where: The condition, with a %s placeholder for each of the where_params
+        :param where_params:
+        :param batch_size:
+        :return rows:
+        """
+
+        query = "SELECT {key_column}, {columns} FROM {table} WHERE ({where}) AND {key_column} > %s " \
+                "ORDER BY {key_column} ASC LIMIT %s".format(key_column=key_column, columns=columns, table=table,
+                                                           where=where)
+        last_key = None
+        while True:
+            if last_key is None:
+                # Nothing sorts before NULL, so the first batch is selected without a lower bound
+                rows = self.select_from_table(table=table, columns="{key_column}, {columns}".format(
+                    key_column=key_column, columns=columns), where=where, order_by=key_column, limit=batch_size,
+                    where_params=where_params)
+            else:
+                rows = self._execute(query, params=tuple(where_params) + (last_key, int(batch_size)), fetch=True)
+            for row in rows:
+                yield tuple(row[1:])
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1][0]
+
+    def delete_from_table(self, table: str, where: str, where_params: Tuple = ()) -> None:
         """
         Deletes data from the specified table based on a where statement
 
         :param self:
         :param table:
-        :param where:
+        :param where: The condition, with a %s placeholder for each of the where_params
+        :param where_params:
         :return:
         """
 
         query = "DELETE FROM {table} WHERE {where}".format(table=table, where=where)
-        logger.debug("Executing: %s" % query)
-        self._cursor.execute(query)
-        self._connection.commit()
+        # Not retried, since the condition may match other rows once the first attempt is committed
+        self._execute(query, params=tuple(where_params), commit=True, retry=False)
+
+    def _execute(self, query: str, params: Tuple = (), prepared: bool = True, commit: bool = False,
+                 fetch: bool = False, retry: bool = True) -> List:
+        """
+        Executes the query on a pooled connection, retrying it on a new one if the connection was lost.
+        The queries with params run as server-side prepared statements, prepared once per query shape
+        and connection and reused from then on.
+
+        :param query:
+        :param params: The values bound to the %s placeholders of the query
+        :param prepared: Whether to prepare the statement, the DDL statements can't be
+        :param commit:
+        :param fetch: Whether to return the rows selected
+        :param retry: Whether the query can run again, i.e. whether running it twice has the same effect
+                      as running it once. Each statement is committed as it runs, so a lost connection
+                      doesn't tell whether it took effect
+        :return: The rows selected, if fetched
+        """
+
+        def operation(pooled_connection: MySqlPooledConnection) -> List:
+            if prepared:
+                executed_query, cursor = pooled_connection.get_prepared_cursor(query)
+            else:
+                executed_query, cursor = query, pooled_connection.connection.cursor()
+            try:
+                cursor.execute(executed_query, params)
+                rows = cursor.fetchall() if fetch else []
+            finally:
+                if not prepared:
+                    cursor.close()
+            if commit:
+                pooled_connection.connection.commit()
+            return rows
+
+        logger.debug("Executing: %s with params: %s" % (query, params))
+        return self._connection_pool.run(operation, max_retries=self._max_retries if retry else 0)
+
+    def run_statement(self, statement: str, params: Tuple = ()) -> None:
+        """
+        Runs and commits a statement that the rest of the methods don't cover, e.g. an ALTER TABLE
+
+        :param self:
+        :param statement: With a %s placeholder for each of the params
+        :param params:
+        :return:
+        """
+
+        # Not retried, since it may not be idempotent, e.g. an ALTER TABLE ADD INDEX
+        self._execute(statement, params=tuple(params), prepared=False, commit=True, retry=False)
 
     def show_tables(self) -> List:
         """
@@ -175,18 +318,24 @@ class MySqlDatastore(AbstractDatastore):
         """
 
         query = 'SHOW TABLES'
-        logger.debug("Executing: %s" % query)
-        self._cursor.execute(query)
-        results = self._cursor.fetchall()
+        results = self._execute(query, prepared=False, fetch=True)
 
         return [result[0] for result in results]
 
+    def close(self) -> None:
+        """
+        Closes the pooled connections
+
+        :return:
+        """
+
+        self._connection_pool.close()
+
     def __exit__(self) -> None:
         """
-        Flushes and closes the connection
+        Closes the pooled connections
 
         :return:
         """
 
-        self._connection.commit()
-        self._cursor.close()
+        self.close()
@@ -0,0 +1,309 @@
+import os
+import sqlite3
+import threading
+import logging
+from typing import Iterator, List, Tuple, Dict, Union
+
+from .abstract_datastore import AbstractDatastore
+
+logger = logging.getLogger('SqliteDatastore')
+
+
+class SqliteDatastore(AbstractDatastore):
+    __slots__ = ('db_path', '_lock')
+
+    db_path: str
+    _connection: sqlite3.Connection
+    _lock: threading.RLock
+
+    def __init__(self, config: Dict) -> None:
+        """
+        The basic constructor. Creates a new instance of a local Datastore stored in the `db_path` file
+        that is safe to use from multiple threads.
+
+        :param config:
+        """
+
+        self.db_path = config['db_path']
+        self._lock = threading.RLock()
+        self._connection = self.get_connection(db_path=self.db_path,
+                                               busy_timeout=config['busy_timeout'] if 'busy_timeout' in config
+                                               else 5)
+
+    @staticmethod
+    def get_connection(db_path: str, busy_timeout: float = 5) -> sqlite3.Connection:
+        """
+        Creates and returns a connection to the SQLite DB, creating its file if it doesn't exist.
+        The DB is journaled with a write-ahead log, so that the reads never wait for the writes.
+
+        :param db_path: The path of the DB file, or :memory:
+        :param busy_timeout: The seconds to wait for a lock held by another process
+        :return:
+        """
+
+        db_folder = os.path.dirname(db_path)
+        if db_folder != '':
+            os.makedirs(db_folder, exist_ok=True)
+        connection = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        # Durable enough in WAL mode, a power loss can only roll back the last transactions
+        connection.execute('PRAGMA synchronous=NORMAL')
+
+        return connection
+
+    def create_table(self, table: str, schema: str) -> None:
+        """
+        Creates a table using the specified schema
+
+        :param self:
+        :param table:
+        :param schema:
+        :return:
+        """
+
+        query = "CREATE TABLE IF NOT EXISTS {table} ({schema})".format(table=table, schema=schema)
+        self._execute(query, commit=True)
+
+    def create_index(self, table: str, column: str) -> None:
+        """
+        Creates an index on the specified column if it doesn't exist
+
+        :param self:
+        :param table:
+        :param column:
+        :return:
+        """
+
+        query = "CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})".format(table=table,
+                                                                                           column=column)
+        self._execute(query, commit=True)
+
+    def drop_table(self, table: str) -> None:
+        """
+        Drops the specified table if it exists
+
+        :param self:
+        :param table:
+        :return:
+        """
+
+        query = "DROP TABLE IF EXISTS {table}".format(table=table)
+        self._execute(query, commit=True)
+
+    def truncate_table(self, table: str) -> None:
+        """
+        Truncates the specified table
+
+        :param self:
+        :param table:
+        :return:
+        """
+
+        query = "DELETE FROM {table}".format(table=table)
+        self._execute(query, commit=True)
+
+    def insert_into_table(self, table: str, data: dict) -> None:
+        """
+        Inserts into the specified table a row based on a column_name: value dictionary
+
+        :param self:
+        :param table:
+        :param data:
+        :return:
+        """
+
+        query = "INSERT INTO {table} ({columns}) VALUES ({placeholders})".format(
+            table=table, columns=', '.join(data.keys()), placeholders=', '.join(['%s'] * len(data)))
+        self._execute(query, params=tuple(data.values()), commit=True)
+
+    def insert_many_into_table(self, table: str, columns: List[str], rows: List[Tuple],
+                               ignore_duplicates: bool = False, update_columns: List[str] = None,
+                               update_where: str = None, max_rows_per_query: int = 500) -> None:
+        """
+        Inserts the rows into the specified table in a single transaction
+
+        :param self:
+        :param table:
+        :param columns:
+        :param rows: One tuple of values per row, in the order of the columns
+        :param ignore_duplicates: Skip the rows that violate a unique key
+        :param update_columns: Update these columns of the existing rows with the same first column,
+                               which has to be unique
+        :param update_where: Update only the existing rows that match this condition
+        :param max_rows_per_query: Unused, the rows are inserted with a single executemany
+        :return:
+        """
+
+        query = "INSERT {or_ignore}INTO {table} ({columns}) VALUES ({placeholders})".format(
+            or_ignore='OR IGNORE ' if ignore_duplicates or update_columns is not None else '', table=table,
+            columns=', '.join(columns), placeholders=', '.join(['?'] * len(columns)))
+        logger.debug("Executing: %s for %s rows" % (query, len(rows)))
+        with self._lock:
+            with self._connection:
+                if update_columns is not None:
+                    update_query = "UPDATE {table} SET {assignments} WHERE {key_column} = ? AND ({where})".format(
+                        table=table, assignments=', '.join("{column}=?".format(column=column)
+                                                           for column in update_columns),
+                        key_column=columns[0], where=update_where if update_where is not None else 'TRUE')
+                    column_indexes = [columns.index(column) for column in update_columns]
+                    self._connection.executemany(update_query, [tuple(row[column_index]
+                                                                      for column_index in column_indexes) + (row[0],)
+                                                                for row in rows])
+                self._connection.executemany(query, rows)
+
+    def update_table(self, table: str, set_data: dict, where: str, where_params: Tuple = ()) -> None:
+        """
+        Updates the specified table using a column_name: value dictionary and a where statement
+
+        :param self:
+        :param table:
+        :param set_data:
+        :param where: The condition, with a %s placeholder for each of the where_params
+        :param where_params:
+        :return:
+        """
+
+        set_data_str = ", ".join("{key}=%s".format(key=key) for key in set_data.keys())
+        query = "UPDATE {table} SET {data} WHERE {where}".format(table=table, data=set_data_str, where=where)
+        self._execute(query, params=tuple(set_data.values()) + tuple(where_params), commit=True)
+
+    def select_from_table(self, table: str, columns: str = '*', where: str = 'TRUE', order_by: str = 'NULL',
+                          asc_or_desc: str = 'ASC', limit: Union[int, None] = 1000, where_params: Tuple = ()) -> List:
+        """
+        Selects from a specified table based on the given columns, where, ordering and limit
+
+        :param self:
+        :param table:
+        :param columns:
+        :param where: The condition, with a %s placeholder for each of the where_params
+        :param order_by:
+        :param asc_or_desc:
+        :param limit: None to select every row
+        :param where_params:
+        :return results:
+        """
+
+        query = "SELECT {columns} FROM  {table} WHERE {where} ORDER BY {order_by} {asc_or_desc}".format(
+            columns=columns, table=table, where=where, order_by=order_by, asc_or_desc=asc_or_desc)
+        params = tuple(where_params)
+        if limit is not None:
+            query += " LIMIT %s"
+            params += (int(limit),)
+        return self._execute(query, params=params, fetch=True)
+
+    def iterate_table(self, table: str, columns: str = '*', key_column: str = 'id', where: str = 'TRUE',
+                      where_params: Tuple = (), batch_size: int = 1000) -> Iterator[Tuple]:
+        """
+        Yields the selected rows in the order of the key column, `batch_size` rows at a time.
+        Each batch is selected after the last key of the previous one (keyset pagination),
+        so that only a batch is kept in memory and no batch is slower than the first one.
+
+        :param self:
+        :param table:
+        :param columns:
+        :param key_column: A unique, indexed column
+        :param where: The condition, with a %s placeholder for each of the where_params
+        :param where_params:
+        :param batch_size:
+        :return rows:
+        """
+
+        query = "SELECT {key_column}, {columns} FROM {table} WHERE ({where}) AND {key_column} > %s " \
+                "ORDER BY {key_column} ASC LIMIT %s".format(key_column=key_column, columns=columns, table=table,
+                                                           where=where)
+        last_key = None
+        while True:
+            if last_key is None:
+                # Nothing sorts before NULL, so the first batch is selected without a lower bound
+                rows = self.select_from_table(table=table, columns="{key_column}, {columns}".format(
+                    key_column=key_column, columns=columns), where=where, order_by=key_column, limit=batch_size,
+                    where_params=where_params)
+            else:
+                rows = self._execute(query, params=tuple(where_params) + (last_key, int(batch_size)), fetch=True)
+            for row in rows:
+                yield tuple(row[1:])
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1][0]
+
+    def delete_from_table(self, table: str, where: str, where_params: Tuple = ()) -> None:
+        """
+        Deletes data from the specified table based on a where statement
+
+        :param self:
+        :param table:
+        :param where: The condition, with a %s placeholder for each of the where_params
+        :param where_params:
+        :return:
+        """
+
+        query = "DELETE FROM {table} WHERE {where}".format(table=table, where=where)
+        self._execute(query, params=tuple(where_params), commit=True)
+
+    def _execute(self, query: str, params: Tuple = (), commit: bool = False, fetch: bool = False) -> List:
+        """
+        Executes the query, with the same %s placeholders as the MySQL datastore.
+        The sqlite3 module keeps the statements it has compiled cached, so they are prepared only once.
+
+        :param query:
+        :param params: The values bound to the %s placeholders of the query
+        :param commit:
+        :param fetch: Whether to return the rows selected
+        :return: The rows selected, if fetched
+        """
+
+        query = query.replace('%s', '?')
+        logger.debug("Executing: %s with params: %s" % (query, params))
+        with self._lock:
+            try:
+                cursor = self._connection.execute(query, params)
+                rows = cursor.fetchall() if fetch else []
+                cursor.close()
+                if commit:
+                    self._connection.commit()
+            except Exception:
+                self._connection.rollback()
+                raise
+        return rows
+
+    def run_statement(self, statement: str, params: Tuple = ()) -> None:
+        """
+        Runs and commits a statement that the rest of the methods don't cover, e.g. an ALTER TABLE
+
+        :param self:
+        :param statement: With a %s placeholder for each of the params
+        :param params:
+        :return:
+        """
+
+        self._execute(statement, params=tuple(params), commit=True)
+
+    def show_tables(self) -> List:
+        """
+        Show a list of the tables present in the db
+        :return:
+        """
+
+        query = "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        results = self._execute(query, fetch=True)
+
+        return [result[0] for result in results]
+
+    def close(self) -> None:
+        """
+        Closes the connection
+
+        :return:
+        """
+
+        with self._lock:
+            self._connection.close()
+
+    def __exit__(self) -> None:
+        """
+        Closes the connection
+
+        :return:
+        """
+
+        self.close()
@@ -0,0 +1,55 @@
+import os
+import threading
+import logging
+from mimetypes import guess_type
+from email.encoders import encode_base64
+from email.mime.base import MIMEBase
+from typing import Dict, Tuple
+
+logger = logging.getLogger('AttachmentCache')
+
+
+class AttachmentCache:
+    __slots__ = ('_attachments', '_lock')
+
+    _attachments: Dict[str, Tuple[Tuple[int, int], MIMEBase]]
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        """
+        The basic constructor. Creates a new AttachmentCache of the base64 encoded MIME parts of the files
+        attached to the emails, so that each file is read and encoded once instead of once per email.
+        A part is built again when the modification time or the size of its file change.
+        """
+
+        self._attachments = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> MIMEBase:
+        """
+        Returns the MIME part of the file, built the same way as gmail.Message does.
+        The part is shared by all the emails, so it shouldn't be modified.
+
+        :param path:
+        """
+
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if path in self._attachments:
+                cached_version, attachment = self._attachments[path]
+                if cached_version == version:
+                    return attachment
+        main_type, sub_type = (guess_type(path)[0] or 'application/octet-stream').split('/', 1)
+        attachment = MIMEBase(main_type, sub_type)
+        with open(path, 'rb') as attachment_file:
+            attachment.set_payload(attachment_file.read())
+        attachment.add_header('Content-Disposition', 'attachment', filename=os.path.basename(path))
+        encode_base64(attachment)
+        logger.debug("Encoded attachment %s (%s bytes)" % (path, version[1]))
+        with self._lock:
+            self._attachments[path] = (version, attachment)
+        return attachment
+
+    def __len__(self) -> int:
+        return len(self._attachments)
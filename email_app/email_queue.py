@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import threading
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, List, Union
+
+logger = logging.getLogger('EmailQueue')
+
+
+class EmailQueue:
+    __slots__ = ('queue_path', 'workers_count', 'max_attempts', 'retry_backoff', 'max_retry_backoff',
+                 '_send_email', '_on_sent', '_on_failed', '_connection', '_lock', '_condition', '_stop_event',
+                 '_workers', '_latencies')
+
+    queue_path: str
+    workers_count: int
+    max_attempts: int
+    retry_backoff: float
+    max_retry_backoff: float
+    _send_email: Callable[..., None]
+    _on_sent: Union[Callable[[str, Dict], None], None]
+    _on_failed: Union[Callable[[str, Dict, str], None], None]
+    _connection: sqlite3.Connection
+    _lock: threading.Lock
+    _condition: threading.Condition
+    _stop_event: threading.Event
+    _workers: List[threading.Thread]
+    _latencies: Deque[float]
+    table_name: str = 'outbound_emails'
+    table_schema: str = 'id integer primary key autoincrement, ' \
+                        'idempotency_key varchar(255) not null, ' \
+                        'message text not null, ' \
+                        'status varchar(20) not null, ' \
+                        'attempts int not null default 0, ' \
+                        'enqueued_on real not null, ' \
+                        'send_on real not null, ' \
+                        'next_attempt_on real not null, ' \
+                        'sent_on real null, ' \
+                        'last_error text null, ' \
+                        'constraint idempotency_key unique (idempotency_key)'
+
+    def __init__(self, send_email: Callable[..., None], queue_path: str = 'outbound_emails.sqlite3',
+                 workers: int = 1, max_attempts: int = 5, retry_backoff: float = 30,
+                 max_retry_backoff: float = 3600, on_sent: Callable[[str, Dict], None] = None,
+                 on_failed: Callable[[str, Dict, str], None] = None) -> None:
+        """
+        The basic constructor. Creates a new durable EmailQueue, stored in the `queue_path` SQLite file,
+        that `workers` threads drain by calling `send_email` with the arguments of each message.
+        A failed send is retried up to `max_attempts` times, after `retry_backoff` seconds that double
+        after each failure, up to `max_retry_backoff` seconds.
+        The workers start with `start`, so the messages left in the queue, or being sent, by a previous run
+        are sent only then.
+
+        :param send_email: E.g. GmailEmailApp.send_email
+        :param queue_path:
+        :param workers:
+        :param max_attempts:
+        :param retry_backoff:
+        :param max_retry_backoff:
+        :param on_sent: Called with the idempotency key and the message of each email sent
+        :param on_failed: Called with the idempotency key, the message and the last error of each email given up on
+        """
+
+        self.queue_path = queue_path
+        self.workers_count = max(workers, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self._send_email = send_email
+        self._on_sent = on_sent
+        self._on_failed = on_failed
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        # Of the last emails sent
+        self._latencies = deque(maxlen=1000)
+        queue_folder = os.path.dirname(queue_path)
+        if queue_folder != '':
+            os.makedirs(queue_folder, exist_ok=True)
+        self._connection = sqlite3.connect(queue_path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS {table} ({schema})".format(
+                table=self.table_name, schema=self.table_schema))
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info({table})".format(
+                table=self.table_name))]
+            if 'send_on' not in columns:
+                # Queued before the emails could be delayed
+                self._connection.execute("ALTER TABLE {table} ADD COLUMN send_on real null".format(
+                    table=self.table_name))
+                self._connection.execute("UPDATE {table} SET send_on = enqueued_on".format(table=self.table_name))
+            self._connection.execute("CREATE INDEX IF NOT EXISTS {table}_status_next_attempt_on "
+                                     "ON {table} (status, next_attempt_on)".format(table=self.table_name))
+            # The process stopped while they were being sent, so they may be sent twice
+            interrupted = self._connection.execute("UPDATE {table} SET status = 'queued' WHERE status = 'sending'"
+                                                   .format(table=self.table_name)).rowcount
+        if interrupted > 0:
+            logger.warning("Requeued %s emails that were being sent when the last run stopped" % interrupted)
+        self._workers = []
+
+    def start(self) -> None:
+        """
+        Starts the workers that send the emails in the background.
+        """
+
+        if len(self._workers) > 0:
+            return
+        self._workers = [threading.Thread(target=self._run_worker, name='EmailQueueWorker-%s' % worker_id,
+                                          daemon=True) for worker_id in range(self.workers_count)]
+        for worker in self._workers:
+            worker.start()
+
+    def enqueue(self, idempotency_key: str, subject: str, to: List, cc: List = None, bcc: List = None,
+                text: str = None, html: str = None, attachments: List = None, sender: str = None,
+                reply_to: str = None, delay: float = 0) -> bool:
+        """
+        Adds an email to the queue and returns right away.
+        It is sent once `delay` seconds have passed, after the emails enqueued before it with the same delay.
+
+        :param idempotency_key: Unique per email, an email enqueued again with the same key is ignored,
+                                unless it was given up on, in which case it is queued again from scratch
+        :param subject:
+        :param to:
+        :param cc:
+        :param bcc:
+        :param text:
+        :param html:
+        :param attachments: The local paths of the files, which have to exist until the email is sent
+        :param sender:
+        :param reply_to:
+        :param delay:
+        :return: Whether it was added
+        """
+
+        message = {'subject': subject, 'to': to, 'cc': cc, 'bcc': bcc, 'text': text, 'html': html,
+                   'attachments': attachments, 'sender': sender, 'reply_to': reply_to}
+        now = time.time()
+        send_on = now + delay
+        with self._condition:
+            with self._connection:
+                is_added = self._connection.execute(
+                    "UPDATE {table} SET message = ?, status = 'queued', attempts = 0, enqueued_on = ?, send_on = ?, "
+                    "next_attempt_on = ?, sent_on = NULL, last_error = NULL "
+                    "WHERE idempotency_key = ? AND status = 'failed'".format(table=self.table_name),
+                    (json.dumps(message), now, send_on, send_on, idempotency_key)).rowcount > 0
+                if not is_added:
+                    is_added = self._connection.execute(
+                        "INSERT OR IGNORE INTO {table} "
+                        "(idempotency_key, message, status, enqueued_on, send_on, next_attempt_on) "
+                        "VALUES (?, ?, 'queued', ?, ?, ?)".format(table=self.table_name),
+                        (idempotency_key, json.dumps(message), now, send_on, send_on)).rowcount > 0
+            if is_added:
+                self._condition.notify()
+        if is_added:
+            logger.debug("Enqueued email %s to %s, to send in %.0f seconds" % (idempotency_key, to, send_on - now))
+        else:
+            logger.debug("Email %s is already enqueued" % idempotency_key)
+        return is_added
+
+    def get_status(self, idempotency_key: str) -> Union[str, None]:
+        """
+        Returns whether the email is queued, sending, sent or failed, None if it was never enqueued.
+
+        :param idempotency_key:
+        """
+
+        with self._lock:
+            row = self._connection.execute("SELECT status FROM {table} WHERE idempotency_key = ?"
+                                           .format(table=self.table_name), (idempotency_key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def get_metrics(self) -> Dict[str, Union[int, float, None]]:
+        """
+        Returns the number of emails in each status and of the queued ones that are due,
+        the seconds the oldest one still queued is overdue, and the seconds from the time
+        each of the last emails sent by this run was due to the time it was sent.
+        """
+
+        with self._lock:
+            counts = dict(self._connection.execute("SELECT status, COUNT(*) FROM {table} GROUP BY status"
+                                                   .format(table=self.table_name)).fetchall())
+            now = time.time()
+            due, oldest_send_on = self._connection.execute(
+                "SELECT COUNT(*), MIN(send_on) FROM {table} WHERE status IN ('queued', 'sending') "
+                "AND next_attempt_on <= ?".format(table=self.table_name), (now,)).fetchone()
+            latencies = sorted(self._latencies)
+        return {'queued': counts.get('queued', 0),
+                'sending': counts.get('sending', 0),
+                'sent': counts.get('sent', 0),
+                'failed': counts.get('failed', 0),
+                'due': due,
+                'oldest_due_age': now - oldest_send_on if oldest_send_on is not None else None,
+                'avg_latency': sum(latencies) / len(latencies) if len(latencies) > 0 else None,
+                'max_latency': latencies[-1] if len(latencies) > 0 else None}
+
+    def wait_until_empty(self, timeout: float = None) -> bool:
+        """
+        Waits until no email is queued or being sent, e.g. before shutting down.
+
+        :param timeout: The seconds to wait at most, forever if None
+        :return: Whether the queue was emptied
+        """
+
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            metrics = self.get_metrics()
+            if metrics['queued'] + metrics['sending'] == 0:
+                return True
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.1)
+
+    def stop(self) -> None:
+        """
+        Stops the workers once they finish the emails they are sending.
+        The emails can still be enqueued, to be sent by the next run.
+        """
+
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def close(self) -> None:
+        """
+        Stops the workers and closes the queue.
+        The rest of the emails stay in the queue for the next run.
+        """
+
+        self.stop()
+        with self._lock:
+            self._connection.close()
+
+    def _claim_next(self) -> Union[Dict, None]:
+        """
+        Marks the next email that is due as being sent and returns it, or waits for one up to a second.
+        """
+
+        with self._condition:
+            now = time.time()
+            row = self._connection.execute(
+                "SELECT id, idempotency_key, message, attempts, send_on FROM {table} "
+                "WHERE status = 'queued' AND next_attempt_on <= ? ORDER BY next_attempt_on, id LIMIT 1"
+                .format(table=self.table_name), (now,)).fetchone()
+            if row is None:
+                next_attempt_on = self._connection.execute(
+                    "SELECT MIN(next_attempt_on) FROM {table} WHERE status = 'queued'"
+                    .format(table=self.table_name)).fetchone()[0]
+                timeout = min(next_attempt_on - now, 1) if next_attempt_on is not None else 1
+                self._condition.wait(timeout=max(timeout, 0))
+                return None
+            with self._connection:
+                self._connection.execute("UPDATE {table} SET status = 'sending', attempts = attempts + 1 "
+                                         "WHERE id = ?".format(table=self.table_name), (row[0],))
+        return {'id': row[0], 'idempotency_key': row[1], 'message': json.loads(row[2]), 'attempts': row[3] + 1,
+                'send_on': row[4]}
+
+    def _run_worker(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                email = self._claim_next()
+            except Exception as e:
+                logger.error("Failed to read the email queue: %s" % e)
+                self._stop_event.wait(timeout=1)
+                continue
+            if email is not None:
+                self._send(email)
+
+    def _send(self, email: Dict) -> None:
+        try:
+            self._send_email(**email['message'])
+        except Exception as e:
+            self._retry_or_fail(email=email, error=e)
+            return
+        now = time.time()
+        with self._lock:
+            with self._connection:
+                self._connection.execute("UPDATE {table} SET status = 'sent', sent_on = ?, last_error = NULL "
+                                         "WHERE id = ?".format(table=self.table_name), (now, email['id']))
+            self._latencies.append(now - email['send_on'])
+        logger.debug("Sent email %s after %s attempts" % (email['idempotency_key'], email['attempts']))
+        if self._on_sent is not None:
+            try:
+                self._on_sent(email['idempotency_key'], email['message'])
+            except Exception as e:
+                logger.error("Failed to handle the email %s sent: %s" % (email['idempotency_key'], e))
+
+    def _retry_or_fail(self, email: Dict, error: Exception) -> None:
+        if email['attempts'] >= self.max_attempts:
+            logger.error("Giving up on email %s after %s attempts: %s" % (email['idempotency_key'],
+                                                                          email['attempts'], error))
+            status, next_attempt_on = 'failed', time.time()
+        else:
+            backoff = min(self.retry_backoff * 2 ** (email['attempts'] - 1), self.max_retry_backoff)
+            # Spread the retries of the emails that failed together
+            backoff *= random.uniform(0.8, 1.2)
+            logger.warning("Failed to send email %s (attempt %s), retrying in %.0f seconds: %s"
+                           % (email['idempotency_key'], email['attempts'], backoff, error))
+            status, next_attempt_on = 'queued', time.time() + backoff
+        with self._lock:
+            with self._connection:
+                self._connection.execute("UPDATE {table} SET status = ?, next_attempt_on = ?, last_error = ? "
+                                         "WHERE id = ?".format(table=self.table_name),
+                                         (status, next_attempt_on, str(error), email['id']))
+        if status == 'failed' and self._on_failed is not None:
+            try:
+                self._on_failed(email['idempotency_key'], email['message'], str(error))
+            except Exception as e:
+                logger.error("Failed to handle the email %s given up on: %s" % (email['idempotency_key'], e))
@@ -1,30 +1,38 @@
-from typing import List, Dict
+from typing import List, Dict, Union
 import logging
 from gmail import GMail, Message
 
 from .abstract_email_app import AbstractEmailApp
+from .attachment_cache import AttachmentCache
+from .smtp_session_pool import SmtpSessionPool
 
 logger = logging.getLogger('GmailEmailApp')
 
 
 class GmailEmailApp(AbstractEmailApp):
-    __slots__ = ('_handler', 'email_address', 'test_mode')
+    __slots__ = ('_session_pool', 'email_address', 'test_mode', '_attachment_cache')
 
-    _handler: GMail
+    _session_pool: SmtpSessionPool
+    _attachment_cache: AttachmentCache
     test_mode: bool
 
     def __init__(self, config: Dict, test_mode: bool = False) -> None:
         """
-        The basic constructor. Creates a new instance of EmailApp using the specified credentials
+        The basic constructor. Creates a new instance of EmailApp using the specified credentials,
+        that sends up to `smtp_pool_size` emails at the same time, e.g. for the workers of an EmailQueue.
+        The idle SMTP sessions are kept alive every `keep_alive_interval` seconds.
 
         :param config:
         :param test_mode:
         """
 
         self.email_address = config['email_address']
-        self._handler = self.get_handler(email_address=self.email_address,
-                                         api_key=config['api_key'])
+        self._session_pool = SmtpSessionPool(
+            connect=lambda: self.get_handler(email_address=self.email_address, api_key=config['api_key']),
+            pool_size=config['smtp_pool_size'] if 'smtp_pool_size' in config else 1,
+            keep_alive_interval=config['keep_alive_interval'] if 'keep_alive_interval' in config else 60)
         self.test_mode = test_mode
+        self._attachment_cache = AttachmentCache()
         super().__init__()
 
     @staticmethod
@@ -42,7 +50,15 @@ class GmailEmailApp(AbstractEmailApp):
         return gmail_handler
 
     def is_connected(self) -> bool:
-        return self._handler.is_connected()
+        return self._session_pool.is_connected()
+
+    def get_smtp_stats(self) -> Dict[str, Union[int, bool]]:
+        """
+        Returns the number of SMTP sessions, whether they are connected, and the number of sends,
+        reconnects and keep-alives so far.
+        """
+
+        return self._session_pool.get_stats()
 
     def get_self_email(self) -> str:
         return self.email_address
@@ -58,7 +74,7 @@ class GmailEmailApp(AbstractEmailApp):
         :param bcc:
         :param text:
         :param html:
-        :param attachments:
+        :param attachments: The local paths of the files, encoded once and reused by the next emails
         :param sender:
         :param reply_to:
         :return:
@@ -69,18 +85,26 @@ class GmailEmailApp(AbstractEmailApp):
             cc = [self.email_address] if cc is not None else None
             bcc = [self.email_address] if bcc is not None else None
 
-        logger.debug("Constructing message..")
-        msg = Message(subject=subject,
-                      to=",".join(to),
-                      cc=",".join(cc) if cc is not None else None,
-                      bcc=",".join(bcc) if cc is not None else None,
-                      text=text,
-                      html=html,
-                      attachments=attachments,
-                      sender=sender,
-                      reply_to=reply_to)
-        logger.debug("Sending email to %s with subject: %s.." % (to, subject))
-        self._handler.send(msg)
+        if attachments is not None:
+            attachments = [self._attachment_cache.get(attachment) if isinstance(attachment, str) else attachment
+                           for attachment in attachments]
+
+        def send(handler: GMail) -> None:
+            # Constructed again for each attempt, because sending it removes its Bcc header
+            logger.debug("Constructing message..")
+            msg = Message(subject=subject,
+                          to=",".join(to),
+                          cc=",".join(cc) if cc is not None else None,
+                          bcc=",".join(bcc) if cc is not None else None,
+                          text=text,
+                          html=html,
+                          attachments=attachments,
+                          sender=sender,
+                          reply_to=reply_to)
+            logger.debug("Sending email to %s with subject: %s.." % (to, subject))
+            handler.send(msg)
+
+        self._session_pool.run(send)
 
     def __exit__(self):
-        self._handler.close()
+        self._session_pool.close()
@@ -0,0 +1,82 @@
+import hashlib
+import logging
+from typing import Callable, Dict, List
+
+from buffering.write_buffer import WriteBuffer
+
+logger = logging.getLogger('NotificationDigest')
+
+
+class NotificationDigest:
+    __slots__ = ('subject_template', 'html_template', '_send_digest', '_write_buffer')
+
+    subject_template: str
+    html_template: str
+    _send_digest: Callable[[str, str, str], None]
+    _write_buffer: WriteBuffer
+    kinds: List[str] = ['inform_success', 'inform_should_call']
+
+    def __init__(self, send_digest: Callable[[str, str, str], None], journal_path: str, window: float = 3600,
+                 max_notifications: int = 100,
+                 subject_template: str = 'Job Bot: {count} new ads, {inform_success} applications sent, '
+                                         '{inform_should_call} to call',
+                 html_template: str = '<h2>{subject}</h2>\n<hr>\n{notifications}') -> None:
+        """
+        The basic constructor. Creates a new NotificationDigest that collects the notifications of the applicant
+        and sends them as a single summary email every `window` seconds, or once `max_notifications` of them
+        are collected. The notifications collected are journaled, so that a restart doesn't lose them.
+
+        :param send_digest: Sends the digest, called with an idempotency key, the subject and the html
+        :param journal_path:
+        :param window: The seconds between two digests
+        :param max_notifications:
+        :param subject_template: Formatted with the count of the notifications and the count of each kind
+        :param html_template: Formatted with the subject, the same counts and the html of the notifications
+        """
+
+        self.subject_template = subject_template
+        self.html_template = html_template
+        self._send_digest = send_digest
+        self._write_buffer = WriteBuffer(flush_rows=self._send, journal_path=journal_path,
+                                         max_rows=max_notifications, flush_interval=window)
+
+    def add(self, kind: str, link: str, html: str) -> None:
+        """
+        Adds a notification to the next digest.
+
+        :param kind: inform_success or inform_should_call
+        :param link: The link of the ad
+        :param html: The notification, as it would be sent on its own
+        """
+
+        if kind not in self.kinds:
+            raise NotificationDigestError("Unknown notification kind: %s" % kind)
+        self._write_buffer.add({'kind': kind, 'link': link, 'html': html})
+
+    def close(self) -> None:
+        """
+        Sends the notifications collected so far.
+        """
+
+        self._write_buffer.close()
+
+    def _send(self, notifications: List[Dict]) -> None:
+        counts = {kind: 0 for kind in self.kinds}
+        for notification in notifications:
+            counts[notification['kind']] += 1
+        subject = self.subject_template.format(count=len(notifications), **counts)
+        html = self.html_template.format(subject=subject, count=len(notifications),
+                                         notifications='\n<hr>\n'.join(notification['html']
+                                                                      for notification in notifications),
+                                         **counts)
+        # The same notifications are sent again if the process stopped before they were removed from the journal
+        idempotency_key = 'digest:' + hashlib.sha1('\n'.join(
+            notification['kind'] + ' ' + notification['link'] for notification in notifications).encode()).hexdigest()
+        logger.debug("Sending a digest of %s notifications.." % len(notifications))
+        self._send_digest(idempotency_key, subject, html)
+
+
+class NotificationDigestError(Exception):
+    def __init__(self, message):
+        # Call the base class constructor with the parameters it needs
+        super().__init__(message)
@@ -0,0 +1,245 @@
+import time
+import socket
+import smtplib
+import threading
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Tuple, Union
+
+from gmail import GMail
+
+logger = logging.getLogger('SmtpSessionPool')
+
+
+class SmtpPooledSession:
+    __slots__ = ('handler', 'last_used')
+
+    handler: GMail
+    last_used: float
+
+    def __init__(self, handler: GMail) -> None:
+        """
+        The basic constructor. Creates a new SmtpPooledSession around a connected SMTP handler.
+
+        :param handler:
+        """
+
+        self.handler = handler
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        try:
+            self.handler.close()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+
+class SmtpSessionPool:
+    __slots__ = ('_connect', '_pool_size', '_pool_timeout', '_keep_alive_interval', '_idle_sessions',
+                 '_sessions_opened', '_is_connected', '_stats', '_lock', '_condition', '_stop_event',
+                 '_keep_alive_thread')
+
+    _connect: Callable[[], GMail]
+    _pool_size: int
+    _pool_timeout: float
+    _keep_alive_interval: Union[float, None]
+    # The least recently used first
+    _idle_sessions: Deque[SmtpPooledSession]
+    _sessions_opened: int
+    _is_connected: bool
+    _stats: Dict[str, int]
+    _lock: threading.Lock
+    _condition: threading.Condition
+    _stop_event: threading.Event
+    _keep_alive_thread: Union[threading.Thread, None]
+    _session_errors: Tuple = (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)
+
+    def __init__(self, connect: Callable[[], GMail], pool_size: int = 1, pool_timeout: float = 60,
+                 keep_alive_interval: float = 60) -> None:
+        """
+        The basic constructor. Creates a new thread-safe SmtpSessionPool of up to `pool_size` SMTP sessions.
+        The sessions are opened lazily, except for the first one that validates the credentials.
+        Every `keep_alive_interval` seconds the idle sessions are sent a NOOP in the background,
+        so that the server doesn't close them, and the ones it closed anyway are reconnected,
+        before an email has to wait for them.
+
+        :param connect: Opens a new SMTP session and logs in
+        :param pool_size: How many emails can be sent at the same time
+        :param pool_timeout: The seconds to wait for a session when all of them are in use
+        :param keep_alive_interval: Never kept alive in the background if None
+        """
+
+        self._connect = connect
+        self._pool_size = max(pool_size, 1)
+        self._pool_timeout = pool_timeout
+        self._keep_alive_interval = keep_alive_interval
+        self._idle_sessions = deque()
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._stats = {'sends': 0, 'lost_sessions': 0, 'reconnects': 0, 'keep_alives': 0, 'failed_keep_alives': 0}
+        self._idle_sessions.append(self._open_session())
+        self._sessions_opened = 1
+        self._is_connected = True
+        self._stop_event = threading.Event()
+        if self._keep_alive_interval is not None:
+            self._keep_alive_thread = threading.Thread(target=self._run_keep_alive, name='SmtpSessionKeepAlive',
+                                                       daemon=True)
+            self._keep_alive_thread.start()
+        else:
+            self._keep_alive_thread = None
+
+    def run(self, operation: Callable[[GMail], Any], max_retries: int = 1) -> Any:
+        """
+        Runs the operation, e.g. a send, on a pooled session, retrying it on a new session if the server
+        had closed the session.
+
+        :param operation:
+        :param max_retries:
+        """
+
+        for attempt in range(max_retries + 1):
+            session = self._acquire()
+            try:
+                result = operation(session.handler)
+            except self._session_errors as e:
+                self._discard(session)
+                with self._lock:
+                    self._stats['lost_sessions'] += 1
+                    self._is_connected = False
+                if attempt == max_retries:
+                    raise
+                logger.warning("Lost the SMTP session (%s), retrying on a new one.." % e)
+            except Exception:
+                self._release(session)
+                raise
+            else:
+                self._release(session)
+                with self._lock:
+                    self._stats['sends'] += 1
+                    self._is_connected = True
+                return result
+
+    def is_connected(self) -> bool:
+        """
+        Returns whether the last send, keep-alive or reconnect succeeded.
+        """
+
+        with self._lock:
+            return self._is_connected and not self._stop_event.is_set()
+
+    def get_stats(self) -> Dict[str, Union[int, bool]]:
+        """
+        Returns the number of sessions open and idle, whether they are connected, and the number of sends,
+        sessions lost while sending, reconnects and keep-alives so far.
+        """
+
+        with self._lock:
+            return dict(self._stats, sessions=self._sessions_opened, idle_sessions=len(self._idle_sessions),
+                        is_connected=self._is_connected)
+
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._keep_alive_thread is not None:
+            self._keep_alive_thread.join()
+        while True:
+            with self._lock:
+                if len(self._idle_sessions) == 0:
+                    break
+                session = self._idle_sessions.popleft()
+            self._discard(session)
+
+    def _acquire(self) -> SmtpPooledSession:
+        deadline = time.monotonic() + self._pool_timeout
+        with self._condition:
+            # Wait for either an idle session or a free slot, e.g. of a session that was lost
+            while len(self._idle_sessions) == 0 and self._sessions_opened >= self._pool_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    raise SmtpSessionPoolError("No SMTP session was released in %s seconds" % self._pool_timeout)
+                self._condition.wait(timeout=timeout)
+            if len(self._idle_sessions) > 0:
+                # The most recently used one, so that the rest can be closed by the server if they aren't needed
+                return self._idle_sessions.pop()
+            # Reserve it before connecting, so that the pool never grows past its size
+            self._sessions_opened += 1
+        try:
+            return self._open_session()
+        except Exception:
+            self._free_slot()
+            raise
+
+    def _open_session(self) -> SmtpPooledSession:
+        logger.debug("Opening a new SMTP session..")
+        return SmtpPooledSession(handler=self._connect())
+
+    def _release(self, session: SmtpPooledSession) -> None:
+        session.last_used = time.monotonic()
+        with self._condition:
+            self._idle_sessions.append(session)
+            self._condition.notify()
+
+    def _discard(self, session: SmtpPooledSession) -> None:
+        session.close()
+        self._free_slot()
+
+    def _free_slot(self) -> None:
+        with self._condition:
+            self._sessions_opened -= 1
+            self._condition.notify()
+
+    def _keep_alive(self) -> None:
+        """
+        Sends a NOOP to each session that has been idle for `keep_alive_interval` seconds,
+        and reconnects it if the server has closed it.
+        """
+
+        # Only one session at a time is taken out of the pool, the rest can still be used meanwhile
+        with self._lock:
+            sessions_to_check = len(self._idle_sessions)
+        for _ in range(sessions_to_check):
+            with self._lock:
+                if len(self._idle_sessions) == 0 or \
+                        time.monotonic() - self._idle_sessions[0].last_used < self._keep_alive_interval:
+                    # The rest of them were used more recently
+                    return
+                session = self._idle_sessions.popleft()
+            try:
+                # Sends a NOOP
+                is_connected = session.handler.is_connected()
+            except Exception:
+                is_connected = False
+            if is_connected:
+                with self._lock:
+                    self._stats['keep_alives'] += 1
+                    self._is_connected = True
+                self._release(session)
+                continue
+            logger.info("The SMTP server closed an idle session, reconnecting..")
+            # Otherwise the socket of the closed session would be left open
+            session.close()
+            try:
+                session.handler.connect()
+            except Exception as e:
+                logger.error("Failed to reconnect the SMTP session: %s" % e)
+                self._discard(session)
+                with self._lock:
+                    self._stats['failed_keep_alives'] += 1
+                    self._is_connected = False
+            else:
+                with self._lock:
+                    self._stats['reconnects'] += 1
+                    self._is_connected = True
+                self._release(session)
+
+    def _run_keep_alive(self) -> None:
+        while not self._stop_event.wait(timeout=self._keep_alive_interval):
+            try:
+                self._keep_alive()
+            except Exception as e:
+                logger.error("Failed to keep the SMTP sessions alive: %s" % e)
+
+
+class SmtpSessionPoolError(Exception):
+    def __init__(self, message):
+        # Call the base class constructor with the parameters it needs
+        super().__init__(message)
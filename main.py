@@ -2,17 +2,30 @@ import traceback
 import logging
 import logging.handlers
 import argparse
-import time
+import csv
+import json
+import sys
+import random
 import datetime
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Tuple, Union
 import os
 import arrow
 
 from configuration.configuration import Configuration
+from datastore.abstract_job_bot_datastore import AbstractJobBotDatastore
 from datastore.job_bot_mysql_datastore import JobBotMySqlDatastore
+from datastore.job_bot_sqlite_datastore import JobBotSqliteDatastore
+from datastore.job_bot_datastore_cache import JobBotDatastoreCache
 from cloudstore.job_bot_dropbox_cloudstore import JobBotDropboxCloudstore
 from email_app.gmail_email_app import GmailEmailApp
+from email_app.email_queue import EmailQueue
+from email_app.notification_digest import NotificationDigest
 from ad_site_crawler.xegr_ad_site_crawler import XeGrAdSiteCrawler
+from ad_site_crawler.http_cache import HttpCache
+from ad_site_crawler.rejected_ads import RejectedAds
+from ad_site_crawler.result_list_fingerprint import ResultListFingerprintStore
+from ad_site_crawler.crawl_scheduler import CrawlJob, CrawlScheduler
+from ad_site_crawler.polling_interval import PollingInterval
 
 logger = logging.getLogger('Main')
 
@@ -50,7 +63,7 @@ def _argparser() -> argparse.Namespace:
     }
     required_arguments.add_argument('-m', '--run-mode',
                                     choices=['crawl_and_send', 'list_emails', 'remove_email', 'upload_files',
-                                             'create_table'],
+                                             'create_table', 'migrate'],
                                     required=True,
                                     default='crawl_and_send')
     required_arguments.add_argument('-c', '--config-file', **config_file_params)
@@ -58,6 +71,11 @@ def _argparser() -> argparse.Namespace:
     # Optional args
     optional = parser.add_argument_group('Optional Arguments')
     optional.add_argument('--email-id', help='The id of the email you want to be deleted')
+    optional.add_argument('--output-format', choices=['table', 'csv', 'jsonl'], default='table',
+                          help='The output format of the emails listed')
+    optional.add_argument('--sent-from', help='List the emails sent on or after this date (UTC), e.g. 2020-06-01')
+    optional.add_argument('--sent-to', help='List the emails sent before this date (UTC), e.g. 2020-07-01')
+    optional.add_argument('--email-domain', help='List the emails sent to this domain, e.g. gmail.com')
     optional.add_argument('-d', '--debug', action='store_true', help='Enables the debug log messages')
     optional.add_argument("-h", "--help", action="help", help="Show this help message and exit")
     # Parse args
@@ -77,18 +95,51 @@ def init_main() -> Tuple[argparse.Namespace, Configuration]:
     return args, configuration
 
 
-def show_ads_checked(ads: List[Tuple]) -> None:
+def show_ads_checked(ads: Iterable[Tuple], output_format: str = 'table') -> None:
     """
-    Pretty prints the list of emails sent.
+    Prints the emails sent as they are read, so that any number of them can be listed.
 
-    :params ads:
+    :params ads: The id, link, email and sent_on of each email sent
+    :params output_format: table, csv or jsonl
     """
 
-    print("{}".format("_" * 146))
-    print("|{:-^6}|{:-^80}|{:-^40}|{:-^15}|".format('ID', 'Link', 'Email', 'Sent On'))
-    for ad in ads:
-        print("|{:^6}|{:^80}|{:^40}|{:^15}|".format(ad[0], ad[1], str(ad[2]), arrow.get(ad[3]).humanize()))
-    print("|{}|".format("_" * 144))
+    if output_format == 'csv':
+        csv_writer = csv.writer(sys.stdout)
+        csv_writer.writerow(['id', 'link', 'email', 'sent_on'])
+        for ad in ads:
+            csv_writer.writerow([ad[0], ad[1], ad[2], str(ad[3])])
+    elif output_format == 'jsonl':
+        for ad in ads:
+            print(json.dumps({'id': ad[0], 'link': ad[1], 'email': ad[2], 'sent_on': str(ad[3])}))
+    else:
+        now = arrow.utcnow()
+        print("{}".format("_" * 146))
+        print("|{:-^6}|{:-^80}|{:-^40}|{:-^15}|".format('ID', 'Link', 'Email', 'Sent On'))
+        for ad in ads:
+            print("|{:^6}|{:^80}|{:^40}|{:^15}|".format(ad[0], ad[1], str(ad[2]),
+                                                      arrow.get(ad[3]).humanize(other=now)))
+        print("|{}|".format("_" * 144))
+
+
+def get_data_store(configuration: Configuration) -> AbstractJobBotDatastore:
+    """
+    Creates the datastore of the type set in the datastore section of the configuration.
+
+    :params configuration:
+    """
+
+    datastore_type = configuration.get_datastore_types()[0]
+    datastore_config = dict(configuration.get_datastores()[0])
+    # Kept with the rest of the state, rather than wherever the bot is started from
+    datastore_config.setdefault('write_journal_path', os.path.join(configuration.cache_folder,
+                                                                   'sent_applications_journal.jsonl'))
+    if datastore_type == 'mysql':
+        return JobBotMySqlDatastore(config=datastore_config)
+    elif datastore_type == 'sqlite':
+        return JobBotSqliteDatastore(config=datastore_config)
+    else:
+        logger.error('Unsupported datastore type: %s' % datastore_type)
+        raise argparse.ArgumentTypeError('Unsupported datastore type: %s' % datastore_type)
 
 
 def upload_files_to_cloudstore(cloud_store: JobBotDropboxCloudstore):
@@ -96,26 +147,95 @@ def upload_files_to_cloudstore(cloud_store: JobBotDropboxCloudstore):
     cloud_store.update_application_to_send_email_data()
     cloud_store.update_inform_should_call_email_data()
     cloud_store.update_inform_success_email_data()
+    cloud_store.update_digest_email_data()
     cloud_store.upload_attachments()
 
 
-def crawl_and_send_loop(lookup_url: str, check_interval: int, crawl_interval: int, anchor_class_name: str,
-                        data_store: JobBotMySqlDatastore,
+def mark_application_failed(data_store: JobBotDatastoreCache, http_cache: HttpCache, idempotency_key: str,
+                            error: str) -> None:
+    """
+    Marks the application as failed once its email is given up on, so that the ad is applied to again
+    if it shows up. The rest of the emails given up on are only logged by the queue.
+
+    :params data_store:
+    :params http_cache: Cleared, so that an unchanged search page is checked again for the ad
+    :params idempotency_key:
+    :params error:
+    """
+
+    kind, _, link = idempotency_key.partition(':')
+    if kind == 'application_to_send':
+        logger.error("The application to %s failed, it will be sent again if the ad shows up" % link)
+        data_store.mark_application_failed(link=link, reason=error)
+        http_cache.clear()
+
+
+def crawl_and_send_loop(lookups: List[Dict], adaptive_check_interval: bool, min_check_interval: int,
+                        max_check_interval: int, crawl_interval: int, anchor_class_name: str,
+                        crawl_concurrency: int, crawl_burst: int, http_connect_timeout: int, http_read_timeout: int,
+                        cache_folder: str, http_cache_max_size_kb: int, known_links_to_stop: int,
+                        rejected_ads_ttl: Union[int, None], send_delay: int, send_delay_jitter: int,
+                        notification_mode: str, digest_window: int, urgent_notifications: List[str],
+                        max_pages: int, page_param: str,
+                        queue_path: str, queue_workers: int, max_send_attempts: int, retry_backoff: int,
+                        data_store: JobBotDatastoreCache,
                         cloud_store: JobBotDropboxCloudstore,
                         email_app: GmailEmailApp) -> None:
     """
     The main loop.
     Crawls the ad site for new ads and sends emails where applicable and informs the applicant.
 
-    :params lookup_url:
-    :params check_interval:
-    :params data_store:
+    :params lookups: The search pages to check, each with its lookup_url, check_interval and anchor_class_name
+    :params adaptive_check_interval: Whether to check more often in the hours most ads are posted
+    :params min_check_interval:
+    :params max_check_interval:
+    :params crawl_interval:
+    :params anchor_class_name:
+    :params crawl_concurrency:
+    :params crawl_burst:
+    :params http_connect_timeout:
+    :params http_read_timeout:
+    :params cache_folder:
+    :params http_cache_max_size_kb:
+    :params known_links_to_stop:
+    :params rejected_ads_ttl: The seconds before an ad rejected for its stop words is checked again, never if None
+    :params send_delay: The seconds to wait before sending an application
+    :params send_delay_jitter: Up to this many seconds are added to the send_delay of each application
+    :params notification_mode: immediate, to inform the applicant with an email per ad,
+                               or digest, with a summary email every digest_window seconds
+    :params digest_window:
+    :params urgent_notifications: The kinds of notifications that are sent immediately even in digest mode
+    :params max_pages:
+    :params page_param:
+    :params queue_path: The file of the queue of the emails to send in the background,
+                        so that the crawling never waits for them
+    :params queue_workers:
+    :params max_send_attempts:
+    :params retry_backoff:
+    :params data_store: The cached datastore, so that the dedupe checks never touch the network
     :params cloud_store:
     :params gmail_app:
     """
 
+    # The ads rejected for their stop words are saved, so that they aren't requested again after a restart
+    rejected_ads = RejectedAds(ttl=rejected_ads_ttl,
+                               on_rejected=lambda rejection: data_store.save_rejected_ads([rejection]))
+    rejected_ads.load((link, arrow.get(expires_on).naive if expires_on is not None else None)
+                      for link, expires_on in data_store.get_rejected_ads())
+    http_cache = HttpCache(cache_folder=os.path.join(cache_folder, 'http'), max_size=http_cache_max_size_kb * 1024)
     ad_site_crawler = XeGrAdSiteCrawler(stop_words=cloud_store.get_stop_words_data(),
-                                        anchor_class_name=anchor_class_name)
+                                        anchor_class_name=anchor_class_name,
+                                        crawl_concurrency=crawl_concurrency,
+                                        crawl_burst=crawl_burst,
+                                        http_connect_timeout=http_connect_timeout,
+                                        http_read_timeout=http_read_timeout,
+                                        http_cache=http_cache,
+                                        fingerprint_store=ResultListFingerprintStore(
+                                            fingerprints_folder=os.path.join(cache_folder, 'fingerprints')),
+                                        known_links_to_stop=known_links_to_stop,
+                                        max_pages=max_pages,
+                                        page_param=page_param,
+                                        rejected_ads=rejected_ads)
     attachments_local_paths = [os.path.join(cloud_store.local_files_folder, attachment_name)
                                for attachment_name in cloud_store.attachments_names]
     # Get the email_data, the attachments and the stop_words list from the cloudstore
@@ -124,44 +244,110 @@ def crawl_and_send_loop(lookup_url: str, check_interval: int, crawl_interval: in
     inform_should_call_subject, inform_should_call_html = cloud_store.get_inform_should_call_email_data()
     inform_success_subject, inform_success_html = cloud_store.get_inform_success_email_data()
 
-    links_checked = [row[0] for row in data_store.get_applications_sent(columns='link')]
-    logger.info("Waiting for new ads..")
-    while True:
-        new_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked=links_checked,
-                                                   crawl_interval=crawl_interval))
+    def on_email_sent(idempotency_key: str, message: Dict) -> None:
+        kind, _, link = idempotency_key.partition(':')
+        if kind == 'application_to_send':
+            # Inform applicant that an application has been sent successfully
+            inform_applicant(kind='inform_success', link=link, subject=inform_success_subject,
+                             html=inform_success_html.format(email=message['to'][0], link=link))
+
+    # Its workers start once the notifications can be sent
+    email_queue = EmailQueue(send_email=email_app.send_email, queue_path=queue_path, workers=queue_workers,
+                             max_attempts=max_send_attempts, retry_backoff=retry_backoff, on_sent=on_email_sent,
+                             on_failed=lambda idempotency_key, message, error: mark_application_failed(
+                                 data_store=data_store, http_cache=http_cache, idempotency_key=idempotency_key,
+                                 error=error))
+    if notification_mode == 'digest':
+        digest_subject, digest_html = cloud_store.get_digest_email_data()
+        notification_digest = NotificationDigest(
+            send_digest=lambda idempotency_key, subject, html: email_queue.enqueue(
+                idempotency_key=idempotency_key, subject=subject, html=html, to=[email_app.get_self_email()]),
+            journal_path=os.path.join(cache_folder, 'notification_digest.jsonl'),
+            window=digest_window,
+            subject_template=digest_subject,
+            html_template=digest_html)
+    else:
+        notification_digest = None
+
+    def inform_applicant(kind: str, link: str, subject: str, html: str) -> None:
+        if notification_digest is not None and kind not in urgent_notifications:
+            notification_digest.add(kind=kind, link=link, html=html)
+        else:
+            email_queue.enqueue(idempotency_key='{}:{}'.format(kind, link), subject=subject, html=html,
+                                to=[email_app.get_self_email()])
+
+    email_queue.start()
 
-        if len(new_ads) > 0:
-            links_checked = [row[0] for row in data_store.get_applications_sent(columns='link')]
-            emails_checked = [row[0] for row in data_store.get_applications_sent(columns='email')]
+    # Shared by all the searches, so that an ad found by more than one of them is checked only once.
+    # It follows the datastore, so an application removed by another process is sent again if the ad shows up
+    links_checked = data_store.checked_links
+    # Learn when the ads are posted from the applications sent so far
+    ads_arrival_times = [arrow.get(row[0]).datetime for row in data_store.get_applications_sent(columns='sent_on')]
+    crawl_jobs = []
+    for lookup in lookups:
+        polling_interval = PollingInterval(base_interval=lookup['check_interval'], min_interval=min_check_interval,
+                                           max_interval=max(max_check_interval, lookup['check_interval']),
+                                           adaptive=adaptive_check_interval)
+        polling_interval.learn(arrival_times=ads_arrival_times)
+        crawl_jobs.append(CrawlJob(lookup_url=lookup['lookup_url'], check_interval=lookup['check_interval'],
+                                   anchor_class_name=lookup['anchor_class_name'], polling_interval=polling_interval))
+    crawl_scheduler = CrawlScheduler(ad_site_crawler=ad_site_crawler,
+                                     crawl_jobs=crawl_jobs,
+                                     ads_checked=links_checked,
+                                     crawl_interval=crawl_interval)
+    logger.info("Waiting for new ads..")
+    crawl_scheduler.start()
+    try:
+        # The searches keep running on their own schedule while the emails are sent
+        for crawl_job, new_ads in crawl_scheduler.get_results():
+            logger.debug("%s found %s new ads." % (crawl_job, len(new_ads)))
+            links_sent = data_store.has_link(links=[link for link, _ in new_ads])
+            emails_sent = data_store.has_email(emails=[email for _, email in new_ads])
             for link, email in new_ads:
-                if link not in links_checked and (email not in emails_checked or email is None):
+                if link not in links_sent and (email not in emails_sent or email is None):
                     if email is None:
                         # Email applicant to inform him that he should call manually
                         logger.info("Link ({}) has no email. Inform the applicant.".format(link))
-                        email_app.send_email(subject=inform_should_call_subject,
-                                             html=inform_should_call_html.format(link=link),
-                                             to=[email_app.get_self_email()])
+                        inform_applicant(kind='inform_should_call', link=link, subject=inform_should_call_subject,
+                                         html=inform_should_call_html.format(link=link))
                     else:
-                        # Send application after 1 minute (don't be too cocky)
-                        time.sleep(60)
-                        logger.info("Sending email to: {}. Ad Link: {}".format(email, link))
-                        email_app.send_email(subject=application_to_send_subject,
-                                             html=application_to_send_html.format(link),
-                                             to=[email],
-                                             attachments=attachments_local_paths)
-
-                        # Inform applicant that an application has been sent successfully
-                        email_app.send_email(subject=inform_success_subject,
-                                             html=inform_success_html.format(email=email, link=link),
-                                             to=[email_app.get_self_email()])
-
-                    email_info = {"link": link, "email": email, "sent_on": datetime.datetime.utcnow().isoformat()}
+                        # Send application after a while (don't be too cocky), without holding back the crawling
+                        delay = send_delay + random.uniform(0, send_delay_jitter)
+                        logger.info("Sending email to: {} in {:.0f} seconds. Ad Link: {}".format(email, delay, link))
+                        application_key = 'application_to_send:{}'.format(link)
+                        is_enqueued = email_queue.enqueue(idempotency_key=application_key,
+                                                          subject=application_to_send_subject,
+                                                          html=application_to_send_html.format(link),
+                                                          to=[email],
+                                                          attachments=attachments_local_paths,
+                                                          delay=delay)
+                        # An application that is already on its way, or was sent, is recorded as sent too
+                        if not is_enqueued and \
+                                email_queue.get_status(application_key) not in ('queued', 'sending', 'sent'):
+                            logger.error("Failed to enqueue the application to: {}".format(link))
+                            continue
+
+                    email_info = {"link": link, "email": email, "sent_on": datetime.datetime.utcnow().isoformat(),
+                                  "status": 'sent' if email is not None else 'informed'}
                     data_store.save_sent_application(email_info)
+                    links_sent.add(link)
+                    emails_sent.add(email)
                     logger.info("Waiting for new ads..")
 
-        # Look for new ads every 2 minutes
-        logger.debug("Sleeping for {check_interval} seconds..".format(check_interval=check_interval))
-        time.sleep(check_interval)
+            logger.debug("HTTP stats so far: %s" % ad_site_crawler.get_http_stats())
+            logger.debug("Email queue stats so far: %s" % email_queue.get_metrics())
+            logger.debug("SMTP stats so far: %s" % email_app.get_smtp_stats())
+    finally:
+        crawl_scheduler.stop()
+        # No more applications are confirmed after this
+        email_queue.stop()
+        if notification_digest is not None:
+            # Enqueue the last digest
+            notification_digest.close()
+        # The emails not sent yet stay in the queue for the next run
+        email_queue.close()
+        # Save the applications still buffered
+        data_store.close()
 
 
 def main():
@@ -177,25 +363,70 @@ def main():
 
     # Start in the specified mode
     if args.run_mode == 'list_emails':
-        data_store = JobBotMySqlDatastore(config=configuration.get_datastores()[0])
-        show_ads_checked(ads=data_store.get_applications_sent())
+        data_store = get_data_store(configuration=configuration)
+        # The columns listed may not exist before the migrations
+        data_store.check_schema_version()
+        show_ads_checked(ads=data_store.iterate_applications_sent(
+            sent_from=arrow.get(args.sent_from).naive.isoformat() if args.sent_from is not None else None,
+            sent_to=arrow.get(args.sent_to).naive.isoformat() if args.sent_to is not None else None,
+            email_domain=args.email_domain),
+            output_format=args.output_format)
     elif args.run_mode == 'remove_email':
-        data_store = JobBotMySqlDatastore(config=configuration.get_datastores()[0])
+        data_store = get_data_store(configuration=configuration)
+        data_store.check_schema_version()
         data_store.remove_ad(email_id=args.email_id)
+        # The removed ad is applied to again if it shows up, even on a search page that is not modified
+        HttpCache(cache_folder=os.path.join(configuration.cache_folder, 'http'),
+                  max_size=configuration.http_cache_max_size_kb * 1024).clear()
     elif args.run_mode == 'upload_files':
         upload_files_to_cloudstore(cloud_store=JobBotDropboxCloudstore(config=configuration.get_cloudstores()[0]))
     elif args.run_mode == 'create_table':
-        data_store = JobBotMySqlDatastore(config=configuration.get_datastores()[0])
+        data_store = get_data_store(configuration=configuration)
         data_store.create_applications_sent_table()
+    elif args.run_mode == 'migrate':
+        data_store = get_data_store(configuration=configuration)
+        versions_applied = data_store.migrate()
+        logger.info("Applied %s migrations, the schema is at version %s."
+                    % (len(versions_applied), data_store.get_schema_version()))
     elif args.run_mode == 'crawl_and_send':
-        crawl_and_send_loop(lookup_url=configuration.lookup_url,
-                            check_interval=configuration.check_interval,
+        data_store = get_data_store(configuration=configuration)
+        # Fail now rather than after the first application is sent
+        data_store.check_schema_version()
+        email_app_config = configuration.get_email_apps()[0]
+        email_app = GmailEmailApp(config=email_app_config, test_mode=configuration.test_mode)
+        data_store = JobBotDatastoreCache(
+            data_store=data_store,
+            reconcile_interval=configuration.get_datastores()[0].get('cache_reconcile_interval', 300),
+            max_unsaved_links=configuration.get_datastores()[0].get('cache_max_unsaved_links', 10000))
+        crawl_and_send_loop(lookups=configuration.get_lookups(),
+                            adaptive_check_interval=configuration.adaptive_check_interval,
+                            min_check_interval=configuration.min_check_interval,
+                            max_check_interval=configuration.max_check_interval,
                             crawl_interval=configuration.crawl_interval,
                             anchor_class_name=configuration.anchor_class_name,
-                            data_store=JobBotMySqlDatastore(config=configuration.get_datastores()[0]),
+                            crawl_concurrency=configuration.crawl_concurrency,
+                            crawl_burst=configuration.crawl_burst,
+                            http_connect_timeout=configuration.http_connect_timeout,
+                            http_read_timeout=configuration.http_read_timeout,
+                            cache_folder=configuration.cache_folder,
+                            http_cache_max_size_kb=configuration.http_cache_max_size_kb,
+                            known_links_to_stop=configuration.known_links_to_stop,
+                            rejected_ads_ttl=configuration.rejected_ads_ttl,
+                            send_delay=configuration.send_delay,
+                            send_delay_jitter=configuration.send_delay_jitter,
+                            notification_mode=configuration.notification_mode,
+                            digest_window=configuration.digest_window,
+                            urgent_notifications=configuration.urgent_notifications,
+                            max_pages=configuration.max_pages,
+                            page_param=configuration.page_param,
+                            queue_path=email_app_config.get('queue_path', os.path.join(
+                                configuration.cache_folder, 'outbound_emails.sqlite3')),
+                            queue_workers=email_app_config.get('queue_workers', 1),
+                            max_send_attempts=email_app_config.get('max_send_attempts', 5),
+                            retry_backoff=email_app_config.get('retry_backoff', 30),
+                            data_store=data_store,
                             cloud_store=JobBotDropboxCloudstore(config=configuration.get_cloudstores()[0]),
-                            email_app=GmailEmailApp(config=configuration.get_email_apps()[0],
-                                                    test_mode=configuration.test_mode))
+                            email_app=email_app)
     else:
         logger.error('Incorrect run_mode specified!')
         raise argparse.ArgumentTypeError('Incorrect run_mode specified!')
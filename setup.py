@@ -26,7 +26,7 @@ else:
 setup(
     name='auto_apply_bot',
     version='0.1',
-    packages=['datastore', 'cloudstore', 'configuration', 'email_app', 'ad_site_crawler'],
+    packages=['buffering', 'datastore', 'cloudstore', 'configuration', 'email_app', 'ad_site_crawler'],
     py_modules=['main'],
     data_files=[('', ['configuration/yml_schema.json'])],
     entry_points={
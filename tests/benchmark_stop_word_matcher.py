@@ -0,0 +1,43 @@
+"""
+Compares the StopWordMatcher against the old per-word stop-word loop on the ad pages in test_data.
+
+:Example:
+cd tests && PYTHONPATH=.. python benchmark_stop_word_matcher.py
+"""
+import os
+import timeit
+from typing import List
+from unidecode import unidecode
+
+from ad_site_crawler.stop_word_matcher import StopWordMatcher
+
+test_data_path: str = os.path.join('test_data', 'test_xegr_ad_site_crawler')
+# 50 stop words that are not in the pages, so both approaches have to scan everything
+stop_words: List[str] = ['Senior{}'.format(i) for i in range(45)] + \
+                        ['WEBDESIGNER', 'Προϊστάμενος', 'Διευθυντής', 'Lead Developer', 'Architect']
+repeat: int = 5
+number: int = 3
+
+
+def legacy_loop(html: str) -> bool:
+    return any(unidecode(word).lower() in unidecode(html).lower() for word in stop_words)
+
+
+def main():
+    stop_word_matcher = StopWordMatcher(stop_words=stop_words)
+    print("|{:-^30}|{:-^12}|{:-^14}|{:-^14}|{:-^10}|".format('Page', 'Size (KB)', 'Loop (ms)', 'Matcher (ms)',
+                                                            'Speedup'))
+    for file_name in sorted(os.listdir(test_data_path)):
+        with open(os.path.join(test_data_path, file_name), 'r') as html_f:
+            html = html_f.read()
+        assert legacy_loop(html) == stop_word_matcher.matches(html)
+        loop_time = min(timeit.repeat(lambda: legacy_loop(html), repeat=repeat, number=number)) / number
+        matcher_time = min(timeit.repeat(lambda: stop_word_matcher.matches(html),
+                                         repeat=repeat, number=number)) / number
+        print("|{:^30}|{:^12.1f}|{:^14.2f}|{:^14.2f}|{:^10.1f}|".format(file_name, len(html) / 1024,
+                                                                      loop_time * 1000, matcher_time * 1000,
+                                                                      loop_time / matcher_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import asyncio
+import datetime
+import logging
+import tempfile
+from typing import Dict
+
+from datastore.async_datastore import AsyncDatastore
+from datastore.job_bot_sqlite_datastore import JobBotSqliteDatastore
+
+logger = logging.getLogger('TestAsyncDatastore')
+
+
+class TestAsyncDatastore(unittest.TestCase):
+    __slots__ = ('datastore_conf', 'temp_folder', 'loop')
+
+    datastore_conf: Dict
+    temp_folder: tempfile.TemporaryDirectory
+    loop: asyncio.AbstractEventLoop
+
+    def test_save_get_remove(self):
+        async def save_get_remove():
+            async with AsyncDatastore(data_store=JobBotSqliteDatastore(config=self.datastore_conf)) as data_store:
+                self.assertEqual('applications_sent', data_store.application_table_name)
+                datetime_now = datetime.datetime.utcnow().isoformat()
+                logger.info('Saving 20 applications concurrently..')
+                await asyncio.gather(*(data_store.save_sent_application(
+                    {'link': 'www.test{}.com'.format(row_id), 'email': 'test{}@test.com'.format(row_id),
+                     'sent_on': datetime_now}) for row_id in range(20)))
+                self.assertEqual(20, len(await data_store.get_applications_sent()))
+                links_sent, emails_sent = await asyncio.gather(
+                    data_store.has_link(links=['www.test1.com', 'www.test30.com']),
+                    data_store.has_email(emails=['test2@test.com', None]))
+                self.assertSetEqual({'www.test1.com'}, links_sent)
+                self.assertSetEqual({'test2@test.com'}, emails_sent)
+                await data_store.remove_ad(email_id=1)
+                self.assertEqual(19, len(await data_store.get_applications_sent()))
+
+        self.loop.run_until_complete(save_get_remove())
+
+    def test_iterate_applications_sent(self):
+        async def iterate_applications_sent():
+            data_store = AsyncDatastore(data_store=JobBotSqliteDatastore(config=self.datastore_conf), max_workers=2)
+            rows = [{'link': 'www.test{}.com'.format(row_id), 'email': None,
+                     'sent_on': datetime.datetime(2020, 6, 1, 12).isoformat()} for row_id in range(250)]
+            await data_store.save_sent_applications(rows)
+            logger.info('Iterating over the applications sent..')
+            links = [link async for link, in data_store.iterate_applications_sent(columns='link', batch_size=64)]
+            self.assertListEqual([row['link'] for row in rows], links)
+            await data_store.close()
+
+        self.loop.run_until_complete(iterate_applications_sent())
+
+    @staticmethod
+    def _setup_log(debug: bool = False) -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        self.temp_folder = tempfile.TemporaryDirectory()
+        self.datastore_conf = {'db_path': os.path.join(self.temp_folder.name, 'test.sqlite3')}
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self) -> None:
+        self.loop.close()
+        self.temp_folder.cleanup()
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
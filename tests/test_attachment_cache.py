@@ -0,0 +1,70 @@
+import unittest
+import os
+import base64
+import logging
+import tempfile
+
+from gmail import Message
+
+from email_app.attachment_cache import AttachmentCache
+
+logger = logging.getLogger('TestAttachmentCache')
+
+
+class TestAttachmentCache(unittest.TestCase):
+    test_data_path: str = os.path.join('test_data', 'test_gmail_email_app')
+
+    def test_same_as_gmail_message(self):
+        attachment_path = os.path.join(self.test_data_path, 'sample_data.txt')
+        attachment_cache = AttachmentCache()
+        cached_message = Message(subject='Test', to='test@test.com', text='Test',
+                                 attachments=[attachment_cache.get(attachment_path)])
+        message = Message(subject='Test', to='test@test.com', text='Test', attachments=[attachment_path])
+        self.assertEqual(message.root.get_payload()[1].as_string(), cached_message.root.get_payload()[1].as_string())
+
+    def test_reuse_and_invalidate(self):
+        with tempfile.TemporaryDirectory() as attachments_folder:
+            attachment_path = os.path.join(attachments_folder, 'cv.pdf')
+            with open(attachment_path, 'wb') as attachment_file:
+                attachment_file.write(b'%PDF-1.4 version 1')
+            attachment_cache = AttachmentCache()
+            attachment = attachment_cache.get(attachment_path)
+            self.assertEqual('application/pdf', attachment.get_content_type())
+            self.assertEqual(b'%PDF-1.4 version 1', base64.b64decode(attachment.get_payload()))
+            logger.info("Getting the unchanged attachment again..")
+            self.assertIs(attachment, attachment_cache.get(attachment_path))
+            self.assertEqual(1, len(attachment_cache))
+            logger.info("Replacing the attachment..")
+            with open(attachment_path, 'wb') as attachment_file:
+                attachment_file.write(b'%PDF-1.4 version 2 is longer')
+            new_attachment = attachment_cache.get(attachment_path)
+            self.assertIsNot(attachment, new_attachment)
+            self.assertEqual(b'%PDF-1.4 version 2 is longer', base64.b64decode(new_attachment.get_payload()))
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        pass
+
+    def tearDown(self) -> None:
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
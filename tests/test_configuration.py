@@ -81,6 +81,27 @@ class TestConfiguration(unittest.TestCase):
                                          'type': 'dropbox'}]}
         self.assertDictEqual(self._sort_dict(expected_json), self._sort_dict(modified_configuration.to_json()))
 
+    def test_get_lookups(self):
+        logger.info('Loading the Configuration with a single lookup_url..')
+        configuration = Configuration(config_src=os.path.join(self.test_data_path, 'template_conf.yml'))
+        self.assertListEqual([{'lookup_url': 'www.xe.gr', 'check_interval': 120, 'anchor_class_name': 'highlight'}],
+                             configuration.get_lookups())
+        logger.info('Loading the Configuration with many lookups..')
+        configuration = Configuration(config_src=os.path.join(self.test_data_path, 'lookups_conf.yml'))
+        expected_lookups = [{'lookup_url': 'www.xe.gr/search?q=1', 'check_interval': 60,
+                             'anchor_class_name': 'highlight'},
+                            {'lookup_url': 'www.xe.gr/search?q=2', 'check_interval': 300,
+                             'anchor_class_name': 'result-list-narrow-item'}]
+        self.assertListEqual(expected_lookups, configuration.get_lookups())
+        self.assertIsNone(configuration.lookup_url)
+
+    def test_get_datastore_types(self):
+        configuration = Configuration(config_src=os.path.join(self.test_data_path, 'template_conf.yml'))
+        self.assertListEqual(['mysql'], configuration.get_datastore_types())
+        configuration = Configuration(config_src=os.path.join(self.test_data_path, 'lookups_conf.yml'))
+        self.assertListEqual(['sqlite'], configuration.get_datastore_types())
+        self.assertDictEqual({'db_path': 'data/job_bot.sqlite3'}, configuration.get_datastores()[0])
+
     @classmethod
     def _sort_dict(cls, dictionary: Dict) -> Dict:
         return {k: cls._sort_dict(v) if isinstance(v, dict) else v
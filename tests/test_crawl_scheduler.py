@@ -0,0 +1,117 @@
+import unittest
+import time
+import logging
+import threading
+from typing import List, Set
+
+from ad_site_crawler.abstract_ad_site_crawler import AbstractAdSiteCrawler
+from ad_site_crawler.crawl_scheduler import CrawlJob, CrawlScheduler
+
+logger = logging.getLogger('TestCrawlScheduler')
+
+
+class FakeAdSiteCrawler(AbstractAdSiteCrawler):
+    """
+    Returns a new ad per call for every lookup url, except for the ones that fail.
+    """
+
+    def __init__(self, failing_lookup_urls: List[str] = None) -> None:
+        self.failing_lookup_urls = failing_lookup_urls if failing_lookup_urls is not None else []
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_new_ads(self, lookup_url: str, ads_checked: Set[str], crawl_interval: int = 15,
+                    anchor_class_name: str = None):
+        with self.lock:
+            self.calls.append((lookup_url, anchor_class_name, time.monotonic()))
+            call_number = len(self.calls)
+        if lookup_url in self.failing_lookup_urls:
+            raise Exception("Search page is down")
+        new_link = '{}/ad-{}'.format(lookup_url, call_number)
+        ads_checked.add(new_link)
+        yield new_link, None
+
+
+class TestCrawlScheduler(unittest.TestCase):
+
+    def test_jobs_run_on_their_own_interval(self):
+        ad_site_crawler = FakeAdSiteCrawler()
+        ads_checked = set()
+        crawl_jobs = [CrawlJob(lookup_url='https://www.xe.gr/fast', check_interval=0.1, anchor_class_name='fast'),
+                      CrawlJob(lookup_url='https://www.xe.gr/slow', check_interval=10)]
+        crawl_scheduler = CrawlScheduler(ad_site_crawler=ad_site_crawler, crawl_jobs=crawl_jobs,
+                                         ads_checked=ads_checked, crawl_interval=0)
+        logger.info("Starting the scheduler..")
+        crawl_scheduler.start()
+        results = []
+        try:
+            for crawl_job, new_ads in crawl_scheduler.get_results(timeout=2):
+                results.append((crawl_job.lookup_url, new_ads))
+                if len(results) == 5:
+                    break
+        finally:
+            crawl_scheduler.stop()
+        lookup_urls_run = [lookup_url for lookup_url, _, _ in ad_site_crawler.calls]
+        self.assertEqual(1, lookup_urls_run.count('https://www.xe.gr/slow'))
+        self.assertGreaterEqual(lookup_urls_run.count('https://www.xe.gr/fast'), 4)
+        self.assertTrue(all(anchor_class_name == 'fast' for lookup_url, anchor_class_name, _ in ad_site_crawler.calls
+                            if lookup_url == 'https://www.xe.gr/fast'))
+        # The dedupe set is shared by all the jobs
+        self.assertTrue({new_ads[0][0] for _, new_ads in results}.issubset(ads_checked))
+        # The fast job waited for its interval between its runs
+        fast_runs = [run_time for lookup_url, _, run_time in ad_site_crawler.calls
+                     if lookup_url == 'https://www.xe.gr/fast']
+        for previous_run, next_run in zip(fast_runs, fast_runs[1:]):
+            self.assertGreaterEqual(next_run - previous_run, 0.09)
+
+    def test_failing_job_is_rescheduled(self):
+        ad_site_crawler = FakeAdSiteCrawler(failing_lookup_urls=['https://www.xe.gr/down'])
+        crawl_jobs = [CrawlJob(lookup_url='https://www.xe.gr/down', check_interval=0.05),
+                      CrawlJob(lookup_url='https://www.xe.gr/up', check_interval=0.05)]
+        crawl_scheduler = CrawlScheduler(ad_site_crawler=ad_site_crawler, crawl_jobs=crawl_jobs,
+                                         ads_checked=set(), crawl_interval=0)
+        logger.info("Starting the scheduler with a failing job..")
+        crawl_scheduler.start()
+        results = []
+        try:
+            for crawl_job, _ in crawl_scheduler.get_results(timeout=2):
+                results.append(crawl_job.lookup_url)
+                if len(results) == 6:
+                    break
+        finally:
+            crawl_scheduler.stop()
+        self.assertListEqual(['https://www.xe.gr/up'] * 6, results)
+        lookup_urls_run = [lookup_url for lookup_url, _, _ in ad_site_crawler.calls]
+        # The failing job backs off, so it runs less often than the other one
+        self.assertGreaterEqual(lookup_urls_run.count('https://www.xe.gr/down'), 2)
+        self.assertLess(lookup_urls_run.count('https://www.xe.gr/down'), 6)
+        self.assertGreater(crawl_jobs[0].polling_interval.consecutive_errors, 1)
+        self.assertEqual(0, crawl_jobs[1].polling_interval.consecutive_errors)
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        pass
+
+    def tearDown(self) -> None:
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
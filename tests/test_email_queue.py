@@ -0,0 +1,182 @@
+import unittest
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from typing import Dict, List
+
+from email_app.email_queue import EmailQueue
+
+logger = logging.getLogger('TestEmailQueue')
+
+
+class TestEmailQueue(unittest.TestCase):
+    __slots__ = ('temp_folder', 'queue_path', 'sent_emails')
+
+    temp_folder: tempfile.TemporaryDirectory
+    queue_path: str
+    sent_emails: List[Dict]
+
+    def send_email(self, **message) -> None:
+        self.sent_emails.append(message)
+
+    def test_enqueue_and_send(self):
+        sent_keys = []
+        email_queue = EmailQueue(send_email=self.send_email, queue_path=self.queue_path, workers=2,
+                                 on_sent=lambda idempotency_key, message: sent_keys.append(idempotency_key))
+        logger.info("Enqueueing 10 emails and one of them twice..")
+        for email_id in range(10):
+            self.assertTrue(email_queue.enqueue(idempotency_key='application:{}'.format(email_id),
+                                                subject='Application {}'.format(email_id),
+                                                to=['test{}@test.com'.format(email_id)], html='<p>Hi</p>'))
+        self.assertFalse(email_queue.enqueue(idempotency_key='application:0', subject='Application 0',
+                                             to=['test0@test.com']))
+        # Nothing is sent before the workers start
+        self.assertListEqual([], self.sent_emails)
+        email_queue.start()
+        self.assertTrue(email_queue.wait_until_empty(timeout=5))
+        self.assertSetEqual({'Application {}'.format(email_id) for email_id in range(10)},
+                            {email['subject'] for email in self.sent_emails})
+        self.assertEqual(10, len(self.sent_emails))
+        metrics = email_queue.get_metrics()
+        self.assertEqual(10, metrics['sent'])
+        self.assertEqual(0, metrics['queued'])
+        self.assertEqual(0, metrics['due'])
+        self.assertIsNone(metrics['oldest_due_age'])
+        self.assertGreaterEqual(metrics['max_latency'], metrics['avg_latency'])
+        email_queue.close()
+        self.assertSetEqual({'application:{}'.format(email_id) for email_id in range(10)}, set(sent_keys))
+
+    def test_delayed_send(self):
+        email_queue = EmailQueue(send_email=self.send_email, queue_path=self.queue_path)
+        email_queue.start()
+        logger.info("Enqueueing an email delayed by 0.5 seconds and one that isn't delayed..")
+        started_on = time.time()
+        email_queue.enqueue(idempotency_key='application:1', subject='Application 1', to=['test1@test.com'],
+                            delay=0.5)
+        email_queue.enqueue(idempotency_key='application:2', subject='Application 2', to=['test2@test.com'])
+        time.sleep(0.2)
+        # The delayed email doesn't hold back the rest
+        self.assertListEqual(['Application 2'], [email['subject'] for email in self.sent_emails])
+        self.assertEqual(1, email_queue.get_metrics()['queued'])
+        self.assertEqual(0, email_queue.get_metrics()['due'])
+        self.assertTrue(email_queue.wait_until_empty(timeout=5))
+        self.assertGreaterEqual(time.time() - started_on, 0.5)
+        self.assertListEqual(['Application 2', 'Application 1'], [email['subject'] for email in self.sent_emails])
+        email_queue.close()
+
+    def test_retry_with_backoff(self):
+        failures = []
+
+        def send_email_flaky(**message) -> None:
+            if len(failures) < 2:
+                failures.append(message)
+                raise ConnectionError("The SMTP server is down")
+            self.send_email(**message)
+
+        email_queue = EmailQueue(send_email=send_email_flaky, queue_path=self.queue_path, retry_backoff=0.05)
+        email_queue.start()
+        email_queue.enqueue(idempotency_key='application:1', subject='Application 1', to=['test1@test.com'])
+        logger.info("Sending while the SMTP server fails twice..")
+        self.assertTrue(email_queue.wait_until_empty(timeout=5))
+        self.assertEqual(2, len(failures))
+        self.assertEqual(1, len(self.sent_emails))
+        email_queue.close()
+
+    def test_give_up(self):
+        def send_email_failing(**message) -> None:
+            raise ConnectionError("The SMTP server is down")
+
+        failed_emails = []
+        email_queue = EmailQueue(send_email=send_email_failing, queue_path=self.queue_path, max_attempts=3,
+                                 retry_backoff=0.01,
+                                 on_failed=lambda idempotency_key, message, error: failed_emails.append(
+                                     (idempotency_key, message['to'], error)))
+        email_queue.start()
+        email_queue.enqueue(idempotency_key='application:1', subject='Application 1', to=['test1@test.com'])
+        self.assertTrue(email_queue.wait_until_empty(timeout=5))
+        self.assertEqual(1, email_queue.get_metrics()['failed'])
+        email_queue.close()
+        self.assertListEqual([('application:1', ['test1@test.com'], 'The SMTP server is down')], failed_emails)
+
+    def test_enqueue_again_after_failure(self):
+        def send_email_failing(**message) -> None:
+            raise ConnectionError("The SMTP server is down")
+
+        email_queue = EmailQueue(send_email=send_email_failing, queue_path=self.queue_path, max_attempts=1)
+        email_queue.start()
+        email_queue.enqueue(idempotency_key='application:1', subject='Application 1', to=['test1@test.com'])
+        self.assertTrue(email_queue.wait_until_empty(timeout=5))
+        self.assertEqual('failed', email_queue.get_status('application:1'))
+        email_queue.close()
+        logger.info("Enqueueing the failed email again once the SMTP server is up..")
+        email_queue = EmailQueue(send_email=self.send_email, queue_path=self.queue_path, max_attempts=1)
+        email_queue.start()
+        self.assertTrue(email_queue.enqueue(idempotency_key='application:1', subject='Application 1',
+                                            to=['test1@test.com']))
+        self.assertTrue(email_queue.wait_until_empty(timeout=5))
+        self.assertEqual('sent', email_queue.get_status('application:1'))
+        self.assertEqual(['Application 1'], [email['subject'] for email in self.sent_emails])
+        self.assertFalse(email_queue.enqueue(idempotency_key='application:1', subject='Application 1',
+                                             to=['test1@test.com']))
+        self.assertIsNone(email_queue.get_status('application:2'))
+        email_queue.close()
+
+    def test_durable(self):
+        is_sending = threading.Event()
+
+        def send_email_failing(**message) -> None:
+            is_sending.set()
+            raise ConnectionError("The SMTP server is down")
+
+        email_queue = EmailQueue(send_email=send_email_failing, queue_path=self.queue_path, retry_backoff=60)
+        email_queue.start()
+        email_queue.enqueue(idempotency_key='application:1', subject='Application 1', to=['test1@test.com'],
+                            attachments=['cv.pdf'])
+        self.assertTrue(is_sending.wait(timeout=5))
+        email_queue.close()
+        # Simulate a crash while it was being sent
+        connection = sqlite3.connect(self.queue_path)
+        with connection:
+            connection.execute("UPDATE outbound_emails SET status = 'sending', next_attempt_on = 0")
+        connection.close()
+        logger.info("Restarting with the email still being sent..")
+        email_queue = EmailQueue(send_email=self.send_email, queue_path=self.queue_path, retry_backoff=60)
+        email_queue.start()
+        self.assertTrue(email_queue.wait_until_empty(timeout=5))
+        self.assertListEqual([{'subject': 'Application 1', 'to': ['test1@test.com'], 'cc': None, 'bcc': None,
+                               'text': None, 'html': None, 'attachments': ['cv.pdf'], 'sender': None,
+                               'reply_to': None}], self.sent_emails)
+        email_queue.close()
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        self.temp_folder = tempfile.TemporaryDirectory()
+        self.queue_path = os.path.join(self.temp_folder.name, 'outbound_emails.sqlite3')
+        self.sent_emails = []
+
+    def tearDown(self) -> None:
+        self.temp_folder.cleanup()
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import time
+import logging
+
+from ad_site_crawler.fetch_engine import FetchEngine, TokenBucket
+
+logger = logging.getLogger('TestFetchEngine')
+
+
+class TestFetchEngine(unittest.TestCase):
+
+    def test_map_keeps_order(self):
+        fetch_engine = FetchEngine(max_concurrency_per_host=4, burst=10)
+        urls = ['http://localhost/{}'.format(i) for i in range(10)]
+
+        def slow_fetch(url: str) -> str:
+            # The first urls take the longest in order to finish out of order
+            time.sleep(0.01 * (10 - int(url.split('/')[-1])))
+            return url
+
+        logger.info("Calling map()..")
+        self.assertListEqual(urls, list(fetch_engine.map(fetch_func=slow_fetch, urls=urls)))
+        fetch_engine.shutdown()
+
+    def test_map_rate_limit(self):
+        fetch_engine = FetchEngine(max_concurrency_per_host=4, burst=2)
+        urls = ['http://localhost/{}'.format(i) for i in range(4)]
+        logger.info("Calling map() with interval=0.2..")
+        start = time.monotonic()
+        list(fetch_engine.map(fetch_func=lambda url: url, urls=urls, interval=0.2))
+        elapsed = time.monotonic() - start
+        # Two requests are served from the burst, the other two are paced
+        self.assertGreaterEqual(elapsed, 0.35)
+        self.assertLess(elapsed, 1)
+        fetch_engine.shutdown()
+
+    def test_token_bucket_unlimited(self):
+        token_bucket = TokenBucket(rate=0, capacity=1)
+        self.assertEqual(0, sum(token_bucket.acquire() for _ in range(100)))
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+
+if __name__ == '__main__':
+    unittest.main()
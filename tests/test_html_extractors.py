@@ -0,0 +1,106 @@
+import unittest
+import os
+import logging
+import urllib.parse
+from typing import List
+
+from ad_site_crawler.html_extractors import AdLinksExtractor, EmailsExtractor
+
+logger = logging.getLogger('TestHtmlExtractors')
+
+
+class TestHtmlExtractors(unittest.TestCase):
+    __slots__ = ('html_file_with_links', 'html_file_with_email_2')
+
+    html_file_with_links: str
+    html_file_with_email_2: str
+    chunk_size: int = 100
+    test_data_path: str = os.path.join('test_data', 'test_xegr_ad_site_crawler')
+
+    def test_ad_links_extractor_chunks(self):
+        links_extractor = AdLinksExtractor(anchor_class_name='highlight')
+        # Feed the html in small chunks
+        logger.info("Feeding the html in chunks of %s characters.." % self.chunk_size)
+        returned_links = []
+        chunks_fed = 0
+        for html_chunk in self._split_in_chunks(self.html_file_with_links):
+            returned_links += links_extractor.feed(html_chunk)
+            chunks_fed += 1
+            if links_extractor.done:
+                break
+        expected_links = ['/jobs/programmatistes-mhxanikoi-h-y|ad-96230841.html',
+                          '/jobs/programmatistes-mhxanikoi-h-y|ad-659824116.html',
+                          '/jobs/programmatistes-mhxanikoi-h-y|ad-94456892.html',
+                          '/jobs/programmatistes-mhxanikoi-h-y|ad-579027979.html']
+        self.assertListEqual([urllib.parse.quote(link) for link in expected_links],
+                             [urllib.parse.quote(link) for link in returned_links])
+        # Check that the parsing stopped once the result list was over
+        self.assertTrue(links_extractor.done)
+        self.assertLess(chunks_fed, len(list(self._split_in_chunks(self.html_file_with_links))))
+
+    def test_ad_links_extractor_single_link(self):
+        links_extractor = AdLinksExtractor(anchor_class_name='highlight')
+        returned_links = links_extractor.feed('<div><ul><li><a class="big highlight"\n href="/ad-1.html">Ad</a>'
+                                              '</li></ul></div><a href="/other.html">Other</a>')
+        self.assertListEqual(['/ad-1.html'], returned_links)
+        self.assertFalse(links_extractor.done)
+
+    def test_ad_links_extractor_multi_anchor_cards(self):
+        links_extractor = AdLinksExtractor(anchor_class_name='highlight')
+        # Each card links to its ad from both its image and its title
+        logger.info("Feeding the first card on its own..")
+        returned_links = links_extractor.feed('<div><ul><li><div><a class="highlight" href="/ad-1.html"><img></a>'
+                                              '</div><h3><a class="highlight" href="/ad-1.html">Ad 1</a></h3></li>')
+        self.assertListEqual(['/ad-1.html', '/ad-1.html'], returned_links)
+        self.assertFalse(links_extractor.done)
+        returned_links = links_extractor.feed('<li><div><a class="highlight" href="/ad-2.html"><img></a></div>'
+                                              '<h3><a class="highlight" href="/ad-2.html">Ad 2</a></h3></li>')
+        self.assertListEqual(['/ad-2.html', '/ad-2.html'], returned_links)
+        self.assertFalse(links_extractor.done)
+        returned_links = links_extractor.feed('</ul></div><a class="highlight" href="/ad-3.html">Ad 3</a>')
+        self.assertListEqual([], returned_links)
+        self.assertTrue(links_extractor.done)
+
+    def test_emails_extractor_chunks(self):
+        emails_extractor = EmailsExtractor(ignored_emails=['email@paroxos.com'])
+        # Feed the html in small chunks
+        logger.info("Feeding the html in chunks of %s characters.." % self.chunk_size)
+        returned_emails = []
+        for html_chunk in self._split_in_chunks(self.html_file_with_email_2):
+            returned_emails += emails_extractor.feed(html_chunk)
+        returned_emails += emails_extractor.close()
+        expected_emails = ['efi.koulourianou@gmail.com', 'efi.koulourianou@gmail.com']
+        self.assertListEqual(expected_emails, returned_emails)
+
+    def test_emails_extractor_split_email(self):
+        emails_extractor = EmailsExtractor(ignored_emails=['email@paroxos.com'])
+        returned_emails = emails_extractor.feed('email@paroxos.com ' + ' ' * 300 + 'Send your cv at john.d')
+        returned_emails += emails_extractor.feed('oe@example.gr or call us.')
+        returned_emails += emails_extractor.close()
+        self.assertListEqual(['john.doe@example.gr'], returned_emails)
+
+    def _split_in_chunks(self, html_data: str) -> List[str]:
+        for i in range(0, len(html_data), self.chunk_size):
+            yield html_data[i:i + self.chunk_size]
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+        with open(os.path.join(cls.test_data_path, 'file_with_links.html'), 'r') as html_f:
+            cls.html_file_with_links = html_f.read()
+        with open(os.path.join(cls.test_data_path, 'file_with_email_2.html'), 'r') as html_f:
+            cls.html_file_with_email_2 = html_f.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+import time
+import logging
+import tempfile
+
+from ad_site_crawler.http_cache import HttpCache, HttpCacheEntry
+
+logger = logging.getLogger('TestHttpCache')
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def test_put_get(self):
+        with tempfile.TemporaryDirectory() as cache_folder:
+            http_cache = HttpCache(cache_folder=cache_folder)
+            self.assertIsNone(http_cache.get('https://www.xe.gr/search'))
+            logger.info("Storing a cache entry..")
+            http_cache.put(HttpCacheEntry(url='https://www.xe.gr/search', etag='"123"',
+                                          last_modified='Wed, 21 Oct 2015 07:28:00 GMT', content_hash='abc'))
+            # Check that it survives a restart
+            http_cache = HttpCache(cache_folder=cache_folder)
+            http_cache_entry = http_cache.get('https://www.xe.gr/search')
+            self.assertEqual('abc', http_cache_entry.content_hash)
+            self.assertDictEqual({'If-None-Match': '"123"', 'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'},
+                                 http_cache_entry.get_conditional_headers())
+            http_cache.remove('https://www.xe.gr/search')
+            self.assertIsNone(http_cache.get('https://www.xe.gr/search'))
+
+    def test_lru_eviction(self):
+        with tempfile.TemporaryDirectory() as cache_folder:
+            entry_size = len('{"url": "https://www.xe.gr/search?page=1", "etag": null, "last_modified": null, '
+                             '"content_hash": null}')
+            http_cache = HttpCache(cache_folder=cache_folder, max_size=3 * entry_size)
+            logger.info("Storing three cache entries..")
+            for page in range(1, 4):
+                http_cache.put(HttpCacheEntry(url='https://www.xe.gr/search?page={}'.format(page)))
+                # Make sure that the modification times differ
+                time.sleep(0.01)
+            # Use the first one, so that the second one is the least recently used
+            self.assertIsNotNone(http_cache.get('https://www.xe.gr/search?page=1'))
+            logger.info("Storing a fourth cache entry..")
+            http_cache.put(HttpCacheEntry(url='https://www.xe.gr/search?page=4'))
+            self.assertEqual(3, len(os.listdir(cache_folder)))
+            self.assertIsNone(http_cache.get('https://www.xe.gr/search?page=2'))
+            self.assertIsNotNone(http_cache.get('https://www.xe.gr/search?page=1'))
+            self.assertIsNotNone(http_cache.get('https://www.xe.gr/search?page=4'))
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+
+if __name__ == '__main__':
+    unittest.main()
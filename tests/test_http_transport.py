@@ -0,0 +1,161 @@
+import unittest
+import gzip
+import logging
+import http.server
+import socketserver
+import threading
+from typing import List
+
+from ad_site_crawler.http_transport import HttpTransport
+
+logger = logging.getLogger('TestHttpTransport')
+
+
+class TestHttpTransport(unittest.TestCase):
+    __slots__ = ('httpd', 'base_url')
+
+    httpd: socketserver.TCPServer
+    base_url: str
+    client_ports: List[int] = []
+    body: bytes = '<html><body>{}</body></html>'.format('Καλημέρα ' * 1000).encode('utf-8')
+    PORT: int = 8112
+
+    def test_request_gzip(self):
+        http_transport = HttpTransport()
+        logger.info("Requesting a gzipped page..")
+        response = http_transport.request('{base_url}/gzip'.format(base_url=self.base_url))
+        self.assertEqual(200, response.status)
+        self.assertEqual('gzip', response.getheader('Content-Encoding'))
+        self.assertEqual(self.body, response.read())
+        http_transport.close()
+
+    def test_request_plain(self):
+        http_transport = HttpTransport()
+        logger.info("Requesting a plain page..")
+        response = http_transport.request('{base_url}/plain'.format(base_url=self.base_url))
+        self.assertEqual(self.body, response.read())
+        http_transport.close()
+
+    def test_keep_alive(self):
+        http_transport = HttpTransport()
+        ports_before = len(self.client_ports)
+        logger.info("Requesting three pages..")
+        http_transport.request('{base_url}/gzip'.format(base_url=self.base_url)).read()
+        for _ in range(2):
+            http_transport.request('{base_url}/plain'.format(base_url=self.base_url)).read()
+        # Check that a single connection was used
+        self.assertEqual(1, len(set(self.client_ports[ports_before:])))
+        self.assertEqual(3, len(self.client_ports) - ports_before)
+        stats = http_transport.get_stats()
+        self.assertEqual(3, stats['requests'])
+        self.assertEqual(2, stats['reused_connections'])
+        http_transport.close()
+
+    def test_early_close(self):
+        http_transport = HttpTransport()
+        ports_before = len(self.client_ports)
+        logger.info("Reading only the first chunk of a page..")
+        response = http_transport.request('{base_url}/plain'.format(base_url=self.base_url))
+        next(response.iter_chunks(chunk_size=100))
+        response.close()
+        http_transport.request('{base_url}/plain'.format(base_url=self.base_url)).read()
+        # The half-read connection can't be reused
+        self.assertEqual(2, len(set(self.client_ports[ports_before:])))
+        http_transport.close()
+
+    def test_close_without_body(self):
+        http_transport = HttpTransport()
+        ports_before = len(self.client_ports)
+        logger.info("Closing a 304 and a 404 without reading them..")
+        response = http_transport.request('{base_url}/not_modified'.format(base_url=self.base_url))
+        self.assertEqual(304, response.status)
+        response.close()
+        response = http_transport.request('{base_url}/not_found'.format(base_url=self.base_url))
+        self.assertEqual(404, response.status)
+        response.close()
+        http_transport.request('{base_url}/plain'.format(base_url=self.base_url)).read()
+        # There was nothing left to read, or little enough to drain, so the connection is reused
+        self.assertEqual(1, len(set(self.client_ports[ports_before:])))
+        self.assertEqual(2, http_transport.get_stats()['reused_connections'])
+        http_transport.close()
+
+    def test_redirect_and_timing(self):
+        http_transport = HttpTransport()
+        logger.info("Requesting a redirected page..")
+        response = http_transport.request('{base_url}/redirect'.format(base_url=self.base_url))
+        self.assertEqual(self.body, response.read())
+        self.assertTrue(response.url.endswith('/plain'))
+        self.assertGreater(response.timing.total, 0)
+        self.assertGreater(response.timing.ttfb, 0)
+        http_transport.close()
+
+    @classmethod
+    def init_local_server(cls, port: int) -> socketserver.TCPServer:
+        class MyHttpRequestHandler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                cls.client_ports.append(self.client_address[1])
+                if self.path == '/redirect':
+                    self.send_response(302)
+                    self.send_header('Location', '/plain')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if self.path == '/not_modified':
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                if self.path == '/not_found':
+                    # send_error() would close the connection
+                    body = b'<html><body>Not Found</body></html>'
+                    self.send_response(404)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                body = cls.body
+                self.send_response(200)
+                if self.path == '/gzip' and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        class ThreadingServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        return ThreadingServer(("", port), MyHttpRequestHandler)
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+        cls.base_url = 'http://localhost:{port}'.format(port=cls.PORT)
+        cls.httpd = cls.init_local_server(port=cls.PORT)
+        server_thread = threading.Thread(target=cls.httpd.serve_forever)
+        server_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
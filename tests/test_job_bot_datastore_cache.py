@@ -0,0 +1,138 @@
+import unittest
+import os
+import time
+import datetime
+import logging
+import tempfile
+from typing import Dict
+
+from datastore.job_bot_sqlite_datastore import JobBotSqliteDatastore
+from datastore.job_bot_datastore_cache import JobBotDatastoreCache
+
+logger = logging.getLogger('TestJobBotDatastoreCache')
+
+
+class TestJobBotDatastoreCache(unittest.TestCase):
+    __slots__ = ('datastore_conf', 'temp_folder')
+
+    datastore_conf: Dict
+    temp_folder: tempfile.TemporaryDirectory
+
+    def test_write_through(self):
+        data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        data_store.save_sent_application(self._get_row(row_id=1))
+        cache = JobBotDatastoreCache(data_store=data_store, reconcile_interval=None)
+        self.assertSetEqual({'www.test1.com'}, cache.links)
+        logger.info("Saving an application through the cache..")
+        cache.save_sent_application(self._get_row(row_id=2))
+        self.assertSetEqual({'www.test2.com'}, cache.has_link(links=['www.test2.com', 'www.test3.com']))
+        self.assertSetEqual({'test2@test.com'}, cache.has_email(emails=['test2@test.com', None]))
+        self.assertSetEqual({'www.test2.com'}, data_store.has_link(links=['www.test2.com']))
+        logger.info("Removing an application through the cache..")
+        cache.remove_ad(email_id=1)
+        self.assertSetEqual(set(), cache.has_link(links=['www.test1.com']))
+        self.assertSetEqual(set(), cache.has_email(emails=['test1@test.com']))
+        self.assertSetEqual(set(), data_store.has_link(links=['www.test1.com']))
+        cache.close()
+
+    def test_reconcile(self):
+        cache = JobBotDatastoreCache(data_store=JobBotSqliteDatastore(config=self.datastore_conf),
+                                     reconcile_interval=0.2)
+        cache.save_sent_application(self._get_row(row_id=1))
+        # Another process, like the remove_email run mode, changes the datastore
+        logger.info("Changing the datastore from another connection..")
+        other_data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        other_data_store.remove_ad(email_id=1)
+        other_data_store.save_sent_application(self._get_row(row_id=2))
+        other_data_store.close()
+        self.assertSetEqual({'www.test1.com'}, cache.links)
+        time.sleep(0.6)
+        self.assertSetEqual({'www.test2.com'}, cache.links)
+        self.assertSetEqual({'test2@test.com'}, cache.has_email(emails=['test1@test.com', 'test2@test.com']))
+        cache.close()
+
+    def test_checked_links(self):
+        cache = JobBotDatastoreCache(data_store=JobBotSqliteDatastore(config=self.datastore_conf),
+                                     reconcile_interval=None)
+        checked_links = cache.checked_links
+        cache.save_sent_application(self._get_row(row_id=1))
+        # Checked by the crawler, but its email was applied to already
+        checked_links.add('www.test2.com')
+        self.assertIn('www.test1.com', checked_links)
+        self.assertIn('www.test2.com', checked_links)
+        self.assertNotIn('www.test3.com', checked_links)
+        self.assertEqual(2, len(checked_links))
+        logger.info("Changing the datastore from another connection..")
+        other_data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        other_data_store.remove_ad(email_id=1)
+        other_data_store.save_sent_application(self._get_row(row_id=3))
+        other_data_store.close()
+        cache.reconcile()
+        self.assertNotIn('www.test1.com', checked_links)
+        self.assertIn('www.test3.com', checked_links)
+        logger.info("Saving a link checked by the crawler..")
+        checked_links.add('www.test4.com')
+        cache.save_sent_application(self._get_row(row_id=4))
+        self.assertIn('www.test4.com', checked_links)
+        email_id = cache.data_store.select_from_table(table=cache.data_store.application_table_name, columns='id',
+                                                      where='link=%s', where_params=('www.test4.com',))[0][0]
+        cache.remove_ad(email_id=email_id)
+        self.assertNotIn('www.test4.com', checked_links)
+        cache.close()
+
+    def test_max_unsaved_links(self):
+        cache = JobBotDatastoreCache(data_store=JobBotSqliteDatastore(config=self.datastore_conf),
+                                     reconcile_interval=None, max_unsaved_links=2)
+        checked_links = cache.checked_links
+        logger.info("Checking more links than remembered..")
+        checked_links.add('www.test1.com')
+        checked_links.add('www.test2.com')
+        self.assertIn('www.test1.com', checked_links)
+        checked_links.add('www.test3.com')
+        # The least recently seen link is forgotten
+        self.assertNotIn('www.test2.com', checked_links)
+        self.assertIn('www.test1.com', checked_links)
+        self.assertIn('www.test3.com', checked_links)
+        self.assertEqual(2, len(checked_links))
+        logger.info("Saving a checked link from another connection..")
+        other_data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        other_data_store.save_sent_application(self._get_row(row_id=1))
+        other_data_store.close()
+        cache.reconcile()
+        self.assertListEqual(['www.test3.com'], list(checked_links._unsaved_links))
+        self.assertIn('www.test1.com', checked_links)
+        cache.close()
+
+    @staticmethod
+    def _get_row(row_id: int) -> Dict:
+        return {'link': 'www.test{}.com'.format(row_id), 'email': 'test{}@test.com'.format(row_id),
+                'sent_on': datetime.datetime.utcnow().isoformat()}
+
+    @staticmethod
+    def _setup_log(debug: bool = False) -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        self.temp_folder = tempfile.TemporaryDirectory()
+        self.datastore_conf = {'db_path': os.path.join(self.temp_folder.name, 'test.sqlite3')}
+
+    def tearDown(self) -> None:
+        self.temp_folder.cleanup()
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
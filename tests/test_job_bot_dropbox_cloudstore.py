@@ -35,7 +35,8 @@ class TestJobBotDropboxCloudstore(unittest.TestCase):
                               cloud_store._update_stop_words,
                               cloud_store._update_application_to_send_email,
                               cloud_store._update_inform_success_email,
-                              cloud_store._update_inform_should_call_email]
+                              cloud_store._update_inform_should_call_email,
+                              cloud_store._update_digest_email]
         self.assertTrue(True, all(boolean_attributes))
         req_only_cloud_store = JobBotDropboxCloudstore(config=req_only_conf.get_cloudstores()[0],
                                                        remote_files_folder=self.remote_tests_folder)
@@ -43,7 +44,8 @@ class TestJobBotDropboxCloudstore(unittest.TestCase):
                                        not req_only_cloud_store._update_stop_words,
                                        not req_only_cloud_store._update_application_to_send_email,
                                        not req_only_cloud_store._update_inform_success_email,
-                                       not req_only_cloud_store._update_inform_should_call_email]
+                                       not req_only_cloud_store._update_inform_should_call_email,
+                                       not req_only_cloud_store._update_digest_email]
         self.assertTrue(True, all(req_only_boolean_attributes))
 
     def test_upload_download_attachment(self):
@@ -106,7 +108,9 @@ class TestJobBotDropboxCloudstore(unittest.TestCase):
                        ('inform_should_call', cloud_store.get_inform_should_call_email_data,
                         cloud_store.update_inform_should_call_email_data),
                        ('inform_success', cloud_store.get_inform_success_email_data,
-                        cloud_store.update_inform_success_email_data))
+                        cloud_store.update_inform_success_email_data),
+                       ('digest', cloud_store.get_digest_email_data,
+                        cloud_store.update_digest_email_data))
         for email_type, get_func, update_func in email_types:
             # Copy bcks to to actual files
             bck_subject_path = os.path.join(cloud_store.local_files_folder,
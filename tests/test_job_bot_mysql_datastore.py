@@ -1,5 +1,8 @@
 import unittest
 import os
+import copy
+import json
+import tempfile
 import datetime
 import random
 import string
@@ -8,6 +11,7 @@ from typing import List
 
 
 from configuration.configuration import Configuration
+from datastore.abstract_job_bot_datastore import DatastoreSchemaError
 from datastore.job_bot_mysql_datastore import JobBotMySqlDatastore
 
 logger = logging.getLogger('TestJobBotMysqlDatastore')
@@ -47,14 +51,14 @@ class TestJobBotMysqlDatastore(unittest.TestCase):
         # Check if it is empty
         self.assertListEqual([], data_store.select_from_table(table=self.table_name))
         # Insert a row
-        datetime_now = datetime.datetime.utcnow().isoformat()
+        datetime_now = datetime.datetime.utcnow()
         row = {'link': 'www.test.com',
                'email': 'test@test.com',
-               'sent_on': datetime_now}
+               'sent_on': datetime_now.isoformat()}
         logger.info('Inserting row into applications sent table..')
         data_store.save_sent_application(row)
         # Check if row was inserted
-        self.assertListEqual([(1, 'www.test.com', 'test@test.com', datetime_now)],
+        self.assertListEqual([(1, 'www.test.com', 'test@test.com', datetime_now, 'sent', None, None)],
                              data_store.select_from_table(table=self.table_name))
 
     def test_get_applications_sent(self):
@@ -64,22 +68,149 @@ class TestJobBotMysqlDatastore(unittest.TestCase):
         logger.info('Creating applications sent table..')
         data_store.create_applications_sent_table()
         # Insert to rows
-        datetime_now = datetime.datetime.utcnow().isoformat()
+        datetime_now = datetime.datetime.utcnow()
         row1 = {'link': 'www.test1.com',
                'email': 'test1@test1.com',
-               'sent_on': datetime_now}
+               'sent_on': datetime_now.isoformat()}
         row2 = {'link': 'www.test2.com',
                 'email': 'test2@test2.com',
-                'sent_on': datetime_now}
+                'sent_on': datetime_now.isoformat()}
         logger.info('Inserting two rows into applications sent table..')
         data_store.save_sent_application(row1)
         data_store.save_sent_application(row2)
         logger.info('Getting the two rows using the get_applications_sent()..')
-        expected_result = [tuple(row1.values()), tuple(row2.values())]
+        expected_result = [(row1['link'], row1['email'], datetime_now), (row2['link'], row2['email'], datetime_now)]
         # Check if they were inserted
         self.assertListEqual(sorted(expected_result),
                              sorted([result[1:] for result in data_store.get_applications_sent()]))
 
+    def test_has_link_has_email(self):
+        data_store = JobBotMySqlDatastore(config=self.configuration.get_datastores()[0],
+                                          application_table_name=self.table_name)
+        # Create applications sent table
+        logger.info('Creating applications sent table..')
+        data_store.create_applications_sent_table()
+        # Insert more rows than the old select limit and the query batch size
+        datetime_now = datetime.datetime.utcnow().isoformat()
+        logger.info('Inserting 1200 rows into applications sent table..')
+        for row_id in range(1200):
+            data_store.save_sent_application({'link': "www.test{}.com/ad'{}".format(row_id, row_id),
+                                              'email': 'test{}@test.com'.format(row_id) if row_id % 2 else None,
+                                              'sent_on': datetime_now})
+        self.assertEqual(1200, len(data_store.get_applications_sent(columns='link')))
+        # Check which of the links and emails were saved
+        links = ["www.test{}.com/ad'{}".format(row_id, row_id) for row_id in range(1100, 1300)]
+        self.assertSetEqual(set(links[:100]), data_store.has_link(links=links))
+        emails = ['test{}@test.com'.format(row_id) for row_id in range(0, 1300)] + [None]
+        self.assertSetEqual({'test{}@test.com'.format(row_id) for row_id in range(1, 1200, 2)},
+                            data_store.has_email(emails=emails))
+        self.assertSetEqual(set(), data_store.has_link(links=[]))
+
+    def test_batched_writes(self):
+        with tempfile.TemporaryDirectory() as journal_folder:
+            datastore_conf = copy.deepcopy(self.configuration.get_datastores()[0])
+            datastore_conf['write_batch_size'] = 10
+            datastore_conf['write_journal_path'] = os.path.join(journal_folder, 'journal.jsonl')
+            data_store = JobBotMySqlDatastore(config=datastore_conf, application_table_name=self.table_name)
+            data_store.create_applications_sent_table()
+            datetime_now = datetime.datetime.utcnow()
+            rows = [{'link': 'www.test{}.com'.format(row_id), 'email': 'test{}@test.com'.format(row_id),
+                     'sent_on': datetime_now.isoformat()} for row_id in range(15)]
+            logger.info('Saving 15 applications with a batch size of 10..')
+            for row in rows:
+                data_store.save_sent_application(row)
+            # The buffered rows count as saved
+            self.assertEqual(10, len(data_store.select_from_table(table=self.table_name)))
+            self.assertSetEqual({'www.test12.com'}, data_store.has_link(links=['www.test12.com', 'www.test20.com']))
+            data_store.close()
+            self.assertEqual(15, len(data_store.select_from_table(table=self.table_name)))
+            # Simulate a crash after a flush that wasn't removed from the journal
+            with open(datastore_conf['write_journal_path'], 'a') as journal_file:
+                journal_file.write(json.dumps(rows[0]) + '\n')
+            # Replaying the journal on startup skips the duplicates
+            data_store = JobBotMySqlDatastore(config=datastore_conf, application_table_name=self.table_name)
+            data_store.save_sent_applications(rows)
+            self.assertListEqual(sorted((row['link'], row['email'], datetime_now) for row in rows),
+                                 sorted([result[1:] for result in data_store.get_applications_sent()]))
+            data_store.close()
+
+    def test_iterate_applications_sent(self):
+        data_store = JobBotMySqlDatastore(config=self.configuration.get_datastores()[0],
+                                          application_table_name=self.table_name)
+        data_store.create_applications_sent_table()
+        rows = [{'link': 'www.test{}.com'.format(row_id),
+                 'email': 'test{}@{}'.format(row_id, 'gmail.com' if row_id % 2 else 'test.com'),
+                 'sent_on': datetime.datetime(2020, 6, 1 + row_id % 30, 12).isoformat()} for row_id in range(1500)]
+        data_store.save_sent_applications(rows)
+        logger.info('Iterating over the applications sent..')
+        self.assertEqual(1500, len(list(data_store.iterate_applications_sent(columns='link'))))
+        applications_sent = list(data_store.iterate_applications_sent(columns='link', sent_from='2020-06-10',
+                                                                      sent_to='2020-06-12', email_domain='gmail.com',
+                                                                      batch_size=7))
+        self.assertListEqual([(row['link'],) for row_id, row in enumerate(rows)
+                              if row_id % 30 in (9, 10) and row_id % 2],
+                             applications_sent)
+
+    def test_migrate(self):
+        data_store = JobBotMySqlDatastore(config=self.configuration.get_datastores()[0],
+                                          application_table_name=self.table_name)
+        # A table created before the migrations
+        data_store.create_table(table=self.table_name, schema=data_store.application_table_schema)
+        data_store.insert_into_table(table=self.table_name, data={'link': 'www.test1.com', 'email': None,
+                                                                  'sent_on': '2020-06-01T12:00:00.000001'})
+        self.assertEqual(0, data_store.get_schema_version())
+        with self.assertRaises(DatastoreSchemaError):
+            data_store.check_schema_version()
+        logger.info('Migrating the table..')
+        self.assertListEqual([1, 2, 3], data_store.migrate())
+        data_store.check_schema_version()
+        self.assertListEqual([], data_store.migrate())
+        self.assertListEqual([('www.test1.com', datetime.datetime(2020, 6, 1, 12, 0, 0, 1), 'informed')],
+                             data_store.get_applications_sent(columns='link, sent_on, status'))
+        # Only the unique index of the schema is left on the email
+        indexes = data_store.select_from_table(table='information_schema.statistics',
+                                               columns='index_name, non_unique',
+                                               where="table_schema = DATABASE() AND table_name = %s "
+                                                     "AND column_name = 'email'",
+                                               where_params=(self.table_name,))
+        self.assertListEqual([('email', 0)], indexes)
+        # The time range queries use the sent_on index
+        plan = data_store._execute("EXPLAIN SELECT id FROM {} WHERE sent_on >= %s".format(self.table_name),
+                                   params=('2020-06-01',), prepared=False, fetch=True)
+        self.assertIn('{}_sent_on'.format(self.table_name), str(plan))
+
+    def test_migrate_duplicate_emails(self):
+        data_store = JobBotMySqlDatastore(config=self.configuration.get_datastores()[0],
+                                          application_table_name=self.table_name)
+        # A table created before the email was unique
+        data_store.create_table(table=self.table_name, schema='id int auto_increment primary key, '
+                                                              'link varchar(100) not null, '
+                                                              'email varchar(100) null, '
+                                                              'sent_on varchar(100) not null, '
+                                                              'constraint link unique (link)')
+        for row_id in (1, 2, 3):
+            data_store.insert_into_table(table=self.table_name,
+                                         data={'link': 'www.test{}.com'.format(row_id),
+                                               'email': 'test@test.com' if row_id < 3 else None,
+                                               'sent_on': '2020-06-01T12:00:00'})
+        logger.info('Migrating the table..')
+        # The duplicates are left for the operator to resolve
+        with self.assertRaises(DatastoreSchemaError):
+            data_store.migrate()
+        self.assertEqual(2, data_store.get_schema_version())
+        self.assertListEqual([('www.test1.com', 'test@test.com'), ('www.test2.com', 'test@test.com'),
+                              ('www.test3.com', None)],
+                             data_store.get_applications_sent(columns='link, email'))
+        data_store.remove_ad(email_id=2)
+        logger.info('Migrating the table without the duplicates..')
+        self.assertListEqual([3], data_store.migrate())
+        indexes = data_store.select_from_table(table='information_schema.statistics',
+                                               columns='index_name, non_unique',
+                                               where="table_schema = DATABASE() AND table_name = %s "
+                                                     "AND column_name = 'email'",
+                                               where_params=(self.table_name,))
+        self.assertListEqual([('{}_email'.format(self.table_name), 0)], indexes)
+
     def test_remove_ad(self):
         data_store = JobBotMySqlDatastore(config=self.configuration.get_datastores()[0],
                                           application_table_name=self.table_name)
@@ -87,20 +218,20 @@ class TestJobBotMysqlDatastore(unittest.TestCase):
         logger.info('Creating applications sent table..')
         data_store.create_applications_sent_table()
         # Insert to rows
-        datetime_now = datetime.datetime.utcnow().isoformat()
+        datetime_now = datetime.datetime.utcnow()
         row1 = {'link': 'www.test1.com',
                'email': 'test1@test1.com',
-               'sent_on': datetime_now}
+               'sent_on': datetime_now.isoformat()}
         row2 = {'link': 'www.test2.com',
                 'email': 'test2@test2.com',
-                'sent_on': datetime_now}
+                'sent_on': datetime_now.isoformat()}
         logger.info('Inserting two rows into applications sent table..')
         data_store.save_sent_application(row1)
         data_store.save_sent_application(row2)
         logger.info('Deleting the first row from the applications sent table..')
         data_store.remove_ad(email_id=1)
         logger.info('Getting the remaining row using the get_applications_sent()..')
-        expected_result = [tuple(row2.values())]
+        expected_result = [(row2['link'], row2['email'], datetime_now)]
         # Check if they were inserted
         self.assertListEqual(sorted(expected_result),
                              sorted([result[1:] for result in data_store.get_applications_sent()]))
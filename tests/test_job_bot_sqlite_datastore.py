@@ -0,0 +1,239 @@
+import unittest
+import os
+import json
+import datetime
+import logging
+import tempfile
+from typing import Dict
+
+from datastore.abstract_job_bot_datastore import DatastoreSchemaError
+from datastore.sqlite_datastore import SqliteDatastore
+from datastore.job_bot_sqlite_datastore import JobBotSqliteDatastore
+
+logger = logging.getLogger('TestJobBotSqliteDatastore')
+
+
+class TestJobBotSqliteDatastore(unittest.TestCase):
+    __slots__ = ('datastore_conf', 'temp_folder')
+
+    datastore_conf: Dict
+    temp_folder: tempfile.TemporaryDirectory
+
+    def test_create_applications_sent_table(self):
+        data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        # The table and its indexes are created on startup
+        self.assertIn('applications_sent', data_store.show_tables())
+        indexes = data_store.select_from_table(table='sqlite_master', columns='name',
+                                               where="type = 'index' AND tbl_name = %s",
+                                               where_params=('applications_sent',))
+        self.assertIn(('applications_sent_sent_on',), indexes)
+        self.assertIn(('applications_sent_status',), indexes)
+        # Link and email have their unique indexes
+        self.assertEqual(4, len(indexes))
+        self.assertEqual(2, data_store.get_schema_version())
+        self.assertListEqual([], data_store.migrate())
+
+    def test_migrate(self):
+        # A table created before the status column
+        legacy_data_store = SqliteDatastore(config=self.datastore_conf)
+        legacy_data_store.create_table(table='applications_sent',
+                                       schema=JobBotSqliteDatastore.application_table_schema)
+        legacy_data_store.insert_into_table(table='applications_sent',
+                                            data={'link': 'www.test1.com', 'email': None, 'sent_on': '2020'})
+        legacy_data_store.insert_into_table(table='applications_sent',
+                                            data={'link': 'www.test2.com', 'email': 'test2@test.com',
+                                                  'sent_on': '2020'})
+        legacy_data_store.close()
+        logger.info('Migrating the legacy table..')
+        data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        self.assertEqual(2, data_store.get_schema_version())
+        self.assertListEqual([('www.test1.com', 'informed'), ('www.test2.com', 'sent')],
+                             data_store.get_applications_sent(columns='link, status'))
+        data_store.save_sent_application({'link': 'www.test3.com', 'email': None, 'sent_on': '2020',
+                                          'status': 'skipped_stopword'})
+        self.assertListEqual([('skipped_stopword',)],
+                             data_store.select_from_table(table='applications_sent', columns='status',
+                                                          where='link = %s', where_params=('www.test3.com',)))
+        with self.assertRaises(DatastoreSchemaError):
+            data_store.save_sent_application({'link': 'www.test4.com', 'email': None, 'sent_on': '2020',
+                                              'status': 'unknown'})
+
+    def test_save_get_remove(self):
+        data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        self.assertListEqual([], data_store.get_applications_sent())
+        datetime_now = datetime.datetime.utcnow().isoformat()
+        row1 = {'link': 'www.test1.com',
+                'email': 'test1@test1.com',
+                'sent_on': datetime_now}
+        row2 = {'link': 'www.test2.com',
+                'email': None,
+                'sent_on': datetime_now}
+        logger.info('Inserting two rows into applications sent table..')
+        data_store.save_sent_application(row1)
+        data_store.save_sent_application(row2)
+        self.assertListEqual([(1,) + tuple(row1.values()), (2,) + tuple(row2.values())],
+                             data_store.get_applications_sent())
+        self.assertSetEqual({'www.test2.com'}, data_store.has_link(links=['www.test2.com', 'www.test3.com']))
+        self.assertSetEqual({'test1@test1.com'}, data_store.has_email(emails=['test1@test1.com', None]))
+        logger.info('Deleting the first row from the applications sent table..')
+        data_store.remove_ad(email_id=1)
+        self.assertListEqual([(2,) + tuple(row2.values())], data_store.get_applications_sent())
+
+    def test_has_link_has_email(self):
+        data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        datetime_now = datetime.datetime.utcnow().isoformat()
+        logger.info('Inserting 1200 rows into applications sent table..')
+        data_store.save_sent_applications([{'link': "www.test{}.com/ad'{}".format(row_id, row_id),
+                                            'email': 'test{}@test.com'.format(row_id) if row_id % 2 else None,
+                                            'sent_on': datetime_now} for row_id in range(1200)])
+        self.assertEqual(1200, len(data_store.get_applications_sent(columns='link')))
+        links = ["www.test{}.com/ad'{}".format(row_id, row_id) for row_id in range(1100, 1300)]
+        self.assertSetEqual(set(links[:100]), data_store.has_link(links=links))
+        emails = ['test{}@test.com'.format(row_id) for row_id in range(0, 1300)] + [None]
+        self.assertSetEqual({'test{}@test.com'.format(row_id) for row_id in range(1, 1200, 2)},
+                            data_store.has_email(emails=emails))
+        self.assertSetEqual(set(), data_store.has_link(links=[]))
+
+    def test_iterate_applications_sent(self):
+        data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        rows = [{'link': 'www.test{}.com'.format(row_id),
+                 'email': 'test{}@{}'.format(row_id, 'gmail.com' if row_id % 2 else 'test.com'),
+                 'sent_on': datetime.datetime(2020, 6, 1 + row_id % 30, 12).isoformat()} for row_id in range(300)]
+        data_store.save_sent_applications(rows)
+        logger.info('Iterating over the applications sent..')
+        self.assertListEqual([(row_id + 1,) + tuple(row.values()) for row_id, row in enumerate(rows)],
+                             list(data_store.iterate_applications_sent(batch_size=64)))
+        applications_sent = list(data_store.iterate_applications_sent(columns='link', sent_from='2020-06-10',
+                                                                      sent_to='2020-06-12', email_domain='gmail.com',
+                                                                      batch_size=7))
+        self.assertListEqual([(row['link'],) for row_id, row in enumerate(rows)
+                              if row_id % 30 in (9, 10) and row_id % 2],
+                             applications_sent)
+
+    def test_save_get_rejected_ads(self):
+        data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        data_store.save_sent_application({'link': 'www.test1.com', 'email': 'test1@test.com',
+                                          'sent_on': '2020-06-01T12:00:00'})
+        logger.info('Saving three rejected ads..')
+        data_store.save_rejected_ads([
+            {'link': 'www.test1.com', 'reason': 'stop words: senior', 'rejected_on': '2020-06-02T12:00:00',
+             'expires_on': None},
+            {'link': 'www.test2.com', 'reason': 'stop words: senior', 'rejected_on': '2020-06-02T12:00:00',
+             'expires_on': '2020-06-03T12:00:00'},
+            {'link': 'www.test3.com', 'reason': 'stop words: lead', 'rejected_on': '2020-06-02T12:00:00',
+             'expires_on': None}])
+        # The application sent isn't overwritten and the rejected ads don't count as sent
+        self.assertListEqual([('www.test1.com', 'sent')], data_store.get_applications_sent(columns='link, status'))
+        self.assertSetEqual({'www.test1.com'}, data_store.has_link(links=['www.test1.com', 'www.test2.com']))
+        self.assertListEqual([('www.test2.com', '2020-06-03T12:00:00'), ('www.test3.com', None)],
+                             sorted(data_store.get_rejected_ads(now='2020-06-02T18:00:00'),
+                                    key=lambda row: row[0]))
+        self.assertListEqual([('www.test3.com', None)], data_store.get_rejected_ads(now='2020-06-04T12:00:00'))
+        logger.info('Rejecting again the expired ad..')
+        data_store.save_rejected_ads([{'link': 'www.test2.com', 'reason': 'stop words: lead',
+                                       'rejected_on': '2020-06-04T12:00:00', 'expires_on': '2020-06-05T12:00:00'}])
+        self.assertListEqual([('stop words: lead', '2020-06-05T12:00:00')],
+                             data_store.select_from_table(table='applications_sent', columns='reason, expires_on',
+                                                          where='link = %s', where_params=('www.test2.com',)))
+        logger.info('Sending an application to the ad rejected before..')
+        data_store.save_sent_application({'link': 'www.test2.com', 'email': 'test2@test.com',
+                                          'sent_on': '2020-06-06T12:00:00'})
+        self.assertListEqual([('www.test1.com', 'sent'), ('www.test2.com', 'sent')],
+                             data_store.get_applications_sent(columns='link, status'))
+        self.assertListEqual([('www.test3.com', None)], data_store.get_rejected_ads(now='2020-06-06T12:00:00'))
+        data_store.close()
+
+    def test_save_email_conflicts(self):
+        data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        data_store.save_sent_applications([{'link': 'www.test1.com', 'email': 'test1@test.com',
+                                            'sent_on': '2020-06-01T12:00:00'},
+                                           {'link': 'www.test2.com', 'email': 'test2@test.com',
+                                            'sent_on': '2020-06-01T12:00:00'}])
+        data_store.mark_application_failed(link='www.test2.com')
+        logger.info('Saving applications whose emails belong to other ads..')
+        data_store.save_sent_applications([{'link': 'www.test3.com', 'email': 'test1@test.com',
+                                            'sent_on': '2020-06-02T12:00:00'},
+                                           {'link': 'www.test4.com', 'email': 'test2@test.com',
+                                            'sent_on': '2020-06-02T12:00:00'},
+                                           {'link': 'www.test5.com', 'email': 'test2@test.com',
+                                            'sent_on': '2020-06-02T12:00:00'},
+                                           {'link': 'www.test1.com', 'email': 'test1@test.com',
+                                            'sent_on': '2020-06-02T12:00:00'}])
+        # The application sent keeps its email, the failed one gives it up to the first new one
+        self.assertListEqual([('www.test1.com', 'test1@test.com', '2020-06-02T12:00:00', 'sent'),
+                              ('www.test2.com', None, '2020-06-01T12:00:00', 'failed'),
+                              ('www.test4.com', 'test2@test.com', '2020-06-02T12:00:00', 'sent')],
+                             data_store.select_from_table(table='applications_sent',
+                                                          columns='link, email, sent_on, status', order_by='link'))
+        data_store.close()
+
+    def test_mark_application_failed(self):
+        data_store = JobBotSqliteDatastore(config=self.datastore_conf)
+        data_store.save_sent_applications([{'link': 'www.test{}.com'.format(row_id),
+                                            'email': 'test{}@test.com'.format(row_id),
+                                            'sent_on': '2020-06-01T12:00:00'} for row_id in (1, 2)])
+        logger.info('Marking the first application as failed..')
+        data_store.mark_application_failed(link='www.test1.com', reason='The SMTP server is down')
+        # It no longer counts as sent
+        self.assertListEqual([('www.test2.com', 'sent')], data_store.get_applications_sent(columns='link, status'))
+        self.assertSetEqual(set(), data_store.has_link(links=['www.test1.com']))
+        self.assertSetEqual(set(), data_store.has_email(emails=['test1@test.com']))
+        self.assertListEqual([('failed', 'The SMTP server is down')],
+                             data_store.select_from_table(table='applications_sent', columns='status, reason',
+                                                          where='link = %s', where_params=('www.test1.com',)))
+        logger.info('Sending the application again..')
+        data_store.save_sent_application({'link': 'www.test1.com', 'email': 'test1@test.com',
+                                          'sent_on': '2020-06-02T12:00:00'})
+        self.assertSetEqual({'www.test1.com'}, data_store.has_link(links=['www.test1.com']))
+        data_store.close()
+
+    def test_batched_writes(self):
+        datastore_conf = dict(self.datastore_conf, write_batch_size=10,
+                              write_journal_path=os.path.join(self.temp_folder.name, 'journal.jsonl'))
+        data_store = JobBotSqliteDatastore(config=datastore_conf)
+        datetime_now = datetime.datetime.utcnow().isoformat()
+        rows = [{'link': 'www.test{}.com'.format(row_id), 'email': 'test{}@test.com'.format(row_id),
+                 'sent_on': datetime_now} for row_id in range(15)]
+        logger.info('Saving 15 applications with a batch size of 10..')
+        for row in rows:
+            data_store.save_sent_application(row)
+        # The buffered rows count as saved
+        self.assertEqual(10, len(data_store.select_from_table(table='applications_sent')))
+        self.assertSetEqual({'www.test12.com'}, data_store.has_link(links=['www.test12.com', 'www.test20.com']))
+        data_store.close()
+        # Simulate a crash after a flush that wasn't removed from the journal
+        with open(datastore_conf['write_journal_path'], 'a') as journal_file:
+            journal_file.write(json.dumps(rows[0]) + '\n')
+        data_store = JobBotSqliteDatastore(config=datastore_conf)
+        self.assertListEqual([tuple(row.values()) for row in rows],
+                             [result[1:] for result in data_store.get_applications_sent()])
+        data_store.close()
+
+    @staticmethod
+    def _setup_log(debug: bool = False) -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        self.temp_folder = tempfile.TemporaryDirectory()
+        self.datastore_conf = {'db_path': os.path.join(self.temp_folder.name, 'test.sqlite3')}
+
+    def tearDown(self) -> None:
+        self.temp_folder.cleanup()
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,8 +4,10 @@ import copy
 import random
 import string
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
-from mysql.connector.errors import ProgrammingError as MsqlProgrammingError
+from mysql.connector.errors import ProgrammingError as MsqlProgrammingError, \
+    OperationalError as MsqlOperationalError, InterfaceError as MsqlInterfaceError
 
 from configuration.configuration import Configuration
 from datastore.mysql_datastore import MySqlDatastore
@@ -72,6 +74,105 @@ class TestMysqlDatastore(unittest.TestCase):
         results = data_store.select_from_table(table=self.table_name)
         self.assertEqual([], results)
 
+    def test_bound_parameters(self):
+        data_store = MySqlDatastore(config=self.configuration.get_datastores()[0])
+        # Create table
+        logger.info('Creating table..')
+        data_store.create_table(self.table_name, self.test_table_schema)
+        # Values with quotes should be stored as they are
+        logger.info("Inserting rows with quotes into table..")
+        for order_id in range(1, 4):
+            data_store.insert_into_table(table=self.table_name,
+                                         data={"order_id": order_id, "order_type": "it's plain",
+                                               "is_delivered": False})
+        logger.info("Updating the table with bound where parameters..")
+        data_store.update_table(table=self.table_name, set_data={"order_type": "'; DROP TABLE x; --"},
+                                where='order_id >= %s', where_params=(2,))
+        results = data_store.select_from_table(table=self.table_name, where='order_type = %s',
+                                               where_params=("it's plain",))
+        self.assertEqual([(1, "it's plain", False)], results)
+        results = data_store.select_from_table(table=self.table_name, columns='order_id',
+                                               order_by='order_id', limit=1, where='order_type = %s',
+                                               where_params=("'; DROP TABLE x; --",))
+        self.assertEqual([(2,)], results)
+        logger.info("Deleting from table with bound where parameters..")
+        data_store.delete_from_table(table=self.table_name, where='order_id = %s', where_params=(3,))
+        results = data_store.select_from_table(table=self.table_name, columns='order_id')
+        self.assertEqual([(1,), (2,)], sorted(results))
+
+    def test_pool_and_reconnect(self):
+        datastore_conf = copy.deepcopy(self.configuration.get_datastores()[0])
+        datastore_conf['pool_size'] = 2
+        data_store = MySqlDatastore(config=datastore_conf)
+        data_store.create_table(self.table_name, self.test_table_schema)
+        # Insert from more threads than connections
+        logger.info("Inserting into table from 4 threads..")
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda order_id: data_store.insert_into_table(
+                table=self.table_name, data={"order_id": order_id, "order_type": "plain", "is_delivered": False}),
+                range(1, 9)))
+        self.assertLessEqual(data_store._connection_pool.connections_opened, 2)
+        results = data_store.select_from_table(table=self.table_name, columns='order_id')
+        self.assertEqual([(order_id,) for order_id in range(1, 9)], sorted(results))
+        # Kill the idle connections like the server does after its wait_timeout
+        logger.info("Killing the pooled connections..")
+        with data_store._connection_pool.connection() as pooled_connection:
+            # Otherwise the reads would keep the snapshot of the first one
+            self.assertTrue(pooled_connection.connection.autocommit)
+        self._kill_pooled_connection(data_store)
+        # The query should be retried on a new connection
+        results = data_store.select_from_table(table=self.table_name, columns='order_id', where='order_id = %s',
+                                               where_params=(1,))
+        self.assertEqual([(1,)], results)
+        # An insert may have been committed before the connection was lost, so it shouldn't be retried
+        logger.info("Inserting into table on a killed connection..")
+        self._kill_pooled_connection(data_store)
+        with self.assertRaises((MsqlOperationalError, MsqlInterfaceError)):
+            data_store.insert_into_table(table=self.table_name,
+                                         data={"order_id": 9, "order_type": "plain", "is_delivered": False})
+        results = data_store.select_from_table(table=self.table_name, columns='order_id', where='order_id = %s',
+                                               where_params=(9,))
+        self.assertEqual([], results)
+        data_store.close()
+
+    def _kill_pooled_connection(self, data_store: MySqlDatastore) -> None:
+        with data_store._connection_pool.connection() as pooled_connection:
+            connection_id = pooled_connection.connection.connection_id
+        killer_store = MySqlDatastore(config=self.configuration.get_datastores()[0])
+        with killer_store._connection_pool.connection() as pooled_connection:
+            cursor = pooled_connection.connection.cursor()
+            cursor.execute("KILL %s" % connection_id)
+            cursor.close()
+        killer_store.close()
+
+    def test_prepared_statements_reused(self):
+        datastore_conf = copy.deepcopy(self.configuration.get_datastores()[0])
+        datastore_conf['pool_size'] = 1
+        data_store = MySqlDatastore(config=datastore_conf)
+        data_store.create_table(self.table_name, self.test_table_schema)
+        # Count the statements prepared on the only pooled connection
+        with data_store._connection_pool.connection() as pooled_connection:
+            connection = pooled_connection.connection
+        statements_prepared = []
+        cmd_stmt_prepare = connection.cmd_stmt_prepare
+
+        def counting_cmd_stmt_prepare(statement, *args, **kwargs):
+            statements_prepared.append(statement)
+            return cmd_stmt_prepare(statement, *args, **kwargs)
+
+        connection.cmd_stmt_prepare = counting_cmd_stmt_prepare
+        # Each query is built as a new string, but should be prepared only once
+        logger.info("Running the same queries repeatedly..")
+        for order_id in range(1, 6):
+            data_store.insert_into_table(table=self.table_name,
+                                         data={"order_id": order_id, "order_type": "plain", "is_delivered": False})
+            data_store.select_from_table(table=self.table_name, columns='order_id', where='order_id = %s',
+                                         where_params=(order_id,))
+        self.assertEqual(2, len(statements_prepared))
+        results = data_store.select_from_table(table=self.table_name, columns='order_id')
+        self.assertEqual([(order_id,) for order_id in range(1, 6)], sorted(results))
+        data_store.close()
+
     @staticmethod
     def _generate_random_filename() -> str:
         letters = string.ascii_lowercase
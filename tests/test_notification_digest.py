@@ -0,0 +1,102 @@
+import unittest
+import os
+import time
+import logging
+import tempfile
+from typing import List, Tuple
+
+from email_app.notification_digest import NotificationDigest, NotificationDigestError
+
+logger = logging.getLogger('TestNotificationDigest')
+
+
+class TestNotificationDigest(unittest.TestCase):
+    __slots__ = ('temp_folder', 'journal_path', 'digests')
+
+    temp_folder: tempfile.TemporaryDirectory
+    journal_path: str
+    digests: List[Tuple[str, str, str]]
+
+    def send_digest(self, idempotency_key: str, subject: str, html: str) -> None:
+        self.digests.append((idempotency_key, subject, html))
+
+    def test_digest_on_close(self):
+        notification_digest = NotificationDigest(send_digest=self.send_digest, journal_path=self.journal_path)
+        logger.info("Adding three notifications..")
+        notification_digest.add(kind='inform_success', link='www.test1.com', html='<p>Sent to test1</p>')
+        notification_digest.add(kind='inform_should_call', link='www.test2.com', html='<p>Call test2</p>')
+        notification_digest.add(kind='inform_success', link='www.test3.com', html='<p>Sent to test3</p>')
+        with self.assertRaises(NotificationDigestError):
+            notification_digest.add(kind='unknown', link='www.test4.com', html='')
+        self.assertListEqual([], self.digests)
+        notification_digest.close()
+        self.assertEqual(1, len(self.digests))
+        _, subject, html = self.digests[0]
+        self.assertEqual('Job Bot: 3 new ads, 2 applications sent, 1 to call', subject)
+        self.assertIn('<p>Sent to test1</p>\n<hr>\n<p>Call test2</p>\n<hr>\n<p>Sent to test3</p>', html)
+
+    def test_digest_per_window(self):
+        notification_digest = NotificationDigest(send_digest=self.send_digest, journal_path=self.journal_path,
+                                                 window=0.2, subject_template='{count} ads')
+        notification_digest.add(kind='inform_success', link='www.test1.com', html='<p>Sent to test1</p>')
+        notification_digest.add(kind='inform_success', link='www.test2.com', html='<p>Sent to test2</p>')
+        time.sleep(0.5)
+        self.assertListEqual(['2 ads'], [subject for _, subject, _ in self.digests])
+        notification_digest.add(kind='inform_should_call', link='www.test3.com', html='<p>Call test3</p>')
+        notification_digest.close()
+        self.assertListEqual(['2 ads', '1 ads'], [subject for _, subject, _ in self.digests])
+        self.assertNotEqual(self.digests[0][0], self.digests[1][0])
+
+    def test_html_template(self):
+        notification_digest = NotificationDigest(send_digest=self.send_digest, journal_path=self.journal_path,
+                                                 subject_template='{count} ads',
+                                                 html_template='<h1>{subject}: {inform_success} sent</h1>'
+                                                               '{notifications}')
+        notification_digest.add(kind='inform_success', link='www.test1.com', html='<p>Sent to test1</p>')
+        notification_digest.add(kind='inform_should_call', link='www.test2.com', html='<p>Call test2</p>')
+        notification_digest.close()
+        self.assertListEqual([('2 ads', '<h1>2 ads: 1 sent</h1><p>Sent to test1</p>\n<hr>\n<p>Call test2</p>')],
+                             [(subject, html) for _, subject, html in self.digests])
+
+    def test_replay_after_crash(self):
+        def fail_to_send(idempotency_key: str, subject: str, html: str) -> None:
+            raise ConnectionError("The email queue is down")
+
+        notification_digest = NotificationDigest(send_digest=fail_to_send, journal_path=self.journal_path,
+                                                 max_notifications=1)
+        notification_digest.add(kind='inform_success', link='www.test1.com', html='<p>Sent to test1</p>')
+        logger.info("Restarting..")
+        notification_digest = NotificationDigest(send_digest=self.send_digest, journal_path=self.journal_path)
+        self.assertEqual(1, len(self.digests))
+        self.assertTrue(self.digests[0][0].startswith('digest:'))
+        notification_digest.close()
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        self.temp_folder = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.temp_folder.name, 'notification_digest.jsonl')
+        self.digests = []
+
+    def tearDown(self) -> None:
+        self.temp_folder.cleanup()
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
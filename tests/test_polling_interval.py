@@ -0,0 +1,76 @@
+import unittest
+import datetime
+import logging
+
+from ad_site_crawler.polling_interval import PollingInterval
+
+logger = logging.getLogger('TestPollingInterval')
+
+
+class TestPollingInterval(unittest.TestCase):
+    busy_hour: datetime.datetime = datetime.datetime(2020, 5, 4, 10, 30)
+    quiet_hour: datetime.datetime = datetime.datetime(2020, 5, 4, 3, 30)
+
+    def test_adaptive(self):
+        polling_interval = PollingInterval(base_interval=120, min_interval=30, max_interval=900)
+        # Without any arrivals learned every hour is an average one
+        self.assertEqual(120, polling_interval.get_interval(now=self.busy_hour))
+        logger.info("Learning that most ads arrive in the morning..")
+        polling_interval.learn(arrival_times=[self.busy_hour.replace(day=day) for day in range(1, 25)] * 3)
+        self.assertEqual(30, polling_interval.get_interval(now=self.busy_hour))
+        self.assertEqual(480, polling_interval.get_interval(now=self.quiet_hour))
+        polling_interval.learn(arrival_times=[self.busy_hour.replace(day=day) for day in range(1, 25)] * 10)
+        self.assertEqual(900, polling_interval.get_interval(now=self.quiet_hour))
+        # The new ads found are learned too
+        logger.info("Recording new ads found in the quiet hour..")
+        polling_interval.record_success(new_ads=312, now=self.quiet_hour)
+        self.assertEqual(30, polling_interval.get_interval(now=self.quiet_hour))
+
+    def test_not_adaptive(self):
+        polling_interval = PollingInterval(base_interval=120, adaptive=False)
+        polling_interval.learn(arrival_times=[self.busy_hour] * 100)
+        self.assertEqual(120, polling_interval.get_interval(now=self.busy_hour))
+        self.assertEqual(120, polling_interval.get_interval(now=self.quiet_hour))
+
+    def test_backoff(self):
+        polling_interval = PollingInterval(base_interval=120, min_interval=30, max_interval=900)
+        logger.info("Recording consecutive errors..")
+        expected_intervals = [240, 480, 900, 900]
+        for expected_interval in expected_intervals:
+            polling_interval.record_error()
+            self.assertEqual(expected_interval, polling_interval.get_interval(now=self.busy_hour))
+        # The Retry-After of the server is honored even beyond the max_interval
+        polling_interval.record_error(retry_after=3600)
+        self.assertEqual(3600, polling_interval.get_interval(now=self.busy_hour))
+        # A success resets the backoff
+        polling_interval.record_success(now=self.busy_hour)
+        self.assertEqual(0, polling_interval.consecutive_errors)
+        self.assertEqual(120, polling_interval.get_interval(now=self.quiet_hour))
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        pass
+
+    def tearDown(self) -> None:
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import datetime
+import logging
+
+from ad_site_crawler.rejected_ads import RejectedAds
+
+logger = logging.getLogger('TestRejectedAds')
+
+
+class TestRejectedAds(unittest.TestCase):
+    now: datetime.datetime = datetime.datetime(2020, 6, 1, 12)
+
+    def test_add_and_expire(self):
+        rejections = []
+        rejected_ads = RejectedAds(ttl=3600, on_rejected=rejections.append)
+        logger.info("Rejecting an ad for an hour..")
+        rejected_ads.add(link='www.test1.com', reason='stop words: senior', now=self.now)
+        self.assertListEqual([{'link': 'www.test1.com', 'reason': 'stop words: senior',
+                               'rejected_on': '2020-06-01T12:00:00', 'expires_on': '2020-06-01T13:00:00'}],
+                             rejections)
+        self.assertTrue(rejected_ads.is_rejected('www.test1.com', now=self.now + datetime.timedelta(minutes=59)))
+        self.assertFalse(rejected_ads.is_rejected('www.test2.com', now=self.now))
+        # The expired rejection is forgotten
+        self.assertFalse(rejected_ads.is_rejected('www.test1.com', now=self.now + datetime.timedelta(hours=1)))
+        self.assertEqual(0, len(rejected_ads))
+
+    def test_load_and_never_expire(self):
+        rejected_ads = RejectedAds()
+        rejected_ads.load([('www.test1.com', None), ('www.test2.com', self.now)])
+        self.assertEqual(2, len(rejected_ads))
+        self.assertTrue(rejected_ads.is_rejected('www.test1.com', now=self.now + datetime.timedelta(days=365)))
+        self.assertFalse(rejected_ads.is_rejected('www.test2.com', now=self.now))
+        rejected_ads.add(link='www.test3.com', reason='stop words: lead')
+        self.assertIn('www.test3.com', rejected_ads)
+
+    def test_failed_save(self):
+        def fail_to_save(rejection):
+            raise ConnectionError("The datastore is down")
+
+        rejected_ads = RejectedAds(ttl=60, on_rejected=fail_to_save)
+        logger.info("Rejecting an ad while the datastore is down..")
+        rejected_ads.add(link='www.test1.com', reason='stop words: senior')
+        # Still rejected for as long as the process runs
+        self.assertIn('www.test1.com', rejected_ads)
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        pass
+
+    def tearDown(self) -> None:
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
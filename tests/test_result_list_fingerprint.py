@@ -0,0 +1,69 @@
+import unittest
+import os
+import logging
+import tempfile
+
+from ad_site_crawler.result_list_fingerprint import ResultListFingerprint, ResultListFingerprintStore
+
+logger = logging.getLogger('TestResultListFingerprint')
+
+
+class TestResultListFingerprint(unittest.TestCase):
+    lookup_url: str = 'https://www.xe.gr/search?q=1'
+    links: list = ['https://www.xe.gr/ad-{}.html'.format(ad_id) for ad_id in range(5)]
+
+    def test_updated(self):
+        fingerprint = ResultListFingerprint(lookup_url=self.lookup_url).updated(self.links[2:])
+        self.assertIn(self.links[2], fingerprint)
+        self.assertNotIn(self.links[0], fingerprint)
+        # Two new ads at the top, the walk stopped at the first known one
+        logger.info("Updating the fingerprint with the new top of the result list..")
+        fingerprint = fingerprint.updated(self.links[:3])
+        self.assertListEqual([ResultListFingerprint.hash_link(link) for link in self.links],
+                             fingerprint.link_hashes)
+
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as fingerprints_folder:
+            fingerprint_store = ResultListFingerprintStore(fingerprints_folder=fingerprints_folder, max_links=3)
+            self.assertEqual(0, len(fingerprint_store.get(self.lookup_url)))
+            logger.info("Storing a fingerprint..")
+            fingerprint_store.put(ResultListFingerprint(lookup_url=self.lookup_url).updated(self.links))
+            # Check that it survives a restart and that only the top of the list is kept
+            fingerprint_store = ResultListFingerprintStore(fingerprints_folder=fingerprints_folder, max_links=3)
+            fingerprint = fingerprint_store.get(self.lookup_url)
+            self.assertListEqual([ResultListFingerprint.hash_link(link) for link in self.links[:3]],
+                                 fingerprint.link_hashes)
+            self.assertEqual(0, len(fingerprint_store.get('https://www.xe.gr/search?q=2')))
+            # A corrupted fingerprint is dropped
+            with open(fingerprint_store._get_fingerprint_path(self.lookup_url), 'w') as fingerprint_file:
+                fingerprint_file.write('{"lookup_url"')
+            self.assertEqual(0, len(fingerprint_store.get(self.lookup_url)))
+            self.assertListEqual([], os.listdir(fingerprints_folder))
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        pass
+
+    def tearDown(self) -> None:
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
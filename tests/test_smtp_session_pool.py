@@ -0,0 +1,198 @@
+import unittest
+import time
+import smtplib
+import logging
+import threading
+from typing import List
+
+from email_app.smtp_session_pool import SmtpSessionPool, SmtpSessionPoolError
+
+logger = logging.getLogger('TestSmtpSessionPool')
+
+
+class FakeHandler:
+    """ Stands in for a GMail handler, whose session the server can close. """
+
+    def __init__(self) -> None:
+        self.connects = 0
+        self.closes = 0
+        self.noops = 0
+        self.is_dropped = False
+        self.sent_messages = []
+        self.connect()
+
+    def connect(self) -> None:
+        self.connects += 1
+        self.is_dropped = False
+
+    def is_connected(self) -> bool:
+        self.noops += 1
+        return not self.is_dropped
+
+    def send(self, message: str) -> None:
+        if self.is_dropped:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.sent_messages.append(message)
+
+    def close(self) -> None:
+        self.closes += 1
+        self.is_dropped = True
+
+
+class TestSmtpSessionPool(unittest.TestCase):
+    __slots__ = ('handlers',)
+
+    handlers: List[FakeHandler]
+
+    def connect(self) -> FakeHandler:
+        handler = FakeHandler()
+        self.handlers.append(handler)
+        return handler
+
+    def test_reconnect_on_failure(self):
+        session_pool = SmtpSessionPool(connect=self.connect, keep_alive_interval=None)
+        session_pool.run(lambda handler: handler.send('Message 1'))
+        logger.info("Sending after the server closed the session..")
+        self.handlers[0].is_dropped = True
+        session_pool.run(lambda handler: handler.send('Message 2'))
+        self.assertEqual(2, len(self.handlers))
+        self.assertListEqual(['Message 2'], self.handlers[1].sent_messages)
+        stats = session_pool.get_stats()
+        self.assertEqual(2, stats['sends'])
+        self.assertEqual(1, stats['lost_sessions'])
+        self.assertEqual(1, stats['sessions'])
+        self.assertTrue(session_pool.is_connected())
+        session_pool.close()
+        self.assertFalse(session_pool.is_connected())
+
+    def test_keep_alive(self):
+        session_pool = SmtpSessionPool(connect=self.connect, keep_alive_interval=0.1)
+        time.sleep(0.35)
+        self.assertGreaterEqual(self.handlers[0].noops, 2)
+        logger.info("Reconnecting in the background after the server closed the idle session..")
+        self.handlers[0].is_dropped = True
+        time.sleep(0.25)
+        self.assertEqual(2, self.handlers[0].connects)
+        # The closed session is closed on our side too before it is reconnected
+        self.assertEqual(1, self.handlers[0].closes)
+        self.assertGreaterEqual(session_pool.get_stats()['reconnects'], 1)
+        session_pool.run(lambda handler: handler.send('Message 1'))
+        self.assertEqual(1, len(self.handlers))
+        session_pool.close()
+
+    def test_parallel_sends(self):
+        release_event = threading.Event()
+        sending = []
+
+        def send_slowly(handler: FakeHandler) -> None:
+            sending.append(handler)
+            release_event.wait(timeout=5)
+            handler.send('Message')
+
+        session_pool = SmtpSessionPool(connect=self.connect, pool_size=2, pool_timeout=0.2, keep_alive_interval=None)
+        threads = [threading.Thread(target=session_pool.run, args=(send_slowly,)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while len(sending) < 2:
+            time.sleep(0.01)
+        self.assertEqual(2, session_pool.get_stats()['sessions'])
+        # Both sessions are in use
+        with self.assertRaises(SmtpSessionPoolError):
+            session_pool.run(lambda handler: handler.send('Message'))
+        release_event.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(2, session_pool.get_stats()['idle_sessions'])
+        self.assertListEqual([['Message'], ['Message']], [handler.sent_messages for handler in self.handlers])
+        session_pool.close()
+
+    def test_wait_for_a_free_slot(self):
+        release_event = threading.Event()
+        sending = threading.Event()
+
+        def send_and_lose_session(handler: FakeHandler) -> None:
+            sending.set()
+            release_event.wait(timeout=5)
+            handler.is_dropped = True
+            handler.send('Message 1')
+
+        def run_and_lose_session() -> None:
+            with self.assertRaises(smtplib.SMTPServerDisconnected):
+                session_pool.run(send_and_lose_session, max_retries=0)
+
+        session_pool = SmtpSessionPool(connect=self.connect, pool_size=1, pool_timeout=5, keep_alive_interval=None)
+        thread = threading.Thread(target=run_and_lose_session)
+        thread.start()
+        sending.wait(timeout=5)
+        logger.info("Waiting for the only session, which is lost..")
+        threading.Timer(0.2, release_event.set).start()
+        session_pool.run(lambda handler: handler.send('Message 2'))
+        thread.join()
+        # The waiting send opened a new session in the slot of the lost one
+        self.assertEqual(2, len(self.handlers))
+        self.assertListEqual(['Message 2'], self.handlers[1].sent_messages)
+        self.assertEqual(1, session_pool.get_stats()['sessions'])
+        session_pool.close()
+
+    def test_keep_alive_one_session_at_a_time(self):
+        session_pool = SmtpSessionPool(connect=self.connect, pool_size=2, keep_alive_interval=None)
+        release_event = threading.Event()
+        threads = [threading.Thread(target=session_pool.run, args=(lambda handler: release_event.wait(timeout=5),))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while session_pool.get_stats()['sessions'] < 2:
+            time.sleep(0.01)
+        release_event.set()
+        for thread in threads:
+            thread.join()
+        checking = threading.Event()
+        resume_event = threading.Event()
+        stale_handler = session_pool._idle_sessions[0].handler
+
+        def is_connected_slowly() -> bool:
+            checking.set()
+            resume_event.wait(timeout=5)
+            return True
+
+        stale_handler.is_connected = is_connected_slowly
+        session_pool._keep_alive_interval = 0
+        keep_alive_thread = threading.Thread(target=session_pool._keep_alive)
+        keep_alive_thread.start()
+        checking.wait(timeout=5)
+        logger.info("Sending while a session is kept alive..")
+        self.assertEqual(1, session_pool.get_stats()['idle_sessions'])
+        session_pool.run(lambda handler: handler.send('Message'))
+        resume_event.set()
+        keep_alive_thread.join()
+        self.assertListEqual([], stale_handler.sent_messages)
+        self.assertEqual(2, session_pool.get_stats()['idle_sessions'])
+        session_pool.close()
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        self.handlers = []
+
+    def tearDown(self) -> None:
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import os
+import random
+import string
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from datastore.sqlite_datastore import SqliteDatastore
+
+logger = logging.getLogger('TestSqliteDatastore')
+
+
+class TestSqliteDatastore(unittest.TestCase):
+    __slots__ = ('datastore_conf', 'test_table_schema', 'temp_folder')
+
+    datastore_conf: Dict
+    test_table_schema: str
+    temp_folder: tempfile.TemporaryDirectory
+
+    def test_connect(self):
+        data_store = SqliteDatastore(config=self.datastore_conf)
+        self.assertTrue(os.path.isfile(self.datastore_conf['db_path']))
+        journal_mode = data_store._execute('PRAGMA journal_mode', fetch=True)
+        self.assertEqual([('wal',)], journal_mode)
+        data_store.close()
+
+    def test_create_drop(self):
+        data_store = SqliteDatastore(config=self.datastore_conf)
+        # Create table
+        logger.info('Creating table..')
+        data_store.create_table(self.table_name, self.test_table_schema)
+        data_store.create_index(self.table_name, 'order_type')
+        data_store.create_index(self.table_name, 'order_type')
+        # Check if it was created
+        self.assertIn(self.table_name, data_store.show_tables())
+        # Drop table
+        logger.info('Dropping table..')
+        data_store.drop_table(table=self.table_name)
+        self.assertNotIn(self.table_name, data_store.show_tables())
+
+    def test_insert_update_delete(self):
+        data_store = SqliteDatastore(config=self.datastore_conf)
+        # Create table
+        logger.info('Creating table..')
+        data_store.create_table(self.table_name, self.test_table_schema)
+        # Ensure it is empty
+        results = data_store.select_from_table(table=self.table_name)
+        self.assertEqual([], results)
+        # Insert into table
+        insert_data = {"order_id": 1,
+                       "order_type": "it's plain",
+                       "is_delivered": False}
+        logger.info("Inserting into table..")
+        data_store.insert_into_table(table=self.table_name, data=insert_data)
+        # Check if the data was inserted
+        results = data_store.select_from_table(table=self.table_name)
+        self.assertEqual([(1, "it's plain", False)], results)
+        logger.info("Updating the table..")
+        data_store.update_table(table=self.table_name, set_data={"is_delivered": True}, where='order_id = %s',
+                                where_params=(1,))
+        results = data_store.select_from_table(table=self.table_name, columns='is_delivered')
+        self.assertEqual([(True,)], results)
+        logger.info("Deleting from table..")
+        data_store.delete_from_table(table=self.table_name, where='order_id = %s', where_params=(1,))
+        # Check if the data was deleted
+        results = data_store.select_from_table(table=self.table_name)
+        self.assertEqual([], results)
+
+    def test_insert_many(self):
+        data_store = SqliteDatastore(config=self.datastore_conf)
+        data_store.create_table(self.table_name, self.test_table_schema)
+        rows = [(order_id, 'plain', False) for order_id in range(1, 11)]
+        logger.info("Inserting 10 rows from 4 threads..")
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda row: data_store.insert_into_table(
+                table=self.table_name, data=dict(zip(['order_id', 'order_type', 'is_delivered'], row))),
+                rows[:5]))
+        # The duplicates are skipped
+        data_store.insert_many_into_table(table=self.table_name, columns=['order_id', 'order_type', 'is_delivered'],
+                                          rows=rows, ignore_duplicates=True)
+        results = data_store.select_from_table(table=self.table_name, order_by='order_id', limit=None)
+        self.assertEqual(rows, results)
+        data_store.truncate_table(table=self.table_name)
+        self.assertEqual([], data_store.select_from_table(table=self.table_name))
+
+    def test_iterate_table(self):
+        data_store = SqliteDatastore(config=self.datastore_conf)
+        data_store.create_table(self.table_name, self.test_table_schema)
+        rows = [(order_id, 'plain' if order_id % 3 else 'express', False) for order_id in range(1, 2501)]
+        data_store.insert_many_into_table(table=self.table_name, columns=['order_id', 'order_type', 'is_delivered'],
+                                          rows=rows)
+        logger.info("Iterating over the table in batches of 1000..")
+        iterated_rows = data_store.iterate_table(table=self.table_name, columns='order_id, order_type',
+                                                 key_column='order_id', batch_size=1000)
+        self.assertListEqual([row[:2] for row in rows], list(iterated_rows))
+        iterated_rows = data_store.iterate_table(table=self.table_name, columns='order_id', key_column='order_id',
+                                                 where='order_type = %s', where_params=('express',), batch_size=100)
+        self.assertListEqual([(order_id,) for order_id in range(3, 2501, 3)], list(iterated_rows))
+
+    @staticmethod
+    def _generate_random_filename() -> str:
+        letters = string.ascii_lowercase
+        file_name = 'test_table_' + ''.join(random.choice(letters) for _ in range(10))
+        return file_name
+
+    @staticmethod
+    def _setup_log(debug: bool = False) -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        self.table_name = self._generate_random_filename()
+
+    def tearDown(self) -> None:
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+        cls.temp_folder = tempfile.TemporaryDirectory()
+        cls.datastore_conf = {'db_path': os.path.join(cls.temp_folder.name, 'db', 'test.sqlite3')}
+        cls.test_table_schema = """ order_id INT(6) PRIMARY KEY,
+                                    order_type VARCHAR(30) NOT NULL,
+                                    is_delivered BOOLEAN NOT NULL """
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_folder.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
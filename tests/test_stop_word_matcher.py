@@ -0,0 +1,59 @@
+import unittest
+import os
+import logging
+from unidecode import unidecode
+
+from ad_site_crawler.stop_word_matcher import StopWordMatcher
+
+logger = logging.getLogger('TestStopWordMatcher')
+
+
+class TestStopWordMatcher(unittest.TestCase):
+    test_data_path: str = os.path.join('test_data', 'test_xegr_ad_site_crawler')
+
+    def test_matches(self):
+        stop_word_matcher = StopWordMatcher(stop_words=['Senior', 'Προγραμματιστής', 'c++'])
+        self.assertTrue(stop_word_matcher.matches('Looking for a SENIOR developer'))
+        self.assertTrue(stop_word_matcher.matches('ζητείται προγραμματιστής'))
+        self.assertTrue(stop_word_matcher.matches('Knowledge of C++ is required'))
+        self.assertFalse(stop_word_matcher.matches('Looking for a junior developer'))
+
+    def test_find_matches(self):
+        stop_word_matcher = StopWordMatcher(stop_words=['Java', 'JavaScript', 'Senior', 'PHP'])
+        returned_matches = stop_word_matcher.find_matches('Senior javascript developer')
+        self.assertSetEqual({'Java', 'JavaScript', 'Senior'}, returned_matches)
+        self.assertSetEqual(set(), stop_word_matcher.find_matches('Junior python developer'))
+
+    def test_no_stop_words(self):
+        stop_word_matcher = StopWordMatcher(stop_words=[])
+        self.assertFalse(stop_word_matcher.matches('Anything'))
+        self.assertSetEqual(set(), stop_word_matcher.find_matches('Anything'))
+
+    def test_same_result_as_loop_on_ad_pages(self):
+        stop_words = ['Senior', 'WEBDESIGNER', 'αθηνα', 'python', 'Πειραιάς', 'php']
+        stop_word_matcher = StopWordMatcher(stop_words=stop_words)
+        for file_name in sorted(os.listdir(self.test_data_path)):
+            with open(os.path.join(self.test_data_path, file_name), 'r') as html_f:
+                html_file = html_f.read()
+            logger.info("Comparing the matches of %s.." % file_name)
+            expected_matches = {word for word in stop_words if unidecode(word).lower() in unidecode(html_file).lower()}
+            self.assertSetEqual(expected_matches, stop_word_matcher.find_matches(html_file))
+            self.assertEqual(len(expected_matches) > 0, stop_word_matcher.matches(html_file))
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+
+if __name__ == '__main__':
+    unittest.main()
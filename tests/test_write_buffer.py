@@ -0,0 +1,92 @@
+import unittest
+import os
+import time
+import logging
+import tempfile
+from typing import Dict, List
+
+from buffering.write_buffer import WriteBuffer
+
+logger = logging.getLogger('TestWriteBuffer')
+
+
+class TestWriteBuffer(unittest.TestCase):
+    rows: List[Dict] = [{'link': 'www.test{}.com'.format(row_id), 'email': None} for row_id in range(5)]
+
+    def test_flush_on_size_and_close(self):
+        with tempfile.TemporaryDirectory() as journal_folder:
+            flushed_batches = []
+            write_buffer = WriteBuffer(flush_rows=flushed_batches.append,
+                                       journal_path=os.path.join(journal_folder, 'journal.jsonl'),
+                                       max_rows=2, flush_interval=60)
+            logger.info("Adding 5 rows to a buffer of 2..")
+            for row in self.rows:
+                write_buffer.add(row)
+            self.assertListEqual([self.rows[0:2], self.rows[2:4]], flushed_batches)
+            self.assertListEqual(self.rows[4:], write_buffer.rows)
+            write_buffer.close()
+            self.assertListEqual([self.rows[0:2], self.rows[2:4], self.rows[4:]], flushed_batches)
+            self.assertEqual(0, os.path.getsize(os.path.join(journal_folder, 'journal.jsonl')))
+
+    def test_flush_on_interval(self):
+        with tempfile.TemporaryDirectory() as journal_folder:
+            flushed_batches = []
+            write_buffer = WriteBuffer(flush_rows=flushed_batches.append,
+                                       journal_path=os.path.join(journal_folder, 'journal.jsonl'),
+                                       max_rows=10, flush_interval=0.2)
+            write_buffer.add(self.rows[0])
+            time.sleep(0.6)
+            self.assertListEqual([self.rows[:1]], flushed_batches)
+            write_buffer.close()
+
+    def test_replay_after_crash(self):
+        with tempfile.TemporaryDirectory() as journal_folder:
+            journal_path = os.path.join(journal_folder, 'journal.jsonl')
+
+            def fail_to_flush(rows: List[Dict]) -> None:
+                raise ConnectionError("The datastore is down")
+
+            write_buffer = WriteBuffer(flush_rows=fail_to_flush, journal_path=journal_path, max_rows=2,
+                                       flush_interval=60)
+            logger.info("Adding rows while the datastore is down..")
+            for row in self.rows[:3]:
+                write_buffer.add(row)
+            self.assertListEqual(self.rows[:3], write_buffer.rows)
+            # Crash while appending a row, without closing the buffer
+            with open(journal_path, 'a') as journal_file:
+                journal_file.write('{"link": "www.te')
+            logger.info("Restarting..")
+            flushed_batches = []
+            write_buffer = WriteBuffer(flush_rows=flushed_batches.append, journal_path=journal_path,
+                                       max_rows=2, flush_interval=60)
+            self.assertListEqual([self.rows[:3]], flushed_batches)
+            self.assertListEqual([], write_buffer.rows)
+            write_buffer.close()
+
+    @staticmethod
+    def _setup_log() -> None:
+        # noinspection PyArgumentList
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-12s %(levelname)-8s %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S',
+                            handlers=[logging.StreamHandler()
+                                      ]
+                            )
+
+    def setUp(self) -> None:
+        pass
+
+    def tearDown(self) -> None:
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        cls._setup_log()
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
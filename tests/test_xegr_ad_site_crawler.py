@@ -6,8 +6,12 @@ import socketserver
 import urllib.parse
 from typing import Tuple, List, Dict
 import threading
+import tempfile
 
-from ad_site_crawler.xegr_ad_site_crawler import XeGrAdSiteCrawler
+from ad_site_crawler.xegr_ad_site_crawler import XeGrAdSiteCrawler, AdSiteCrawlerHttpError
+from ad_site_crawler.http_cache import HttpCache, HttpCacheEntry
+from ad_site_crawler.rejected_ads import RejectedAds
+from ad_site_crawler.result_list_fingerprint import ResultListFingerprint, ResultListFingerprintStore
 
 logger = logging.getLogger('TestXeGrAdSiteCrawler')
 
@@ -26,6 +30,7 @@ class TestXeGrAdSiteCrawler(unittest.TestCase):
     html_file_with_links_path: str
     html_file_with_email_path_1: str
     html_file_with_email_path_2: str
+    requested_paths: List = []
     PORT: int = 8111
     test_data_path: str = os.path.join('test_data', 'test_xegr_ad_site_crawler')
 
@@ -93,7 +98,7 @@ class TestXeGrAdSiteCrawler(unittest.TestCase):
         returned_ads = list(
             ad_site_crawler.get_new_ads(lookup_url='{base_url}/search?{lookup_params}'
                                         .format(base_url=self.base_url, lookup_params=self.lookup_params),
-                                        ads_checked=[self.base_url + self.html_sub_links[1]],
+                                        ads_checked={self.base_url + self.html_sub_links[1]},
                                         crawl_interval=1))
         # Check if the correct html was loaded
         expected_ads = [('{base_url}{sublink}'.format(base_url=self.base_url,
@@ -106,10 +111,207 @@ class TestXeGrAdSiteCrawler(unittest.TestCase):
         self.assertListEqual(sorted(expected_ads, key=lambda x: x[0]),
                              sorted(returned_ads, key=lambda x: x[0]))
 
+    def test_get_new_ads_all_checked(self):
+        ad_site_crawler = XeGrAdSiteCrawler(stop_words=self.stop_words,
+                                            ad_site_url=self.base_url,
+                                            anchor_class_name='highlight')
+        ads_checked = {self.base_url + sub_link for sub_link in self.html_sub_links}
+        # Retrieve the html from the local server
+        logger.info("Calling get_new_ads() with every ad checked..")
+        requests_before = len(self.requested_paths)
+        returned_ads = list(
+            ad_site_crawler.get_new_ads(lookup_url='{base_url}/search?{lookup_params}'
+                                        .format(base_url=self.base_url, lookup_params=self.lookup_params),
+                                        ads_checked=ads_checked,
+                                        crawl_interval=100))
+        # Check that only the search page was requested
+        self.assertListEqual([], returned_ads)
+        self.assertEqual(1, len(self.requested_paths) - requests_before)
+
+    def test_get_new_ads_rejected(self):
+        rejections = []
+        rejected_ads = RejectedAds(ttl=3600, on_rejected=rejections.append)
+        ad_site_crawler = XeGrAdSiteCrawler(stop_words=self.stop_words,
+                                            ad_site_url=self.base_url,
+                                            anchor_class_name='highlight',
+                                            rejected_ads=rejected_ads)
+        lookup_url = '{base_url}/search?{lookup_params}'.format(base_url=self.base_url,
+                                                                 lookup_params=self.lookup_params)
+        ads_checked = set()
+        logger.info("Calling get_new_ads() with no ad rejected..")
+        returned_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked=ads_checked,
+                                                        crawl_interval=1))
+        # The ads with the stop words are rejected and saved with their reason
+        self.assertEqual(2, len(returned_ads))
+        self.assertEqual(2, len(rejections))
+        for rejection in rejections:
+            self.assertIn(rejection['link'], rejected_ads)
+            self.assertEqual('stop words: senior', rejection['reason'].lower())
+            self.assertIsNotNone(rejection['expires_on'])
+        logger.info("Calling get_new_ads() with a fresh crawler that loaded the rejections..")
+        rejected_ads = RejectedAds(ttl=3600)
+        rejected_ads.load([(rejection['link'], None) for rejection in rejections])
+        ad_site_crawler = XeGrAdSiteCrawler(stop_words=self.stop_words,
+                                            ad_site_url=self.base_url,
+                                            anchor_class_name='highlight',
+                                            rejected_ads=rejected_ads)
+        requests_before = len(self.requested_paths)
+        returned_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked=ads_checked,
+                                                        crawl_interval=100))
+        # Only the search page was requested
+        self.assertListEqual([], returned_ads)
+        self.assertEqual(1, len(self.requested_paths) - requests_before)
+
+    def test_get_new_ads_http_cache(self):
+        with tempfile.TemporaryDirectory() as cache_folder:
+            http_cache = HttpCache(cache_folder=cache_folder)
+            ad_site_crawler = XeGrAdSiteCrawler(stop_words=self.stop_words,
+                                                ad_site_url=self.base_url,
+                                                anchor_class_name='highlight',
+                                                http_cache=http_cache)
+            lookup_url = '{base_url}/search?{lookup_params}'.format(base_url=self.base_url,
+                                                                    lookup_params=self.lookup_params)
+            ads_checked = set()
+            logger.info("Calling get_new_ads() with an empty cache..")
+            returned_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked=ads_checked,
+                                                            crawl_interval=0))
+            self.assertEqual(2, len(returned_ads))
+            # The search page is not modified, so nothing else should be requested
+            logger.info("Calling get_new_ads() with the search page cached..")
+            requests_before = len(self.requested_paths)
+            returned_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked=ads_checked,
+                                                            crawl_interval=0))
+            self.assertListEqual([], returned_ads)
+            self.assertEqual(1, len(self.requested_paths) - requests_before)
+            # Without the validators, the unchanged result list should skip the check too
+            logger.info("Calling get_new_ads() with only the result list hash cached..")
+            content_hash = http_cache.get(lookup_url).content_hash
+            http_cache.put(HttpCacheEntry(url=lookup_url, content_hash=content_hash))
+            requests_before = len(self.requested_paths)
+            returned_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked=ads_checked,
+                                                            crawl_interval=0))
+            self.assertListEqual([], returned_ads)
+            self.assertEqual(1, len(self.requested_paths) - requests_before)
+            # Unless the result list has an ad that wasn't saved, e.g. the process stopped before it
+            logger.info("Calling get_new_ads() with only the result list hash cached and an ad unchecked..")
+            http_cache.put(HttpCacheEntry(url=lookup_url, content_hash=content_hash))
+            unchecked_ad = sorted(ads_checked)[0]
+            ads_checked.discard(unchecked_ad)
+            returned_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked=ads_checked,
+                                                            crawl_interval=0))
+            self.assertListEqual([unchecked_ad], [link for link, _ in returned_ads])
+            # An ad un-checked while the search page is not modified is found once the cache is cleared
+            logger.info("Calling get_new_ads() with the cache cleared and an ad unchecked..")
+            ads_checked.discard(unchecked_ad)
+            http_cache.clear()
+            self.assertIsNone(http_cache.get(lookup_url))
+            returned_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked=ads_checked,
+                                                            crawl_interval=0))
+            self.assertListEqual([unchecked_ad], [link for link, _ in returned_ads])
+
+    def test_get_new_ads_fingerprint(self):
+        with tempfile.TemporaryDirectory() as fingerprints_folder:
+            fingerprint_store = ResultListFingerprintStore(fingerprints_folder=fingerprints_folder)
+            ad_site_crawler = XeGrAdSiteCrawler(stop_words=self.stop_words,
+                                                ad_site_url=self.base_url,
+                                                anchor_class_name='highlight',
+                                                fingerprint_store=fingerprint_store)
+            lookup_url = '{base_url}/search?{lookup_params}'.format(base_url=self.base_url,
+                                                                    lookup_params=self.lookup_params)
+            full_sub_links = [self.base_url + sub_link for sub_link in self.html_sub_links]
+            ads_checked = set()
+            logger.info("Calling get_new_ads() without a fingerprint..")
+            returned_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked=ads_checked,
+                                                            crawl_interval=0))
+            self.assertEqual(2, len(returned_ads))
+            self.assertEqual(len(full_sub_links), len(fingerprint_store.get(lookup_url)))
+            # Every link was seen, even the ones rejected for their stop words
+            logger.info("Calling get_new_ads() with the result list fingerprinted..")
+            requests_before = len(self.requested_paths)
+            returned_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked=ads_checked,
+                                                            crawl_interval=0))
+            self.assertListEqual([], returned_ads)
+            self.assertEqual(1, len(self.requested_paths) - requests_before)
+            # The ads weren't saved, e.g. the process stopped before it, so they are checked again
+            logger.info("Calling get_new_ads() with the result list fingerprinted but no ad checked..")
+            returned_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked=set(),
+                                                            crawl_interval=0))
+            self.assertEqual(2, len(returned_ads))
+            # Only the links above the first known one should be checked
+            ad_site_crawler = XeGrAdSiteCrawler(stop_words=self.stop_words,
+                                                ad_site_url=self.base_url,
+                                                anchor_class_name='highlight',
+                                                fingerprint_store=fingerprint_store,
+                                                known_links_to_stop=1)
+            fingerprint_store.put(ResultListFingerprint(lookup_url=lookup_url).updated(full_sub_links[1:2]))
+            logger.info("Calling get_new_ads() with only the second link fingerprinted..")
+            requests_before = len(self.requested_paths)
+            returned_ads = list(ad_site_crawler.get_new_ads(lookup_url=lookup_url, ads_checked={full_sub_links[1]},
+                                                            crawl_interval=0))
+            self.assertListEqual([], returned_ads)
+            self.assertListEqual(['/search?{lookup_params}'.format(lookup_params=self.lookup_params),
+                                  self.html_sub_links[0]],
+                                 self.requested_paths[requests_before:])
+            self.assertListEqual([ResultListFingerprint.hash_link(link) for link in full_sub_links[:2]],
+                                 fingerprint_store.get(lookup_url).link_hashes)
+
+    def test_get_new_ads_throttled(self):
+        ad_site_crawler = XeGrAdSiteCrawler(stop_words=self.stop_words,
+                                            ad_site_url=self.base_url,
+                                            anchor_class_name='highlight')
+        logger.info("Calling get_new_ads() for a throttled search page..")
+        with self.assertRaises(AdSiteCrawlerHttpError) as context:
+            list(ad_site_crawler.get_new_ads(lookup_url='{base_url}/throttled'.format(base_url=self.base_url),
+                                             ads_checked=set(), crawl_interval=0))
+        self.assertEqual(429, context.exception.status)
+        self.assertEqual(120, context.exception.retry_after)
+
+    def test_get_new_ads_pagination(self):
+        ad_site_crawler = XeGrAdSiteCrawler(stop_words=[],
+                                            ad_site_url=self.base_url,
+                                            anchor_class_name='highlight',
+                                            max_pages=4)
+        self.assertEqual('{base_url}/search?q=1&page=2'.format(base_url=self.base_url),
+                         ad_site_crawler._get_page_url('{base_url}/search?page=1&q=1'.format(base_url=self.base_url),
+                                                       page=2))
+        # Only the first ad of the first page is new, so the next pages should be walked
+        ads_checked = {self.base_url + sub_link for sub_link in self.html_sub_links[1:]}
+        logger.info("Calling get_new_ads() with 4 result pages..")
+        returned_ads = list(
+            ad_site_crawler.get_new_ads(lookup_url='{base_url}/search?{lookup_params}'
+                                        .format(base_url=self.base_url, lookup_params=self.lookup_params),
+                                        ads_checked=ads_checked,
+                                        crawl_interval=0))
+        # The third page contains only known links, so the walk should stop there
+        expected_links = [self.base_url + self.html_sub_links[0],
+                          self.base_url + '/jobs/page-2-ad-1.html',
+                          self.base_url + '/jobs/page-2-ad-2.html']
+        self.assertListEqual(expected_links, [link for link, _ in returned_ads])
+
     @classmethod
     def init_local_server(cls, port: int = 8111) -> socketserver.TCPServer:
         class MyHttpRequestHandler(http.server.SimpleHTTPRequestHandler):
             def do_GET(self):
+                cls.requested_paths.append(self.path)
+                page = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get('page')
+                if page == ['3']:
+                    self.path = cls.html_file_with_links_path
+                    return http.server.SimpleHTTPRequestHandler.do_GET(self)
+                elif page is not None:
+                    page_html = ''.join('<a class="highlight" href="/jobs/page-{page}-ad-{ad}.html">Ad</a>'
+                                        .format(page=page[0], ad=ad) for ad in range(1, 3))
+                    page_html = '<html><body><div>{}</div></body></html>'.format(page_html).encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(page_html)))
+                    self.end_headers()
+                    self.wfile.write(page_html)
+                    return
+                if self.path == '/throttled':
+                    self.send_response(429)
+                    self.send_header('Retry-After', '120')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
                 if self.path == '/search?{lookup_params}'.format(lookup_params=cls.lookup_params):
                     self.path = cls.html_file_with_links_path
                 elif self.path == cls.html_sub_links[0]:
@@ -123,6 +325,7 @@ class TestXeGrAdSiteCrawler(unittest.TestCase):
                     logger.info("Local server requested path: %s" % self.path)
                 return http.server.SimpleHTTPRequestHandler.do_GET(self)
 
+        socketserver.TCPServer.allow_reuse_address = True
         return socketserver.TCPServer(("", port), MyHttpRequestHandler)
 
     @staticmethod